@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks de rendimiento de los scripts del proyecto.
+
+Cada subcomando compara la implementación original con la optimizada
+sobre los mismos datos y muestra tiempos y la aceleración obtenida.
+
+Ejemplos:
+    python codigo/scripts/benchmarks.py conversion --filas 200000
+    python codigo/scripts/benchmarks.py html --filas 5000
+    python codigo/scripts/benchmarks.py rdf --escala 10
+"""
+
+import argparse
+import io
+import json
+import random
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+from bson import ObjectId
+from lxml import html as lhtml
+from rdflib import BNode
+
+import conversion_mongobd as conv
+import mongoxml_to_html as mx
+import reto5
+
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+BASE_DIR = SCRIPTS_DIR.parents[1]
+DATOS_DIR = BASE_DIR / "codigo" / "datos" / "mel_tsam_liang_2017"
+
+
+# =========================
+# Utilidades
+# =========================
+
+def cronometrar(fn, repeticiones=3):
+    """
+    Ejecuta fn varias veces y devuelve (mejor tiempo en segundos, resultado).
+    """
+    mejor = None
+    resultado = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = fn()
+        dt = time.perf_counter() - t0
+        mejor = dt if mejor is None else min(mejor, dt)
+    return mejor, resultado
+
+
+def informe(nombre, t_base, t_nuevo, n):
+    print(f"\n📊 {nombre} ({n} registros)")
+    print(f"   original:   {t_base:8.3f} s  ({n / t_base:,.0f} reg/s)")
+    print(f"   optimizado: {t_nuevo:8.3f} s  ({n / t_nuevo:,.0f} reg/s)")
+    print(f"   aceleración: x{t_base / t_nuevo:.2f}")
+
+
+def maf_sintetico(filas, seed=0):
+    """
+    Genera un DataFrame con las columnas de MUTATION_COLUMNS y valores
+    plausibles (incluyendo NaN) para medir sin data_mutations.txt real.
+    """
+    rnd = random.Random(seed)
+    genes = ["BRAF", "NRAS", "TP53", "CDKN2A", "PTEN", "NF1", "KIT", "MAP2K1"]
+    tipos = ["SNP", "DNP", "INS", "DEL"]
+    clases = ["Missense_Mutation", "Nonsense_Mutation", "Silent", "Frame_Shift_Del"]
+    muestras = [f"Mel_{i:03d}" for i in range(60)]
+
+    datos = []
+    for _ in range(filas):
+        start = rnd.randint(1, 200_000_000)
+        datos.append({
+            "Tumor_Sample_Barcode": rnd.choice(muestras),
+            "Matched_Norm_Sample_Barcode": rnd.choice(muestras + [None]),
+            "Hugo_Symbol": rnd.choice(genes),
+            "Chromosome": str(rnd.randint(1, 22)),
+            "Start_Position": start,
+            "End_Position": start + rnd.randint(0, 3),
+            "Strand": "+",
+            "Consequence": "missense_variant",
+            "Variant_Classification": rnd.choice(clases),
+            "Variant_Type": rnd.choice(tipos),
+            "Reference_Allele": rnd.choice("ACGT"),
+            "Tumor_Seq_Allele1": rnd.choice("ACGT"),
+            "HGVSc": rnd.choice([f"c.{start % 2000}A>T", None]),
+            "HGVSp": rnd.choice(["p.V600E", None]),
+            "HGVSp_Short": rnd.choice(["V600E", "nan"]),
+            "t_ref_count": rnd.choice([float(rnd.randint(0, 300)), float("nan")]),
+            "t_alt_count": float(rnd.randint(0, 300)),
+            "t_depth": float(rnd.randint(0, 600)),
+            "Mutation_Status": "Somatic",
+            "Verification_Status": None,
+            "Validation_Status": None,
+        })
+    return pd.DataFrame(datos, columns=conv.MUTATION_COLUMNS)
+
+
+# =========================
+# Conversión
+# =========================
+
+def bench_conversion(args):
+    casos = []
+
+    df_pat = conv.limpiar_datos(DATOS_DIR / "data_clinical_patient.txt", conv.PATIENT_COLUMNS)
+    df_sam = conv.limpiar_datos(DATOS_DIR / "data_clinical_sample.txt", conv.SAMPLE_COLUMNS)
+    escala = max(1, args.filas // max(len(df_pat), 1))
+
+    casos.append(("patients", pd.concat([df_pat] * escala, ignore_index=True), conv.PATIENT_COLUMNS))
+    casos.append(("samples", pd.concat([df_sam] * escala, ignore_index=True), conv.SAMPLE_COLUMNS))
+    casos.append(("variants", maf_sintetico(args.filas), conv.MUTATION_COLUMNS))
+
+    for nombre, df, columnas in casos:
+        t_base, base = cronometrar(lambda: conv.restructure(df, columnas, "records"), args.repeticiones)
+        t_nuevo, nuevo = cronometrar(lambda: conv.restructure(df, columnas, "vectorized"), args.repeticiones)
+
+        if json.dumps(base) != json.dumps(nuevo):
+            print(f"❌ {nombre}: las salidas no coinciden")
+        informe(f"Reestructuración {nombre}", t_base, t_nuevo, len(df))
+
+
+# =========================
+# Reportes HTML
+# =========================
+
+def variants_full_info_sintetico(filas):
+    """
+    Reproduce en Python la salida de la consulta variants_full_info
+    (variante + $lookup/$unwind de su muestra y de su paciente).
+    """
+    with open(BASE_DIR / "cleaned_data" / "samples.json", encoding="utf-8") as f:
+        samples = json.load(f)
+    with open(BASE_DIR / "cleaned_data" / "patients.json", encoding="utf-8") as f:
+        patients = {p["patient_id"]: p for p in json.load(f)}
+
+    df = maf_sintetico(filas)
+    df["Tumor_Sample_Barcode"] = [samples[i % len(samples)]["sample_id"] for i in range(filas)]
+
+    docs = []
+    for i, v in enumerate(conv.restructure(df, conv.MUTATION_COLUMNS)):
+        sample = samples[i % len(samples)]
+        doc = {"_id": f"{i:024x}", **v, "sample": sample}
+        doc["patient"] = patients.get(sample["patient"]["id"], {})
+        docs.append(doc)
+    return docs
+
+
+def normalizar_html(path):
+    """
+    Árbol HTML sin espacios sobrantes ni ids generados, para comparar
+    la salida XSLT con la del render directo.
+    """
+    texto = Path(path).read_text(encoding="utf-8")
+    texto = re.sub(r"variants-[\w-]+", "variants-ID", texto)
+    body = lhtml.fromstring(texto).find("body")
+    return [
+        (el.tag, (el.text or "").split(), (el.tail or "").split())
+        for el in body.iter()
+        if el.tag not in ("button",)
+    ]
+
+
+def bench_html(args):
+    if args.uri:
+        from pymongo import MongoClient
+        db = MongoClient(args.uri)[args.db]
+        raw = mx.load_queries(str(SCRIPTS_DIR / "queries.txt"))["variants_full_info"]
+        collection, op = mx.parse_mongo_query(raw)
+        docs = list(op(db[collection]))
+    else:
+        docs = variants_full_info_sintetico(args.filas)
+
+    xslt = SCRIPTS_DIR / "template.xslt"
+    tmp = Path(tempfile.mkdtemp())
+
+    def camino_xslt():
+        mx.write_xml_stream(iter(docs), str(tmp / "a.xml"))
+        mx.xml_to_html(str(tmp / "a.xml"), str(xslt), str(tmp / "a.html"))
+
+    def camino_directo():
+        mx.render_html_stream(iter(docs), str(tmp / "b.html"))
+
+    t_base, _ = cronometrar(camino_xslt, args.repeticiones)
+    t_nuevo, _ = cronometrar(camino_directo, args.repeticiones)
+
+    if normalizar_html(tmp / "a.html") != normalizar_html(tmp / "b.html"):
+        print("❌ El HTML directo no coincide con el generado por XSLT")
+    informe("variants_full_info: XML+XSLT vs. render directo", t_base, t_nuevo, len(docs))
+
+    disco_xslt = (tmp / "a.xml").stat().st_size + (tmp / "a.html").stat().st_size
+    print(f"   disco XML+HTML: {disco_xslt / 1e6:.1f} MB   HTML directo: {(tmp / 'b.html').stat().st_size / 1e6:.1f} MB")
+
+
+# =========================
+# Exportación RDF
+# =========================
+
+def _hint_original(k):
+    hint = None
+    if k.lower().endswith(("id", "_id")):
+        hint = k[:-2] if k.lower().endswith("id") else k[:-3]
+        hint = hint.strip("_").lower() or None
+    return hint
+
+
+def _predicate_original(key):
+    key = key.strip().replace(" ", "_")
+    key = "".join(ch for ch in key if ch.isalnum() or ch in ["_", "-"])
+    return reto5.MEL[key or "field"]
+
+
+def add_value_original(g, subj, pred, value, collection_hint=None):
+    """
+    Copia de reto5.add_value antes de las cachés, como referencia.
+    """
+    if isinstance(value, list):
+        for item in value:
+            add_value_original(g, subj, pred, item, collection_hint)
+        return
+    if isinstance(value, ObjectId):
+        uri = reto5.URIRef(f"{str(reto5.BASE)}{collection_hint}/{value}") if collection_hint \
+            else reto5.URIRef(f"{str(reto5.BASE)}ref/{value}")
+        g.add((subj, pred, uri))
+        return
+    if isinstance(value, dict):
+        obj = reto5.URIRef(f"{str(reto5.BASE)}{collection_hint}/{value['_id']}") if "_id" in value else BNode()
+        g.add((subj, pred, obj))
+        for k, v in value.items():
+            if k != "_id":
+                add_value_original(g, obj, _predicate_original(k), v, _hint_original(k))
+        return
+    if reto5.is_primitive(value):
+        g.add((subj, pred, reto5._make_literal(value)))
+        return
+    g.add((subj, pred, reto5.Literal(str(value), datatype=reto5.XSD.string)))
+
+
+def add_document_original(g, collection, doc, classes_in_ont):
+    subj = reto5.URIRef(f"{str(reto5.BASE)}{collection}/{doc['_id']}")
+    g.add((subj, reto5.RDF.type, reto5.MEL[collection]))
+    for k, v in doc.items():
+        if k != "_id":
+            add_value_original(g, subj, _predicate_original(k), v, _hint_original(k))
+
+
+def bench_rdf(args):
+    docs = []
+    for path in sorted((BASE_DIR / "cleaned_data").glob("*.json")):
+        with open(path, encoding="utf-8") as f:
+            datos = json.load(f)
+        for _ in range(args.escala):
+            docs += [(path.stem, {"_id": ObjectId(), **d}) for d in datos]
+
+    def exportar(add_document):
+        out = io.StringIO()
+        writer = reto5.TripleWriter(out)
+        clases = set()
+        for col, doc in docs:
+            add_document(writer, col, doc, clases)
+        return len(writer), out.getvalue()
+
+    t_base, (n_base, base) = cronometrar(lambda: exportar(add_document_original), args.repeticiones)
+    t_nuevo, (n_nuevo, nuevo) = cronometrar(lambda: exportar(reto5.add_document), args.repeticiones)
+
+    # Misma salida salvo las declaraciones rdfs:Class y las etiquetas de nodos en blanco
+    def normalizar(texto):
+        lineas = (l for l in texto.splitlines() if "rdf-schema#Class" not in l)
+        return sorted(re.sub(r"_:\w+", "_:B", l) for l in lineas)
+
+    if normalizar(base) != normalizar(nuevo):
+        print("❌ Las tripletas no coinciden")
+    informe(f"add_document sin/con cachés ({len(docs)} documentos)", t_base, t_nuevo, n_nuevo)
+    print("   (reg/s = tripletas/s)")
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks de los scripts del proyecto")
+    sub = ap.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("conversion", help="Reestructuración fila a fila vs. por columnas")
+    p.add_argument("--filas", type=int, default=100_000)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(func=bench_conversion)
+
+    p = sub.add_parser("html", help="Reporte variants_full_info: XML+XSLT vs. render directo")
+    p.add_argument("--filas", type=int, default=2_000)
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.add_argument("--uri", default=None, help="Si se indica, usa la consulta real en MongoDB")
+    p.add_argument("--db", default="EstadaresProyecto")
+    p.set_defaults(func=bench_html)
+
+    p = sub.add_parser("rdf", help="Exportación RDF de cleaned_data/*.json sin/con cachés de URIs")
+    p.add_argument("--escala", type=int, default=5, help="Veces que se replica cada documento")
+    p.add_argument("--repeticiones", type=int, default=3)
+    p.set_defaults(func=bench_rdf)
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
+import hashlib
 import os
+import sys
+import time
 import pandas as pd
 import json
 import math
+import argparse
+import textwrap
 import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, NamedTuple, Optional
+
+from http_cache import DEFAULT_CACHE_DIR, DEFAULT_TTL, ResponseCache, crear_sesion
 
 # ============================================================
 # 🔵 COLUMNAS PERMITIDAS
@@ -63,6 +72,41 @@ MUTATION_COLUMNS = [
 ]
 
 
+# Tipos fijos al leer los TSV: si pandas los infiere, lo hace por bloque y
+# un mismo valor sale como 102 o 102.0 según haya huecos en su bloque.
+# Posiciones y recuentos son enteros con nulos (Int64); los demás
+# numéricos, float64 como en la lectura completa; el resto, texto.
+COLUMN_DTYPES = {
+    "Start_Position": "Int64",
+    "End_Position": "Int64",
+    "t_ref_count": "Int64",
+    "t_alt_count": "Int64",
+    "t_depth": "Int64",
+    "AGE_AT_DIAGNOSIS": "Int64",
+    "OS_MONTHS": "float64",
+    "DFS_MONTHS": "float64",
+    "TIME_TO_RECURRENCE_MONTHS": "float64",
+    "LYMPH_NODE_EXAMINED_COUNT": "float64",
+    "PRIMARY_DEPTH": "float64",
+    "TMB_NONSYNONYMOUS": "float64",
+}
+
+
+def column_dtypes(columnas=None):
+    """
+    dtype para read_csv: los de COLUMN_DTYPES y, para las columnas pedidas
+    que no estén ahí, texto.
+    """
+    dtypes = dict(COLUMN_DTYPES)
+    for c in columnas or ():
+        dtypes.setdefault(c, str)
+    return dtypes
+
+
+# Filas por bloque al leer ficheros grandes (p. ej. data_mutations.txt)
+DEFAULT_CHUNKSIZE = 50000
+
+
 # ============================================================
 # 🔵 LIMPIEZA COMPLETA NaN
 # ============================================================
@@ -242,6 +286,228 @@ def restructure_variant(v):
     }
 
 
+# ============================================================
+# 🔵 REESTRUCTURACIÓN VECTORIZADA (POR COLUMNAS)
+# ============================================================
+#
+# Misma salida que restructure_patient/sample/variant, pero la limpieza
+# de NaN, el parseo de estados y la construcción de variant_id se hacen
+# con operaciones de pandas sobre columnas completas. Los documentos
+# anidados solo se construyen al final, a partir de estos layouts.
+#
+# En un layout cada hoja es:
+#   "COLUMNA"              -> valor de la columna
+#   ("status", "COLUMNA")  -> parse_status de la columna
+#   ("variant_id",)        -> identificador de variante
+#   []                     -> lista vacía nueva por documento
+
+PATIENT_LAYOUT = {
+    "patient_id": "PATIENT_ID",
+    "survival": {
+        "overall": {
+            "months": "OS_MONTHS",
+            "status": ("status", "OS_STATUS")
+        },
+        "disease_free": {
+            "months": "DFS_MONTHS",
+            "status": ("status", "DFS_STATUS")
+        }
+    },
+    "clinical": {
+        "demographics": {
+            "age_at_diagnosis": "AGE_AT_DIAGNOSIS",
+            "sex": "SEX",
+            "race": "RACE"
+        },
+        "tumor": {
+            "ulceration": "PRIMARY_MELANOMA_TUMOR_ULCERATION",
+            "lymph_node_examined": "LYMPH_NODE_EXAMINED_COUNT"
+        }
+    },
+    "recurrence": {
+        "metastasis": "METASTASIS",
+        "details": {
+            "time_to_recurrence_months": "TIME_TO_RECURRENCE_MONTHS",
+            "site_first_recurrence": "SITE_FIRST_RECURRENCE"
+        }
+    },
+    "treatment": {
+        "received": "TREATMENT",
+        "details": []
+    }
+}
+
+SAMPLE_LAYOUT = {
+    "sample_id": "SAMPLE_ID",
+    "patient": {
+        "id": "PATIENT_ID"
+    },
+    "metadata": {
+        "presentation": {
+            "stage": "STAGE_AT_PRESENTATION",
+            "primary_site": "PRIMARY_SITE"
+        },
+        "sample_info": {
+            "type": "SAMPLE_TYPE",
+            "metastatic_site": "METASTATIC_SITE"
+        }
+    },
+    "tumor": {
+        "primary_depth_mm": "PRIMARY_DEPTH"
+    },
+    "cancer": {
+        "type": {
+            "main": "CANCER_TYPE",
+            "detailed": "CANCER_TYPE_DETAILED"
+        }
+    },
+    "genomics": {
+        "tmb": {
+            "nonsynonymous": "TMB_NONSYNONYMOUS"
+        }
+    }
+}
+
+VARIANT_LAYOUT = {
+    "variant_id": ("variant_id",),
+    "gene": {
+        "symbol": "Hugo_Symbol"
+    },
+    "location": {
+        "chromosome": "Chromosome",
+        "coordinates": {
+            "start": "Start_Position",
+            "end": "End_Position",
+            "strand": "Strand"
+        }
+    },
+    "classification": {
+        "consequence": "Consequence",
+        "variant_class": "Variant_Classification",
+        "variant_type": "Variant_Type"
+    },
+    "alleles": {
+        "reference": "Reference_Allele",
+        "tumor": {
+            "allele1": "Tumor_Seq_Allele1"
+        }
+    },
+    "samples": {
+        "tumor_sample": "Tumor_Sample_Barcode",
+        "normal_sample": "Matched_Norm_Sample_Barcode"
+    },
+    "sequencing": {
+        "depth": {
+            "tumor": {
+                "ref_count": "t_ref_count",
+                "alt_count": "t_alt_count",
+                "total_depth": "t_depth"
+            }
+        }
+    },
+    "annotations": {
+        "HGVSc": "HGVSc",
+        "HGVSp": "HGVSp",
+        "HGVSp_short": "HGVSp_Short"
+    },
+    "validation": {
+        "mutation_status": "Mutation_Status",
+        "verification_status": "Verification_Status",
+        "validation_status": "Validation_Status"
+    }
+}
+
+def clean_nan_series(serie):
+    """
+    Versión vectorizada de clean_nan: None, NaN y cadenas "nan" pasan a None.
+    La comprobación de texto se hace solo sobre los valores distintos.
+    """
+    mask = serie.isna().to_numpy(copy=True)
+
+    if not pd.api.types.is_numeric_dtype(serie.dtype):
+        distintos = pd.unique(serie[~mask])
+        nan_texto = [v for v in distintos if isinstance(v, str) and v.strip().lower() == "nan"]
+        if nan_texto:
+            mask |= serie.isin(nan_texto).to_numpy()
+
+    return serie.astype(object).where(~mask, None)
+
+
+def parse_status_series(serie):
+    """
+    Versión vectorizada de parse_status: se parsea cada estado distinto
+    una sola vez y se reparte a las filas mediante pd.factorize.
+    """
+    codigos, distintos = pd.factorize(serie)
+    parseados = [parse_status(v) for v in distintos]
+
+    return [
+        None if c < 0 else dict(parseados[c])
+        for c in codigos.tolist()
+    ]
+
+
+def variant_id_series(df):
+    """
+    Versión vectorizada de f"{Hugo_Symbol}_{Start_Position}_{Variant_Type}".
+    """
+    partes = [df[c].astype(object).map(str) for c in ("Hugo_Symbol", "Start_Position", "Variant_Type")]
+    return (partes[0] + "_" + partes[1] + "_" + partes[2]).tolist()
+
+
+def _layout_column(df, leaf):
+    n = len(df)
+
+    if isinstance(leaf, list):
+        return [[] for _ in range(n)]
+
+    if isinstance(leaf, tuple):
+        if leaf[0] == "status":
+            return parse_status_series(df[leaf[1]])
+        if leaf[0] == "variant_id":
+            return variant_id_series(df)
+        raise ValueError(f"Hoja de layout desconocida: {leaf}")
+
+    return df[leaf].tolist()
+
+
+def _materialize(df, layout):
+    if not isinstance(layout, dict):
+        return _layout_column(df, layout)
+
+    keys = list(layout)
+    columnas = [_materialize(df, layout[k]) for k in keys]
+    if not columnas:
+        return [{} for _ in range(len(df))]
+    return [dict(zip(keys, valores)) for valores in zip(*columnas)]
+
+
+def layout_for_columns(columnas):
+    if columnas == PATIENT_COLUMNS:
+        return PATIENT_LAYOUT
+    if columnas == SAMPLE_COLUMNS:
+        return SAMPLE_LAYOUT
+    if columnas == MUTATION_COLUMNS:
+        return VARIANT_LAYOUT
+    return None
+
+
+def restructure_dataframe(df, columnas=None):
+    """
+    Limpia y reestructura un DataFrame completo por columnas.
+    Devuelve la misma lista de documentos que restructure_records.
+    """
+    df = df.copy()
+    for col in df.columns:
+        df[col] = clean_nan_series(df[col])
+
+    layout = layout_for_columns(columnas)
+    if layout is None:
+        return df.to_dict(orient="records")
+
+    return _materialize(df, layout)
+
+
 # ============================================================
 # 🔵 ONCOKB (CURATED CANCER GENES)
 # ============================================================
@@ -275,9 +541,131 @@ def restructure_oncokb_gene(g):
     }
 
 
-def download_and_convert_oncokb(output_file):
-    url = "https://www.oncokb.org/api/v1/utils/allCuratedGenes"
-    data = requests.get(url).json()
+ONCOKB_URL = os.environ.get("ONCOKB_URL", "https://www.oncokb.org/api/v1/utils/allCuratedGenes")
+ONCOKB_STATE_DIR = os.path.join(os.path.dirname(DEFAULT_CACHE_DIR), "oncokb")
+
+
+def _load_oncokb_state(state_dir):
+    """
+    Devuelve (metadatos, payload) de la última descarga, o ({}, None).
+    """
+    try:
+        with open(os.path.join(state_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(state_dir, "allCuratedGenes.json"), encoding="utf-8") as f:
+            payload = json.load(f)
+        return meta, payload
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}, None
+
+
+def _save_oncokb_state(state_dir, meta, payload):
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, "allCuratedGenes.json"), "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    with open(os.path.join(state_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=4)
+
+
+def diff_oncokb_genes(previous, current):
+    """
+    Compara dos payloads de allCuratedGenes por hugoSymbol.
+    Devuelve (genes nuevos o modificados, símbolos eliminados).
+    """
+    previos = {g.get("hugoSymbol"): g for g in previous or []}
+    actuales = {g.get("hugoSymbol"): g for g in current}
+
+    cambiados = [g for sym, g in actuales.items() if previos.get(sym) != g]
+    eliminados = [sym for sym in previos if sym not in actuales]
+    return cambiados, eliminados
+
+
+def oncokb_version(payload):
+    """
+    Versión de un payload de allCuratedGenes: sha256 de su JSON canónico.
+    """
+    texto = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def _load_oncokb_delta(delta_file):
+    try:
+        with open(delta_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def merge_oncokb_delta(anterior, upserts, deletes):
+    """
+    Acumula un delta nuevo sobre uno anterior todavía en disco: cada gen
+    queda con su último estado (upsert o borrado).
+    """
+    por_simbolo = {u["gene"]["symbol"]: u for u in anterior["upserts"]}
+    borrados = dict.fromkeys(anterior["deletes"])
+    for sym in deletes:
+        por_simbolo.pop(sym, None)
+        borrados[sym] = None
+    for u in upserts:
+        por_simbolo[u["gene"]["symbol"]] = u
+        borrados.pop(u["gene"]["symbol"], None)
+    return list(por_simbolo.values()), list(borrados)
+
+
+def write_oncokb_delta(delta_file, upserts, deletes, full, version, bases=()):
+    """
+    Delta para la carga en Mongo: documentos a insertar/actualizar
+    (clave gene.symbol) y símbolos a borrar. version es la del payload
+    resultante y bases las versiones sobre las que se puede aplicar; si
+    la colección no está en ninguna, el cargador hace la carga completa.
+    """
+    tmp_file = delta_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({
+            "key": "gene.symbol",
+            "full": full,
+            "version": version,
+            "bases": list(bases),
+            "upserts": upserts,
+            "deletes": deletes
+        }, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_file, delta_file)
+
+
+def download_and_convert_oncokb(output_file, incremental=True, url=ONCOKB_URL,
+                                state_dir=ONCOKB_STATE_DIR, session=None):
+    """
+    Descarga los genes curados de OncoKB y genera oncokb_genes.json.
+
+    En modo incremental se guarda el payload anterior junto con su
+    ETag/Last-Modified, se hace una petición condicional y se escribe
+    además <output>.delta.json con solo los genes que han cambiado. Si
+    el delta anterior sigue en disco (el cargador puede no haberlo
+    aplicado todavía), el nuevo se acumula sobre él en lugar de
+    sustituirlo. La descarga completa (incremental=False) también deja
+    guardado el estado para las siguientes.
+    """
+    session = session or requests
+    meta, previous = _load_oncokb_state(state_dir) if incremental else ({}, None)
+    delta_file = os.path.splitext(output_file)[0] + ".delta.json"
+
+    headers = {}
+    if previous is not None and os.path.exists(output_file):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    r = session.get(url, headers=headers, timeout=120)
+
+    if r.status_code == 304:
+        # El delta pendiente (si lo hay) sigue siendo válido: no se toca
+        print("OncoKB sin cambios (304), se mantiene:", output_file)
+        return
+
+    r.raise_for_status()
+    data = r.json()
+    version = oncokb_version(data)
 
     structured = [restructure_oncokb_gene(g) for g in data]
 
@@ -285,6 +673,31 @@ def download_and_convert_oncokb(output_file):
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(structured, f, indent=4, ensure_ascii=False)
 
+    if previous is None:
+        write_oncokb_delta(delta_file, structured, [], full=True, version=version)
+    else:
+        cambiados, eliminados = diff_oncokb_genes(previous, data)
+        print(f"OncoKB: {len(cambiados)} genes nuevos/modificados, {len(eliminados)} eliminados")
+
+        upserts = [restructure_oncokb_gene(g) for g in cambiados]
+        version_previa = oncokb_version(previous)
+        bases = [version_previa]
+
+        anterior = _load_oncokb_delta(delta_file)
+        if anterior and not anterior.get("full") and anterior.get("version") == version_previa:
+            upserts, eliminados = merge_oncokb_delta(anterior, upserts, eliminados)
+            bases = anterior.get("bases", []) + bases
+
+        write_oncokb_delta(delta_file, upserts, eliminados, full=False, version=version, bases=bases)
+
+    _save_oncokb_state(state_dir, {
+        "url": url,
+        "version": version,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "fetched_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }, data)
+
     print("Colección OncoKB creada:", output_file)
 
 
@@ -350,20 +763,122 @@ def restructure_uniprot(entry):
     }
 
 
-def download_uniprot_entries(accessions, output_file):
-    base_url = "https://rest.uniprot.org/uniprotkb/"
+UNIPROT_BASE_URL = os.environ.get("UNIPROT_BASE_URL", "https://rest.uniprot.org")
+UNIPROT_BATCH_SIZE = 100
+UNIPROT_WORKERS = 4
 
-    structured_entries = []
 
-    for acc in accessions:
-        print(f"Descargando UniProt: {acc}")
+def _uniprot_entry_key(base_url, acc):
+    return f"{base_url}/uniprotkb/{acc}.json"
+
+
+def _fetch_uniprot_batch(session, base_url, batch):
+    """
+    Descarga un lote de accesiones con el endpoint de búsqueda
+    (una sola petición) y devuelve {accesion: bytes_json}.
+    """
+    query = " OR ".join(f"accession:{acc}" for acc in batch)
+    r = session.get(
+        f"{base_url}/uniprotkb/search",
+        params={"query": query, "format": "json", "size": len(batch)},
+        timeout=60
+    )
+    r.raise_for_status()
+
+    pedidas = set(batch)
+    encontradas = {}
+    for entry in r.json().get("results", []):
+        acc = entry.get("primaryAccession")
+        if acc in pedidas:
+            encontradas[acc] = json.dumps(entry).encode("utf-8")
+    return encontradas
+
+
+def _fetch_uniprot_batch_or_empty(session, base_url, batch):
+    """
+    Como _fetch_uniprot_batch, pero un lote fallido (tras los reintentos de
+    la sesión) no aborta la descarga: devuelve {} y sus accesiones se piden
+    una a una.
+    """
+    try:
+        return _fetch_uniprot_batch(session, base_url, batch)
+    except (requests.RequestException, ValueError) as e:
+        print(f"⚠️ Lote UniProt fallido ({len(batch)} accesiones, se piden una a una): {e}")
+        return {}
+
+
+def _fetch_uniprot_single(session, base_url, acc):
+    try:
+        r = session.get(_uniprot_entry_key(base_url, acc), timeout=60)
+    except requests.RequestException as e:
+        print(f"⚠️ UniProt {acc}: {e}")
+        return None
+    if r.status_code == 200:
+        return r.content
+    return None
+
+
+def fetch_uniprot_raw(accessions, base_url=UNIPROT_BASE_URL, cache=None, session=None,
+                      workers=UNIPROT_WORKERS, batch_size=UNIPROT_BATCH_SIZE):
+    """
+    Devuelve {accesion: bytes_json} para las accesiones encontradas.
+
+    Primero se consulta la caché en disco; las que faltan se piden por
+    lotes al endpoint de búsqueda, en paralelo con un número acotado de
+    hilos que comparten la misma sesión (pool de conexiones). Las que no
+    aparecen en el lote (p. ej. accesiones secundarias) o cuyo lote ha
+    fallado se piden una a una.
+    """
+    base_url = base_url.rstrip("/")
+    cache = cache or ResponseCache()
+    session = session or crear_sesion(pool_size=workers)
+
+    raw = {}
+    pendientes = []
+    for acc in dict.fromkeys(accessions):
+        contenido = cache.get(_uniprot_entry_key(base_url, acc))
+        if contenido is not None:
+            raw[acc] = contenido
+        else:
+            pendientes.append(acc)
+
+    if pendientes:
+        print(f"Descargando UniProt: {len(pendientes)} accesiones ({len(raw)} en caché)")
+    else:
+        print(f"UniProt: {len(raw)} accesiones servidas desde caché")
+        return raw
+
+    lotes = [pendientes[i:i + batch_size] for i in range(0, len(pendientes), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        descargadas = {}
+        for encontradas in pool.map(lambda lote: _fetch_uniprot_batch_or_empty(session, base_url, lote), lotes):
+            descargadas.update(encontradas)
+
+        sueltas = [acc for acc in pendientes if acc not in descargadas]
+        for acc, contenido in zip(sueltas, pool.map(
+                lambda a: _fetch_uniprot_single(session, base_url, a), sueltas)):
+            if contenido is not None:
+                descargadas[acc] = contenido
+
+    for acc, contenido in descargadas.items():
+        cache.put(_uniprot_entry_key(base_url, acc), contenido)
+        raw[acc] = contenido
+
+    return raw
 
-        url = f"{base_url}{acc}.json"
-        r = requests.get(url)
 
-        if r.status_code == 200:
-            data = r.json()
-            structured_entries.append(restructure_uniprot(data))
+def download_uniprot_entries(accessions, output_file, base_url=UNIPROT_BASE_URL,
+                             cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL,
+                             workers=UNIPROT_WORKERS, batch_size=UNIPROT_BATCH_SIZE):
+    cache = ResponseCache(cache_dir, ttl)
+    cache.purge()
+
+    raw = fetch_uniprot_raw(accessions, base_url, cache, workers=workers, batch_size=batch_size)
+
+    structured_entries = []
+    for acc in accessions:
+        if acc in raw:
+            structured_entries.append(restructure_uniprot(json.loads(raw[acc])))
         else:
             print("No encontrado:", acc)
 
@@ -378,8 +893,7 @@ def download_uniprot_entries(accessions, output_file):
 # 🔵 LIMPIEZA DE CSV
 # ============================================================
 
-def limpiar_datos(input_file, columnas_a_mantener=None):
-    df = pd.read_csv(input_file, sep="\t", comment="#")
+def _limpiar_df(df, columnas_a_mantener=None):
     df.columns = df.columns.str.strip()
 
     if columnas_a_mantener:
@@ -393,14 +907,27 @@ def limpiar_datos(input_file, columnas_a_mantener=None):
     return df
 
 
+def limpiar_datos(input_file, columnas_a_mantener=None):
+    df = pd.read_csv(input_file, sep="\t", comment="#", dtype=column_dtypes(columnas_a_mantener))
+    return _limpiar_df(df, columnas_a_mantener)
+
+
+def limpiar_datos_por_bloques(input_file, columnas_a_mantener=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Igual que limpiar_datos, pero devuelve un generador de DataFrames
+    de como máximo `chunksize` filas para no cargar el TSV completo.
+    """
+    reader = pd.read_csv(input_file, sep="\t", comment="#", chunksize=chunksize,
+                         dtype=column_dtypes(columnas_a_mantener))
+    for chunk in reader:
+        yield _limpiar_df(chunk, columnas_a_mantener)
+
+
 # ============================================================
 # 🔵 CONVERTIR A JSON + REESTRUCTURAR
 # ============================================================
 
-def convert_to_json(input_file, output_file, columnas=None):
-    df = limpiar_datos(input_file, columnas)
-    records = df.to_dict(orient="records")
-
+def restructure_records(records, columnas=None):
     records = [clean_record(r) for r in records]
 
     if columnas == PATIENT_COLUMNS:
@@ -412,11 +939,167 @@ def convert_to_json(input_file, output_file, columnas=None):
     elif columnas == MUTATION_COLUMNS:
         records = [restructure_variant(r) for r in records]
 
+    return records
+
+
+def restructure(df, columnas=None, engine="vectorized"):
+    """
+    engine: "vectorized" (por columnas) o "records" (fila a fila, original).
+    """
+    if engine == "vectorized":
+        return restructure_dataframe(df, columnas)
+    if engine == "records":
+        return restructure_records(df.to_dict(orient="records"), columnas)
+    raise ValueError(f"Motor de reestructuración no soportado: {engine}")
+
+
+def convert_to_json(input_file, output_file, columnas=None, chunksize=None, formato="json",
+                    engine="vectorized"):
+    if chunksize or formato == "jsonl":
+        convert_to_json_streaming(
+            input_file, output_file, columnas,
+            chunksize=chunksize or DEFAULT_CHUNKSIZE,
+            formato=formato,
+            engine=engine
+        )
+        return
+
+    df = limpiar_datos(input_file, columnas)
+    records = restructure(df, columnas, engine)
+
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(records, f, indent=4, ensure_ascii=False)
 
 
+# ============================================================
+# 🔵 CONVERSIÓN POR BLOQUES (STREAMING)
+# ============================================================
+
+def write_json_array_stream(records, f):
+    """
+    Escribe un iterable de registros como array JSON de forma incremental.
+    La salida es idéntica a json.dump(lista, f, indent=4).
+    """
+    first = True
+    for r in records:
+        f.write("[\n" if first else ",\n")
+        f.write(textwrap.indent(json.dumps(r, indent=4, ensure_ascii=False), "    "))
+        first = False
+    f.write("[]" if first else "\n]")
+
+
+def write_jsonl_stream(records, f):
+    for r in records:
+        f.write(json.dumps(r, ensure_ascii=False))
+        f.write("\n")
+
+
+def convert_to_json_streaming(input_file, output_file, columnas=None,
+                              chunksize=DEFAULT_CHUNKSIZE, formato="json", engine="vectorized"):
+    """
+    Lee el TSV en bloques de `chunksize` filas, reestructura cada bloque
+    y lo escribe directamente en disco. La memoria máxima depende del
+    tamaño del bloque, no del tamaño del fichero.
+
+    formato: "json" (array, compatible con json.load) o "jsonl" (JSON Lines).
+    """
+    if formato not in ("json", "jsonl"):
+        raise ValueError(f"Formato de salida no soportado: {formato}")
+
+    def records():
+        for df in limpiar_datos_por_bloques(input_file, columnas, chunksize):
+            yield from restructure(df, columnas, engine)
+
+    # Se escribe en un temporal para no dejar un fichero a medias si falla
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    tmp_file = output_file + ".tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            if formato == "jsonl":
+                write_jsonl_stream(records(), f)
+            else:
+                write_json_array_stream(records(), f)
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+
+# ============================================================
+# 🔵 EJECUCIÓN PARALELA DE TAREAS ETL
+# ============================================================
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class ETLTask(NamedTuple):
+    """
+    Paso independiente del ETL.
+    tipo: "cpu" (se ejecuta en un proceso) o "io" (se ejecuta en un hilo).
+    """
+    nombre: str
+    tipo: str
+    fn: Callable
+    args: tuple = ()
+    kwargs: Optional[dict] = None
+
+
+def _run_timed(fn, args, kwargs):
+    t0 = time.perf_counter()
+    fn(*args, **(kwargs or {}))
+    return time.perf_counter() - t0
+
+
+def run_etl_tasks(tareas, workers=DEFAULT_WORKERS):
+    """
+    Ejecuta las tareas y devuelve una lista de
+    {"nombre", "segundos", "error"} en el mismo orden que `tareas`.
+
+    Con workers > 1 las tareas "cpu" van a un pool de procesos y las "io"
+    a un pool de hilos, de modo que el tiempo total se aproxima al de la
+    tarea más lenta. Un fallo no interrumpe al resto de tareas.
+    """
+    resultados = {t.nombre: {"nombre": t.nombre, "segundos": None, "error": None} for t in tareas}
+
+    if workers <= 1:
+        for t in tareas:
+            t0 = time.perf_counter()
+            try:
+                t.fn(*t.args, **(t.kwargs or {}))
+            except Exception as e:
+                resultados[t.nombre]["error"] = f"{type(e).__name__}: {e}"
+            resultados[t.nombre]["segundos"] = time.perf_counter() - t0
+        return list(resultados.values())
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as procesos, \
+            ThreadPoolExecutor(max_workers=workers) as hilos:
+        futuros = {}
+        for t in tareas:
+            pool = procesos if t.tipo == "cpu" else hilos
+            futuros[pool.submit(_run_timed, t.fn, t.args, t.kwargs)] = t.nombre
+
+        for fut in as_completed(futuros):
+            nombre = futuros[fut]
+            try:
+                resultados[nombre]["segundos"] = fut.result()
+            except Exception as e:
+                resultados[nombre]["segundos"] = time.perf_counter() - t0
+                resultados[nombre]["error"] = f"{type(e).__name__}: {e}"
+
+    return list(resultados.values())
+
+
+def print_etl_report(resultados):
+    print("\n📋 Resumen de tareas:")
+    for r in resultados:
+        estado = "❌" if r["error"] else "✅"
+        print(f"   {estado} {r['nombre']:<10} {r['segundos']:7.2f} s")
+        if r["error"]:
+            print(f"      {r['error']}")
+
+
 # ============================================================
 # 🔵 MAIN (CORREGIDO)
 # ============================================================
@@ -426,6 +1109,17 @@ def convert_to_json(input_file, output_file, columnas=None):
 # ============================================================
 
 def main():
+    parser = argparse.ArgumentParser(description="Conversión cBioPortal → JSON para MongoDB")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Filas por bloque al convertir mutaciones (0 = cargar todo en memoria)")
+    parser.add_argument("--variants-format", choices=["json", "jsonl"], default="json",
+                        help="Formato de salida de variants (array JSON o JSON Lines)")
+    parser.add_argument("--oncokb-full", action="store_true",
+                        help="Ignora el estado previo de OncoKB y hace una descarga completa")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="Procesos/hilos en paralelo (1 = ejecución secuencial)")
+    args = parser.parse_args()
+
     # (EstandaresProyecto/codigo/scripts)
     script_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -449,35 +1143,43 @@ def main():
         print(f"   Se esperaba en: {base_input}")
         return
 
-    # Ejecutar conversiones usando las rutas dinámicas
+    # Tareas independientes: conversiones (CPU) y descargas (red)
     # -------------------------------
-    convert_to_json(
-        os.path.join(base_input, "data_clinical_patient.txt"),
-        os.path.join(out_dir, "patients.json"),
-        PATIENT_COLUMNS
-    )
-
-    convert_to_json(
-        os.path.join(base_input, "data_clinical_sample.txt"),
-        os.path.join(out_dir, "samples.json"),
-        SAMPLE_COLUMNS
-    )
-
-    convert_to_json(
-        os.path.join(base_input, "data_mutations.txt"),
-        os.path.join(out_dir, "variants.json"),
-        MUTATION_COLUMNS
-    )
-
-    download_and_convert_oncokb(
-        os.path.join(out_dir, "oncokb_genes.json")
-    )
-
+    variants_name = "variants.jsonl" if args.variants_format == "jsonl" else "variants.json"
     uniprot_accessions = ["P15056", "P04637", "P01111", "Q16539", "P25963"]
-    download_uniprot_entries(
-        uniprot_accessions,
-        os.path.join(out_dir, "uniprot.json")
-    )
+
+    tareas = [
+        ETLTask("patients", "cpu", convert_to_json, (
+            os.path.join(base_input, "data_clinical_patient.txt"),
+            os.path.join(out_dir, "patients.json"),
+            PATIENT_COLUMNS
+        )),
+        ETLTask("samples", "cpu", convert_to_json, (
+            os.path.join(base_input, "data_clinical_sample.txt"),
+            os.path.join(out_dir, "samples.json"),
+            SAMPLE_COLUMNS
+        )),
+        # Las mutaciones pueden ser millones de filas: se convierten por bloques
+        ETLTask("variants", "cpu", convert_to_json, (
+            os.path.join(base_input, "data_mutations.txt"),
+            os.path.join(out_dir, variants_name),
+            MUTATION_COLUMNS
+        ), {"chunksize": args.chunksize or None, "formato": args.variants_format}),
+        ETLTask("oncokb", "io", download_and_convert_oncokb, (
+            os.path.join(out_dir, "oncokb_genes.json"),
+        ), {"incremental": not args.oncokb_full}),
+        ETLTask("uniprot", "io", download_uniprot_entries, (
+            uniprot_accessions,
+            os.path.join(out_dir, "uniprot.json")
+        )),
+    ]
+
+    resultados = run_etl_tasks(tareas, workers=args.workers)
+    print_etl_report(resultados)
+
+    if any(r["error"] for r in resultados):
+        print("\n❌ Conversión terminada con errores.")
+        sys.exit(1)
 
     print("\n✅ Conversión completada exitosamente.")
 
@@ -0,0 +1,117 @@
+"""
+Utilidades HTTP compartidas por los descargadores del ETL (UniProt, OncoKB).
+
+- crear_sesion: sesión requests con pool de conexiones y reintentos.
+- ResponseCache: caché persistente en disco de respuestas crudas, con
+  caducidad (TTL). Se indexa por el SHA-256 de la clave de la petición
+  (la URL), no del contenido: una respuesta que cambia en el servidor se
+  sigue sirviendo desde la caché hasta que caduca.
+"""
+
+import hashlib
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    ".cache", "http"
+)
+DEFAULT_TTL = 7 * 24 * 3600  # una semana
+
+
+# -------------------------------------------------------------
+# SESIÓN CON POOL DE CONEXIONES
+# -------------------------------------------------------------
+def crear_sesion(pool_size=8, reintentos=3, backoff=0.5):
+    """
+    Sesión reutilizable: mantiene las conexiones abiertas entre peticiones
+    y reintenta errores transitorios (429, 5xx) con espera exponencial.
+    """
+    retry = Retry(
+        total=reintentos,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# -------------------------------------------------------------
+# CACHÉ DE RESPUESTAS
+# -------------------------------------------------------------
+class ResponseCache:
+    """
+    Guarda el cuerpo crudo de cada respuesta en <cache_dir>/<hh>/<hash>,
+    donde hash = sha256 de la clave de la petición (normalmente la URL).
+    Las entradas más antiguas que `ttl` segundos se consideran caducadas
+    y se borran al leerlas o al llamar a purge().
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    @staticmethod
+    def key(request_key):
+        return hashlib.sha256(request_key.encode("utf-8")).hexdigest()
+
+    def _path(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _expired(self, path, now=None):
+        if self.ttl is None:
+            return False
+        now = time.time() if now is None else now
+        return now - os.path.getmtime(path) > self.ttl
+
+    def get(self, request_key):
+        path = self._path(self.key(request_key))
+        try:
+            if self._expired(path):
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, request_key, content):
+        path = self._path(self.key(request_key))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Escritura atómica: varios hilos pueden guardar a la vez
+        tmp = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def purge(self):
+        """
+        Elimina todas las entradas caducadas. Devuelve cuántas se borraron.
+        """
+        if not os.path.isdir(self.cache_dir):
+            return 0
+
+        borradas = 0
+        now = time.time()
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    if self._expired(path, now):
+                        os.remove(path)
+                        borradas += 1
+                except FileNotFoundError:
+                    pass
+        return borradas
@@ -0,0 +1,209 @@
+"""
+Provisión automática de índices MongoDB para las consultas de queries.txt.
+
+Los índices salen de dos fuentes:
+- INDEX_SCHEMA: esquema declarativo (claves de negocio y de unión).
+- Las etapas $lookup de queries.txt: cada foreignField (o igualdad
+  "$campo" == "$$variable" dentro de un sub-pipeline) necesita un índice
+  en la colección "from" para no recorrer la colección por cada documento.
+
+No se crean índices sobre campos que ningún documento de la colección
+tiene (p. ej. un foreignField mal escrito): solo se avisa.
+
+Al final se informa de las consultas que siguen sin estar cubiertas,
+por ejemplo los $lookup con $expr/$in, que MongoDB no resuelve con índices.
+"""
+
+from pymongo import ASCENDING
+
+from mongo_loader import COLLECTION_KEYS, VARIANT_KEY, ensure_key_index
+from mongo_shell_parser import parse_query
+from mongoxml_to_html import load_queries
+
+
+# Índices declarados: coleccion -> lista de claves (tuplas de campos)
+INDEX_SCHEMA = {
+    "patients": [("patient_id",)],
+    "samples": [("sample_id",), ("patient.id",)],
+    "variants": [VARIANT_KEY, ("samples.tumor_sample",), ("gene.symbol",)],
+    "oncokb_genes": [("gene.symbol",)],
+    "uniprot": [("protein.accession",), ("protein.gene",)],
+}
+
+
+# -------------------------------------------------------------
+# ANÁLISIS DE LAS CONSULTAS
+# -------------------------------------------------------------
+def _expr_requirements(expr):
+    """
+    Devuelve (campos indexables, motivos no cubiertos) de un $expr de $match
+    dentro del pipeline de un $lookup.
+    """
+    campos, problemas = [], []
+
+    if isinstance(expr, dict):
+        for op, valor in expr.items():
+            if op == "$and" and isinstance(valor, list):
+                for sub in valor:
+                    c, p = _expr_requirements(sub)
+                    campos += c
+                    problemas += p
+            elif op == "$eq" and isinstance(valor, list) and len(valor) == 2:
+                a, b = valor
+                if isinstance(a, str) and a.startswith("$") and not a.startswith("$$"):
+                    campos.append(a[1:])
+                elif isinstance(b, str) and b.startswith("$") and not b.startswith("$$"):
+                    campos.append(b[1:])
+            else:
+                problemas.append(f"$expr con {op} no puede usar índices")
+
+    return campos, problemas
+
+
+def analyze_pipeline(collection, pipeline, requisitos, problemas):
+    """
+    Recorre un pipeline (y sus sub-pipelines) acumulando:
+    - requisitos: lista de (coleccion, claves) que conviene indexar
+    - problemas: motivos por los que alguna etapa no se puede cubrir
+    """
+    for stage in pipeline:
+        if "$match" in stage:
+            match = stage["$match"]
+            igualdades = tuple(k for k, v in match.items() if not k.startswith("$") and not isinstance(v, dict))
+            if igualdades:
+                requisitos.append((collection, igualdades))
+            if "$expr" in match:
+                campos, motivos = _expr_requirements(match["$expr"])
+                if campos:
+                    requisitos.append((collection, tuple(campos)))
+                problemas += [f"{collection}: {m}" for m in motivos]
+
+        if "$lookup" in stage:
+            lookup = stage["$lookup"]
+            origen = lookup.get("from")
+            if lookup.get("foreignField"):
+                requisitos.append((origen, (lookup["foreignField"],)))
+            if lookup.get("pipeline"):
+                analyze_pipeline(origen, lookup["pipeline"], requisitos, problemas)
+
+
+def analyze_queries(queries_file):
+    """
+    Devuelve {nombre_consulta: {"requisitos": [...], "problemas": [...]}}.
+    """
+    informe = {}
+    for name, raw_query in load_queries(queries_file).items():
+        requisitos, problemas = [], []
+        try:
+            query = parse_query(raw_query)
+            if query.op == "aggregate":
+                analyze_pipeline(query.collection, query.pipeline, requisitos, problemas)
+            elif query.filter:
+                analyze_pipeline(query.collection, [{"$match": query.filter}], requisitos, problemas)
+        except ValueError as e:
+            problemas.append(f"no se pudo analizar: {e}")
+        informe[name] = {"requisitos": requisitos, "problemas": problemas}
+    return informe
+
+
+# -------------------------------------------------------------
+# PLAN Y CREACIÓN DE ÍNDICES
+# -------------------------------------------------------------
+def _cubierto(claves, indices):
+    """
+    Un índice compuesto (a, b) sirve también para consultas sobre (a).
+    """
+    return any(idx[:len(claves)] == claves for idx in indices)
+
+
+def plan_indexes(informe):
+    plan = {col: list(keys) for col, keys in INDEX_SCHEMA.items()}
+    for col, key in COLLECTION_KEYS.items():
+        if not _cubierto(key, plan.setdefault(col, [])):
+            plan[col].append(key)
+
+    for datos in informe.values():
+        for col, claves in datos["requisitos"]:
+            if not _cubierto(claves, plan.setdefault(col, [])):
+                plan[col].append(claves)
+    return plan
+
+
+def ensure_indexes(db, plan, omitir=()):
+    """
+    Crea los índices del plan (create_index no hace nada si ya existen),
+    salvo los (coleccion, claves) de omitir. La clave de negocio de cada
+    colección usa el índice único de mongo_loader.
+    Devuelve la lista de (coleccion, nombre_indice).
+    """
+    creados = []
+    for col, lista in plan.items():
+        for claves in lista:
+            if (col, claves) in omitir:
+                continue
+            if claves == COLLECTION_KEYS.get(col):
+                nombre = ensure_key_index(db[col], claves)
+            else:
+                nombre = db[col].create_index([(k, ASCENDING) for k in claves])
+            creados.append((col, nombre))
+    return creados
+
+
+def uncovered_queries(informe, plan):
+    """
+    Consultas con algún $lookup/$match que los índices no pueden resolver.
+    """
+    pendientes = {}
+    for name, datos in informe.items():
+        motivos = list(datos["problemas"])
+        for col, claves in datos["requisitos"]:
+            if not _cubierto(claves, plan.get(col, [])):
+                motivos.append(f"{col}: falta índice {claves}")
+        if motivos:
+            pendientes[name] = motivos
+    return pendientes
+
+
+def missing_fields(db, col, claves):
+    """
+    Campos de unión que no aparecen en ningún documento de una colección
+    con datos (p. ej. un foreignField que no coincide con el esquema).
+    """
+    if db[col].find_one({}, {"_id": 1}) is None:
+        return []
+    return [k for k in claves if db[col].find_one({k: {"$exists": True}}, {"_id": 1}) is None]
+
+
+def provision_indexes(db, queries_file):
+    informe = analyze_queries(queries_file)
+    plan = plan_indexes(informe)
+
+    # Un índice sobre un campo ausente en todos los documentos no sirve a ninguna consulta
+    omitir = {}
+    for col, lista in plan.items():
+        for claves in lista:
+            ausentes = missing_fields(db, col, claves)
+            if ausentes:
+                omitir[(col, claves)] = ausentes
+    creados = ensure_indexes(db, plan, omitir)
+
+    print(f"🗂️  Índices asegurados: {len(creados)}")
+    for col, nombre in creados:
+        print(f"   - {col}.{nombre}")
+    for (col, claves), ausentes in omitir.items():
+        print(f"   - {col}.{'_'.join(claves)} omitido: ningún documento tiene {', '.join(ausentes)}")
+
+    pendientes = uncovered_queries(informe, plan)
+    for name, datos in informe.items():
+        for col, claves in datos["requisitos"]:
+            ausentes = missing_fields(db, col, claves)
+            if ausentes:
+                pendientes.setdefault(name, []).append(
+                    f"{col}: ningún documento tiene {', '.join(ausentes)} (¿campo mal escrito?)"
+                )
+
+    for name, motivos in pendientes.items():
+        print(f"   ⚠️ Consulta '{name}' sin cubrir del todo:")
+        for m in motivos:
+            print(f"      {m}")
+    return pendientes
@@ -0,0 +1,383 @@
+"""
+Carga incremental de los JSON de cleaned_data en MongoDB.
+
+Sustituye el antiguo delete_many + insert_many por:
+- lectura en streaming del fichero (array JSON o JSON Lines) en lotes,
+- bulk_write no ordenado con upserts por clave de negocio,
+- omisión de documentos cuyo hash de contenido no ha cambiado,
+- opcionalmente, carga en una colección "sombra" que se renombra de
+  forma atómica sobre la original al terminar,
+- deltas del ETL aplicados solo sobre la versión de la que parten
+  (registrada en la colección ETL_META_COLLECTION).
+"""
+
+import hashlib
+import json
+import os
+from itertools import islice
+
+from pymongo import ASCENDING, DeleteMany, ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+
+# Clave de negocio de cada colección (campos con notación de punto).
+# variant_id (gen_inicio_tipo) no es único por sí solo: la misma variante aparece
+# en varias muestras, y en la misma posición puede haber varios alelos (sitios
+# multialélicos, INS/DEL que empiezan en la misma base), uno por fila del MAF.
+VARIANT_KEY = ("variant_id", "samples.tumor_sample", "location.coordinates.end",
+               "alleles.reference", "alleles.tumor.allele1")
+COLLECTION_KEYS = {
+    "patients": ("patient_id",),
+    "samples": ("sample_id",),
+    "variants": VARIANT_KEY,
+    "oncokb_genes": ("gene.symbol",),
+    "uniprot": ("protein.accession",),
+}
+
+HASH_FIELD = "_content_hash"
+DEFAULT_BATCH_SIZE = 1000
+SHADOW_SUFFIX = "__shadow"
+ETL_META_COLLECTION = "_etl_meta"
+
+# Códigos de error de MongoDB
+INDEX_OPTIONS_CONFLICT = (85, 86)
+DUPLICATE_KEY = 11000
+
+
+# -------------------------------------------------------------
+# LECTURA EN STREAMING
+# -------------------------------------------------------------
+def iter_json_documents(path, chunk_size=1 << 20):
+    """
+    Itera los documentos de un fichero JSON sin cargarlo entero:
+    - .jsonl: un documento por línea.
+    - .json: array de documentos (o un único objeto).
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk_size)
+        pos = _skip(buf, 0, " \t\r\n")
+
+        if pos >= len(buf):
+            return
+        if buf[pos] != "[":
+            # Un único objeto: se carga entero como antes
+            yield json.loads(buf[pos:] + f.read())
+            return
+
+        pos += 1
+        eof = False
+        while True:
+            pos = _skip(buf, pos, " \t\r\n,")
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                if pos >= len(buf):
+                    raise json.JSONDecodeError("fin de bloque", buf, pos)
+                doc, pos = decoder.raw_decode(buf, pos)
+                yield doc
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                extra = f.read(chunk_size)
+                eof = not extra
+                buf = buf[pos:] + extra
+                pos = 0
+
+
+def _skip(buf, pos, chars):
+    while pos < len(buf) and buf[pos] in chars:
+        pos += 1
+    return pos
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        lote = list(islice(it, size))
+        if not lote:
+            return
+        yield lote
+
+
+# -------------------------------------------------------------
+# CLAVES Y HASH
+# -------------------------------------------------------------
+def content_hash(doc):
+    data = {k: v for k, v in doc.items() if k not in ("_id", HASH_FIELD)}
+    texto = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def get_path(doc, dotted):
+    valor = doc
+    for parte in dotted.split("."):
+        if not isinstance(valor, dict):
+            return None
+        valor = valor.get(parte)
+    return valor
+
+
+def key_filter(doc, keys):
+    return {k: get_path(doc, k) for k in keys}
+
+
+def _key_tuple(doc, keys):
+    return tuple(json.dumps(get_path(doc, k), default=str) for k in keys)
+
+
+def dedupe_batch(lote, keys):
+    """
+    Un documento por clave (el último): dos upserts de la misma clave en
+    un bulk_write no ordenado podrían insertar los dos.
+    """
+    return list({_key_tuple(d, keys): d for d in lote}.values())
+
+
+def drop_duplicate_keys(col, keys):
+    """
+    Deja un solo documento (el último insertado) por clave. Solo hace falta
+    para colecciones cargadas antes de que el índice fuera único.
+    """
+    grupo = {f"k{i}": f"${k}" for i, k in enumerate(keys)}
+    repetidos = col.aggregate([
+        {"$group": {"_id": grupo, "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ])
+    sobrantes = [i for d in repetidos for i in sorted(d["ids"])[:-1]]
+    for lote in batched(sobrantes, DEFAULT_BATCH_SIZE):
+        col.delete_many({"_id": {"$in": lote}})
+    return len(sobrantes)
+
+
+def ensure_key_index(col, keys):
+    """
+    Índice único sobre la clave de negocio. Si ya existía sin unique (cargas
+    anteriores) se recrea, quitando antes las claves repetidas.
+    Devuelve el nombre del índice.
+    """
+    especificacion = [(k, ASCENDING) for k in keys]
+    try:
+        return col.create_index(especificacion, unique=True)
+    except DuplicateKeyError:
+        pass
+    except OperationFailure as e:
+        if e.code not in INDEX_OPTIONS_CONFLICT and "already exists" not in str(e):
+            raise
+        col.drop_index(especificacion)
+        try:
+            return col.create_index(especificacion, unique=True)
+        except DuplicateKeyError:
+            pass
+
+    print(f"   ⚠️ {col.name}: {drop_duplicate_keys(col, keys)} documentos con clave repetida eliminados")
+    return col.create_index(especificacion, unique=True)
+
+
+def copy_indexes(origen, destino):
+    """
+    Crea en destino los índices de origen (salvo _id), p. ej. los de
+    mongo_indexes antes de renombrar la sombra sobre la colección viva.
+    """
+    existentes = destino.index_information()
+    for info in origen.list_indexes():
+        if info["name"] == "_id_" or info["name"] in existentes:
+            continue
+        opciones = {k: info[k] for k in ("unique", "sparse", "partialFilterExpression") if k in info}
+        destino.create_index(list(info["key"].items()), name=info["name"], **opciones)
+
+
+# -------------------------------------------------------------
+# VERSIÓN DE LOS DATOS (deltas del ETL)
+# -------------------------------------------------------------
+def get_data_version(db, col_name):
+    meta = db[ETL_META_COLLECTION].find_one({"_id": col_name})
+    return meta.get("version") if meta else None
+
+
+def set_data_version(db, col_name, version):
+    db[ETL_META_COLLECTION].replace_one({"_id": col_name}, {"_id": col_name, "version": version}, upsert=True)
+
+
+# -------------------------------------------------------------
+# CARGA CON UPSERTS
+# -------------------------------------------------------------
+def _existing_hashes(col, lote, keys):
+    if len(keys) == 1:
+        filtro = {keys[0]: {"$in": [get_path(d, keys[0]) for d in lote]}}
+    else:
+        filtro = {"$or": [key_filter(d, keys) for d in lote]}
+
+    proyeccion = {k: 1 for k in keys}
+    proyeccion[HASH_FIELD] = 1
+    return {_key_tuple(d, keys): d.get(HASH_FIELD) for d in col.find(filtro, proyeccion)}
+
+
+def upsert_batch(col, lote, keys):
+    """
+    Escribe un lote con ReplaceOne(upsert=True) no ordenado, saltando los
+    documentos cuyo hash coincide con el almacenado.
+    Devuelve (escritos, omitidos).
+    """
+    lote = dedupe_batch(lote, keys)
+    existentes = _existing_hashes(col, lote, keys)
+
+    ops = []
+    for doc in lote:
+        doc[HASH_FIELD] = content_hash(doc)
+        if existentes.get(_key_tuple(doc, keys)) != doc[HASH_FIELD]:
+            ops.append(ReplaceOne(key_filter(doc, keys), doc, upsert=True))
+
+    if ops:
+        col.bulk_write(ops, ordered=False)
+    return len(ops), len(lote) - len(ops)
+
+
+def delete_stale(col, keys, vistos, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Borra los documentos cuya clave no aparecía en el fichero cargado.
+    """
+    proyeccion = {k: 1 for k in keys}
+    obsoletos = (d["_id"] for d in col.find({}, proyeccion) if _key_tuple(d, keys) not in vistos)
+
+    borrados = 0
+    for lote in batched(obsoletos, batch_size):
+        borrados += col.delete_many({"_id": {"$in": lote}}).deleted_count
+    return borrados
+
+
+def load_upsert(db, col_name, path, keys, batch_size=DEFAULT_BATCH_SIZE):
+    col = db[col_name]
+    ensure_key_index(col, keys)
+
+    stats = {"leidos": 0, "escritos": 0, "omitidos": 0, "borrados": 0}
+    vistos = set()
+
+    for lote in batched(iter_json_documents(path), batch_size):
+        escritos, omitidos = upsert_batch(col, lote, keys)
+        stats["leidos"] += len(lote)
+        stats["escritos"] += escritos
+        stats["omitidos"] += omitidos
+        vistos.update(_key_tuple(d, keys) for d in lote)
+
+    if stats["leidos"]:
+        stats["borrados"] = delete_stale(col, keys, vistos, batch_size)
+    return stats
+
+
+# -------------------------------------------------------------
+# CARGA EN COLECCIÓN SOMBRA
+# -------------------------------------------------------------
+def _insert_shadow_batch(shadow, lote, keys):
+    """
+    insert_many no ordenado; las claves que ya estaban en la sombra (de
+    lotes anteriores) se sustituyen, como haría un upsert.
+    """
+    try:
+        shadow.insert_many(lote, ordered=False)
+    except BulkWriteError as e:
+        errores = e.details.get("writeErrors", [])
+        if any(err["code"] != DUPLICATE_KEY for err in errores):
+            raise
+        # insert_many ya les ha asignado un _id que no se puede cambiar en el reemplazo
+        repetidos = [{k: v for k, v in lote[err["index"]].items() if k != "_id"} for err in errores]
+        shadow.bulk_write([ReplaceOne(key_filter(d, keys), d) for d in repetidos], ordered=False)
+
+
+def load_shadow(db, col_name, path, keys, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Carga todo en <col>__shadow y la renombra sobre <col> al final.
+    Las consultas nunca ven la colección vacía ni a medio cargar: la
+    sombra recibe antes del rename los índices de la colección viva.
+    """
+    shadow = db[col_name + SHADOW_SUFFIX]
+    shadow.drop()
+    ensure_key_index(shadow, keys)
+
+    stats = {"leidos": 0, "escritos": 0, "omitidos": 0, "borrados": 0}
+    for lote in batched(iter_json_documents(path), batch_size):
+        stats["leidos"] += len(lote)
+        lote = dedupe_batch(lote, keys)
+        for doc in lote:
+            doc[HASH_FIELD] = content_hash(doc)
+        _insert_shadow_batch(shadow, lote, keys)
+        stats["escritos"] += len(lote)
+
+    if not stats["leidos"]:
+        shadow.drop()
+        return stats
+
+    if col_name in db.list_collection_names():
+        copy_indexes(db[col_name], shadow)
+    shadow.rename(col_name, dropTarget=True)
+    return stats
+
+
+# -------------------------------------------------------------
+# DELTAS (p. ej. oncokb_genes.delta.json)
+# -------------------------------------------------------------
+def read_delta(delta_path):
+    """
+    Delta del ETL, o None si no existe o no se puede leer.
+    """
+    try:
+        with open(delta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def delta_applicable(db, col_name, delta):
+    """
+    Un delta parcial solo sirve si la colección está en una de las versiones
+    de las que parte (o ya en la que produce: reaplicarlo no cambia nada).
+    En otro caso hay que cargar el fichero completo.
+    """
+    if not delta or delta.get("full", True):
+        return False
+    actual = get_data_version(db, col_name)
+    return actual is not None and (actual == delta.get("version") or actual in delta.get("bases", []))
+
+
+def apply_delta(db, col_name, delta_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Aplica un delta {"key", "upserts", "deletes"} generado por el ETL y
+    registra la versión resultante.
+    """
+    with open(delta_path, "r", encoding="utf-8") as f:
+        delta = json.load(f)
+
+    key = delta["key"]
+    col = db[col_name]
+    ensure_key_index(col, (key,))
+
+    stats = {"leidos": len(delta["upserts"]), "escritos": 0, "omitidos": 0, "borrados": 0}
+    for lote in batched(delta["upserts"], batch_size):
+        escritos, omitidos = upsert_batch(col, lote, (key,))
+        stats["escritos"] += escritos
+        stats["omitidos"] += omitidos
+
+    for lote in batched(delta["deletes"], batch_size):
+        res = col.bulk_write([DeleteMany({key: {"$in": lote}})], ordered=False)
+        stats["borrados"] += res.deleted_count
+
+    if delta.get("version"):
+        set_data_version(db, col_name, delta["version"])
+    return stats
+
+
+def resolve_source(path):
+    """
+    Devuelve la ruta a cargar: el .json pedido o, si no existe, su .jsonl.
+    """
+    if os.path.exists(path):
+        return path
+    alternativa = os.path.splitext(path)[0] + ".jsonl"
+    return alternativa if os.path.exists(alternativa) else None
@@ -0,0 +1,474 @@
+"""
+Parser de consultas MongoDB en sintaxis de shell/Compass (queries.txt).
+
+Sustituye al antiguo regex + json.loads, que solo entendía JSON estricto y
+ignoraba todo lo que no fuera el filtro de find. Ahora se admite:
+
+    db.<col>.find(filtro, proyeccion).sort({...}).skip(n).limit(n).hint(...)
+    db.<col>.findOne(filtro, proyeccion)
+    db.<col>.countDocuments(filtro, opciones)
+    db.<col>.estimatedDocumentCount()
+    db.<col>.distinct("campo", filtro)
+    db.<col>.aggregate([...], {allowDiskUse: true, batchSize: 100, ...})
+    db.getCollection("nombre").<op>(...)
+
+con claves sin comillas, cadenas con comillas simples o dobles, comas
+finales, comentarios // y /* */, expresiones regulares /.../i y los
+constructores ISODate, Date, ObjectId, NumberInt, NumberLong,
+NumberDecimal, Timestamp y RegExp.
+
+Filtro, proyección, orden, límites y opciones se pasan a pymongo, de modo
+que se ejecutan en el servidor.
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from bson.int64 import Int64
+from bson.regex import Regex
+from bson.timestamp import Timestamp
+
+
+# Modificadores encadenables tras find() y su nombre en pymongo
+FIND_MODIFIERS = {
+    "sort": "sort",
+    "limit": "limit",
+    "skip": "skip",
+    "hint": "hint",
+    "batchSize": "batch_size",
+    "maxTimeMS": "max_time_ms",
+    "collation": "collation",
+    "comment": "comment",
+    "allowDiskUse": "allow_disk_use",
+    "projection": "projection",
+}
+
+# Modificadores que en el shell se pueden llamar sin argumento
+MODIFIER_DEFAULTS = {"allowDiskUse": True}
+
+AGGREGATE_OPTIONS = ("allowDiskUse", "batchSize", "maxTimeMS", "hint", "collation", "comment", "let")
+
+SUPPORTED_OPS = ("find", "findOne", "aggregate", "countDocuments", "estimatedDocumentCount", "distinct")
+
+
+class MongoShellSyntaxError(ValueError):
+    pass
+
+
+# -------------------------------------------------------------
+# PARSER DE EXPRESIONES
+# -------------------------------------------------------------
+_NUMBER = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?")
+_IDENT = re.compile(r"[A-Za-z_$][\w$]*")
+_KEY = re.compile(r"[A-Za-z_$][\w$.]*")
+_HEX4 = re.compile(r"[0-9A-Fa-f]{4}")
+
+
+class _Parser:
+
+    def __init__(self, text):
+        self.s = text
+        self.i = 0
+
+    # --- utilidades -------------------------------------------------
+    def error(self, msg):
+        fragmento = self.s[max(0, self.i - 20):self.i + 20].replace("\n", " ")
+        raise MongoShellSyntaxError(f"{msg} (posición {self.i}: ...{fragmento}...)")
+
+    def skip_ws(self):
+        while self.i < len(self.s):
+            c = self.s[self.i]
+            if c.isspace():
+                self.i += 1
+            elif self.s.startswith("//", self.i):
+                fin = self.s.find("\n", self.i)
+                self.i = len(self.s) if fin < 0 else fin + 1
+            elif self.s.startswith("/*", self.i):
+                fin = self.s.find("*/", self.i + 2)
+                if fin < 0:
+                    self.error("comentario sin cerrar")
+                self.i = fin + 2
+            else:
+                break
+
+    def peek(self):
+        self.skip_ws()
+        return self.s[self.i] if self.i < len(self.s) else ""
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            self.error(f"se esperaba '{ch}'")
+        self.i += 1
+
+    def accept(self, ch):
+        if self.peek() == ch:
+            self.i += 1
+            return True
+        return False
+
+    def ident(self, pattern=_IDENT):
+        self.skip_ws()
+        m = pattern.match(self.s, self.i)
+        if not m:
+            self.error("se esperaba un identificador")
+        self.i = m.end()
+        return m.group(0)
+
+    def at_end(self):
+        self.skip_ws()
+        return self.i >= len(self.s)
+
+    # --- valores ----------------------------------------------------
+    def value(self):
+        c = self.peek()
+        if c == "{":
+            return self.obj()
+        if c == "[":
+            return self.array()
+        if c in ("'", '"'):
+            return self.string()
+        if c == "/":
+            return self.regex()
+        if c in ("+", "-") and self.s.startswith("Infinity", self.i + 1):
+            self.i += 1 + len("Infinity")
+            return float("-inf") if c == "-" else float("inf")
+        if c and (c.isdigit() or c in "+-."):
+            return self.number()
+        if c:
+            return self.word()
+        self.error("fin inesperado")
+
+    def obj(self):
+        self.expect("{")
+        result = {}
+        while not self.accept("}"):
+            key = self.string() if self.peek() in ("'", '"') else self.ident(_KEY)
+            self.expect(":")
+            result[key] = self.value()
+            if not self.accept(","):
+                self.expect("}")
+                break
+        return result
+
+    def array(self):
+        self.expect("[")
+        result = []
+        while not self.accept("]"):
+            result.append(self.value())
+            if not self.accept(","):
+                self.expect("]")
+                break
+        return result
+
+    def args(self):
+        """
+        Argumentos de una llamada: "(" valor, valor, ... ")".
+        """
+        self.expect("(")
+        result = []
+        while not self.accept(")"):
+            result.append(self.value())
+            if not self.accept(","):
+                self.expect(")")
+                break
+        return result
+
+    def string(self):
+        quote = self.peek()
+        self.i += 1
+        out = []
+        while True:
+            if self.i >= len(self.s):
+                self.error("cadena sin cerrar")
+            c = self.s[self.i]
+            if c == quote:
+                self.i += 1
+                return "".join(out)
+            if c == "\\":
+                # Mismas secuencias de escape que JSON
+                self.i += 1
+                if self.i >= len(self.s):
+                    self.error("cadena sin cerrar")
+                esc = self.s[self.i]
+                if esc == "u":
+                    if not _HEX4.fullmatch(self.s, self.i + 1, self.i + 5):
+                        self.error("escape \\u no válido")
+                    out.append(chr(int(self.s[self.i + 1:self.i + 5], 16)))
+                    self.i += 5
+                    continue
+                out.append(json.loads(f'"\\{esc}"') if esc in 'bfnrt"\\/' else esc)
+                self.i += 1
+                continue
+            out.append(c)
+            self.i += 1
+
+    def number(self):
+        self.skip_ws()
+        m = _NUMBER.match(self.s, self.i)
+        if not m:
+            self.error("número no válido")
+        self.i = m.end()
+        texto = m.group(0)
+        if re.fullmatch(r"[+-]?\d+", texto):
+            return int(texto)
+        return float(texto)
+
+    def regex(self):
+        self.expect("/")
+        inicio = self.i
+        while self.i < len(self.s) and self.s[self.i] != "/":
+            self.i += 2 if self.s[self.i] == "\\" else 1
+        if self.i >= len(self.s):
+            self.error("expresión regular sin cerrar")
+        pattern = self.s[inicio:self.i]
+        self.i += 1
+        m = re.compile(r"[a-z]*").match(self.s, self.i)
+        self.i = m.end()
+        return Regex(pattern, m.group(0))
+
+    def word(self):
+        name = self.ident()
+        literales = {"true": True, "false": False, "null": None, "undefined": None,
+                     "NaN": float("nan"), "Infinity": float("inf")}
+        if name in literales:
+            return literales[name]
+        if name == "new":
+            name = self.ident()
+        if self.peek() != "(":
+            self.error(f"identificador inesperado '{name}'")
+        return _construct(self, name, self.args())
+
+
+def _parse_date(texto):
+    texto = texto.strip()
+    if texto.endswith("Z"):
+        texto = texto[:-1] + "+00:00"
+    fecha = datetime.fromisoformat(texto)
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return fecha
+
+
+def _construct(parser, name, args):
+    try:
+        if name == "ObjectId":
+            return ObjectId(*args)
+        if name in ("ISODate", "Date"):
+            return _parse_date(args[0]) if args else datetime.now(timezone.utc)
+        if name == "NumberInt":
+            return int(args[0])
+        if name == "NumberLong":
+            return Int64(int(args[0]))
+        if name == "NumberDecimal":
+            return Decimal128(str(args[0]))
+        if name == "Timestamp":
+            return Timestamp(*args)
+        if name == "RegExp":
+            return Regex(*args)
+    except Exception as e:
+        parser.error(f"{name}(...) no válido: {e}")
+    parser.error(f"constructor no soportado: {name}")
+
+
+def parse_value(text):
+    """
+    Parsea un único valor en sintaxis de shell ({...}, [...], etc.).
+    """
+    p = _Parser(text)
+    value = p.value()
+    if not p.at_end():
+        p.error("texto sobrante")
+    return value
+
+
+# -------------------------------------------------------------
+# CONSULTA COMPLETA
+# -------------------------------------------------------------
+class MongoQuery:
+    """
+    Consulta ya parseada: colección, operación, argumentos y modificadores
+    encadenados (.sort(), .limit(), ...).
+    """
+
+    def __init__(self, collection, op, args, modifiers=None):
+        self.collection = collection
+        self.op = op
+        self.args = args
+        self.modifiers = modifiers or {}
+
+    def __repr__(self):
+        return f"MongoQuery({self.collection}.{self.op}, args={self.args!r}, modifiers={self.modifiers!r})"
+
+    # --- forma canónica (claves de caché) ---------------------------
+    def canonical(self):
+        """
+        (coleccion, op, argumentos) serializables; los tipos BSON se
+        etiquetan para que ObjectId("x") y "x" no coincidan.
+        """
+        if self.op == "aggregate":
+            material = {"pipeline": self.pipeline, "options": self.options}
+        else:
+            material = {"args": self.args, "modifiers": self.modifiers}
+        texto = json.dumps(material, sort_keys=True, default=lambda o: f"{type(o).__name__}({o})")
+        return self.collection, self.op, json.loads(texto)
+
+    @property
+    def pipeline(self):
+        if self.op != "aggregate":
+            return None
+        if self.args and isinstance(self.args[0], list):
+            return self.args[0]
+        # Forma antigua: aggregate(etapa1, etapa2, ...)
+        return list(self.args)
+
+    @property
+    def options(self):
+        if self.op == "aggregate" and len(self.args) == 2 and isinstance(self.args[0], list):
+            return self.args[1]
+        return {}
+
+    @property
+    def filter(self):
+        if self.op in ("find", "findOne", "countDocuments"):
+            return self.args[0] if self.args else {}
+        if self.op == "distinct":
+            return self.args[1] if len(self.args) > 1 else {}
+        return None
+
+    # --- comando equivalente (explain) -------------------------------
+    def command(self):
+        """
+        Documento del comando de base de datos equivalente, el que recibe
+        {"explain": ...}. countDocuments se expresa como el aggregate
+        $match + $group que ejecuta pymongo.
+        """
+        if self.op in ("find", "findOne"):
+            cmd = {"find": self.collection, "filter": self.filter}
+            if len(self.args) > 1:
+                cmd["projection"] = self.args[1]
+            for nombre, valor in self.modifiers.items():
+                cmd[nombre] = valor
+            if self.op == "findOne":
+                cmd["limit"] = 1
+                cmd["singleBatch"] = True
+            return cmd
+
+        if self.op == "aggregate":
+            opciones = dict(self.options)
+            cursor = {"batchSize": opciones.pop("batchSize")} if "batchSize" in opciones else {}
+            return {"aggregate": self.collection, "pipeline": self.pipeline, "cursor": cursor, **opciones}
+
+        if self.op == "countDocuments":
+            opciones = self.args[1] if len(self.args) > 1 else {}
+            pipeline = [{"$match": self.filter}]
+            if "skip" in opciones:
+                pipeline.append({"$skip": opciones["skip"]})
+            if "limit" in opciones:
+                pipeline.append({"$limit": opciones["limit"]})
+            pipeline.append({"$group": {"_id": 1, "n": {"$sum": 1}}})
+            extra = {k: v for k, v in opciones.items() if k not in ("skip", "limit")}
+            return {"aggregate": self.collection, "pipeline": pipeline, "cursor": {}, **extra}
+
+        if self.op == "estimatedDocumentCount":
+            return {"count": self.collection}
+
+        if self.op == "distinct":
+            return {"distinct": self.collection, "key": self.args[0], "query": self.filter}
+
+        raise MongoShellSyntaxError(f"Operación Mongo no soportada: {self.op}")
+
+    # --- ejecución --------------------------------------------------
+    def execute(self, col, batch_size=None):
+        """
+        Ejecuta la consulta en el servidor y devuelve un iterable de
+        documentos. countDocuments/estimatedDocumentCount devuelven
+        [{"count": n}] y distinct devuelve [{campo: valor}, ...].
+        """
+        if self.op in ("find", "findOne"):
+            kwargs = {FIND_MODIFIERS[k]: v for k, v in self.modifiers.items()}
+            if len(self.args) > 1:
+                kwargs["projection"] = self.args[1]
+            if "sort" in kwargs and isinstance(kwargs["sort"], dict):
+                kwargs["sort"] = list(kwargs["sort"].items())
+            if "hint" in kwargs and isinstance(kwargs["hint"], dict):
+                kwargs["hint"] = list(kwargs["hint"].items())
+            if self.op == "findOne":
+                kwargs["limit"] = 1
+            if batch_size and "batch_size" not in kwargs:
+                kwargs["batch_size"] = batch_size
+            return col.find(self.filter, **kwargs)
+
+        if self.op == "aggregate":
+            opciones = dict(self.options)
+            if batch_size and "batchSize" not in opciones:
+                opciones["batchSize"] = batch_size
+            return col.aggregate(self.pipeline, **opciones)
+
+        if self.op == "countDocuments":
+            opciones = self.args[1] if len(self.args) > 1 else {}
+            return [{"count": col.count_documents(self.filter, **opciones)}]
+
+        if self.op == "estimatedDocumentCount":
+            return [{"count": col.estimated_document_count()}]
+
+        if self.op == "distinct":
+            campo = self.args[0]
+            return [{campo: v} for v in col.distinct(campo, self.filter)]
+
+        raise MongoShellSyntaxError(f"Operación Mongo no soportada: {self.op}")
+
+
+def parse_query(text):
+    """
+    Parsea "db.<col>.<op>(...)[.modificador(...)]*" y devuelve un MongoQuery.
+    """
+    p = _Parser(text.strip().rstrip(";"))
+
+    if p.ident() != "db":
+        p.error("la consulta debe empezar por 'db.'")
+
+    # db.getCollection("x").op(...) o db.<x>.op(...); el nombre puede tener puntos
+    partes = []
+    while p.accept("."):
+        partes.append(p.ident())
+        if p.peek() == "(":
+            break
+    if partes == ["getCollection"]:
+        args = p.args()
+        if len(args) != 1 or not isinstance(args[0], str):
+            p.error("getCollection espera un nombre de colección")
+        collection = args[0]
+        p.expect(".")
+        op = p.ident()
+    elif len(partes) >= 2:
+        collection, op = ".".join(partes[:-1]), partes[-1]
+    else:
+        p.error("se esperaba db.<coleccion>.<operacion>(...)")
+
+    if op not in SUPPORTED_OPS:
+        p.error(f"operación no soportada '{op}'")
+    args = p.args()
+
+    modifiers = {}
+    while p.accept("."):
+        nombre = p.ident()
+        if op not in ("find", "findOne") or nombre not in FIND_MODIFIERS:
+            p.error(f"modificador no soportado '.{nombre}()' tras {op}")
+        margs = p.args()
+        if not margs and nombre in MODIFIER_DEFAULTS:
+            margs = [MODIFIER_DEFAULTS[nombre]]
+        if len(margs) != 1:
+            p.error(f".{nombre}() espera un argumento")
+        modifiers[nombre] = margs[0]
+
+    if not p.at_end():
+        p.error("texto sobrante tras la consulta")
+
+    query = MongoQuery(collection, op, args, modifiers)
+    desconocidas = set(query.options) - set(AGGREGATE_OPTIONS)
+    if desconocidas:
+        raise MongoShellSyntaxError(f"Opciones de aggregate no soportadas: {sorted(desconocidas)}")
+    return query
@@ -9,11 +9,22 @@ a XML válido y semántico, y luego aplica XSLT para generar HTML.
 """
 
 import argparse
-import json
+import copy
+import glob
+import html
+import itertools
 from pymongo import MongoClient
 from lxml import etree
+
+from mongo_shell_parser import parse_query
+from query_explain import DEFAULT_MAX_MS, DEFAULT_MAX_RATIO, print_explain_summary, run_explain
+from query_cache import (DEFAULT_MAX_BYTES, DEFAULT_VERSIONS_FILE, QueryResultCache,
+                         cache_key, load_data_versions)
 import os
 import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 
 # -------------------------------------------------------------
@@ -42,40 +53,84 @@ def load_queries(filepath):
             if line.startswith("[") and line.endswith("]"):
                 current = line[1:-1]
                 queries[current] = ""
+            elif line.startswith("//"):
+                # Comentarios y opciones ("// xslt: ruta.xslt"), ver load_query_options
+                continue
             else:
                 if current:
                     queries[current] += line + "\n"
     return queries
 
 
+def load_query_options(filepath):
+    """
+    Lee las opciones por sección escritas como "// clave: valor", p. ej.:
+
+        [variants_full_info]
+        // xslt: template_variantes.xslt
+        db.variants.aggregate([...])
+
+    Las rutas de "xslt" se resuelven respecto al fichero de consultas.
+    """
+    options = {}
+    current = None
+    base_dir = os.path.dirname(os.path.abspath(filepath))
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                current = line[1:-1]
+                options[current] = {}
+            elif current and line.startswith("//") and ":" in line:
+                key, value = line[2:].split(":", 1)
+                key, value = key.strip().lower(), value.strip()
+                if key == "xslt":
+                    value = os.path.join(base_dir, value)
+                options[current][key] = value
+    return options
+
+
 # -------------------------------------------------------------
 # PARSEADOR DE CONSULTAS MongoDB estilo Compass
 # -------------------------------------------------------------
-def parse_mongo_query(raw_query):
-    raw_query = raw_query.replace("\n", "")
-    match = re.match(r"db\.(\w+)\.(\w+)\((.*)\)", raw_query)
+def query_spec(raw_query):
+    """
+    (coleccion, op, argumentos parseados): forma canónica de la consulta.
+    """
+    return parse_query(raw_query).canonical()
 
-    if not match:
-        raise ValueError(f"Consulta no válida: {raw_query}")
 
-    collection, op, args = match.groups()
-    args = args.strip()
+def parse_mongo_query(raw_query):
+    """
+    Parsea la consulta en sintaxis de shell (ver mongo_shell_parser) y
+    devuelve (coleccion, ejecutor). Filtro, proyección, sort/limit y
+    opciones de aggregate se envían a MongoDB tal cual.
+    """
+    query = parse_query(raw_query)
+    return query.collection, query.execute
+
 
-    # ==============================================================================
-    # FIND
-    # ==============================================================================
-    if op == "find":
-        query = json.loads(args) if args else {}
-        return collection, lambda col: col.find(query)
+# -------------------------------------------------------------
+# EJECUCIÓN CON CACHÉ DE RESULTADOS
+# -------------------------------------------------------------
+def open_query(db, name, raw_query, batch_size=None, cache=None, versions=None):
+    """
+    Devuelve un iterador con los documentos de la consulta. Con caché,
+    si la consulta y la versión de sus colecciones no han cambiado se
+    lee desde disco; si no, se consulta Mongo y se guarda al vuelo.
+    """
+    collection_name, op = parse_mongo_query(raw_query)
 
-    # ==============================================================================
-    # AGGREGATE
-    # ==============================================================================
-    if op == "aggregate":
-        pipeline = json.loads(args)
-        return collection, lambda col: col.aggregate(pipeline)
+    key = None
+    if cache is not None:
+        key = cache_key(*query_spec(raw_query), versions or {})
+        hit = cache.get(key) if key else None
+        if hit is not None:
+            print(f"[INFO] '{name}' servida desde caché")
+            return hit
 
-    raise ValueError(f"Operación Mongo no soportada: {op}")
+    cursor = op(db[collection_name], batch_size=batch_size)
+    return cache.tee(key, cursor) if key else cursor
 
 
 # -------------------------------------------------------------
@@ -109,13 +164,526 @@ def json_to_xml(json_obj):
     return root
 
 
+# -------------------------------------------------------------
+# ESCRITURA XML EN STREAMING
+# -------------------------------------------------------------
+def write_xml_stream(documents, xml_path):
+    """
+    Escribe <root type="list"><element>...</element>...</root> documento
+    a documento con etree.xmlfile, sin construir el árbol completo.
+    La memoria máxima depende del tamaño de un documento, no del total.
+    Devuelve el número de documentos escritos.
+    """
+    n = 0
+    with etree.xmlfile(xml_path, encoding="utf-8") as xf:
+        xf.write_declaration()
+        with xf.element("root", type="list"):
+            xf.write("\n")
+            for doc in documents:
+                node = etree.Element("element")
+                build_xml(node, doc)
+                xf.write(node, pretty_print=True)
+                n += 1
+    return n
+
+
+# -------------------------------------------------------------
+# RENDER DIRECTO JSON → HTML (SIN XML NI XSLT)
+# -------------------------------------------------------------
+# Reproduce la maquetación de template.xslt (tablas anidadas, lista
+# colapsable de "variants") escribiendo el HTML documento a documento
+# directamente desde el cursor.
+
+HTML_HEAD = """<html>
+<head>
+<meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+<title>MongoDB Query Output</title>
+<style>
+    body { font-family: Arial; margin: 20px; }
+    h1 { margin-bottom: 20px; }
+    table { border-collapse: collapse; width: 100%; margin-bottom: 20px; }
+    th, td { border: 1px solid #ccc; padding: 6px; vertical-align: top; }
+    th { background-color: #f0f0f0; }
+    .nested-table { margin: 5px; }
+    .nav { margin: 10px 0; }
+</style>
+<script type="text/javascript">
+    function toggleVisibility(id) {
+      var el = document.getElementById(id);
+      if (!el) return;
+      if (el.style.display === 'none' || el.style.display === '') {
+        el.style.display = 'block';
+      } else {
+        el.style.display = 'none';
+      }
+    }
+</script>
+</head>
+"""
+
+
+def _text(value):
+    """
+    Equivalente a xsl:value-of: concatenación de todo el texto del nodo.
+    """
+    if isinstance(value, dict):
+        return "".join(_text(v) for v in value.values())
+    if isinstance(value, list):
+        return "".join(_text(v) for v in value)
+    return "" if value is None else str(value)
+
+
+class HtmlRenderer:
+    """
+    Traducción a Python de las plantillas de template.xslt.
+    Cada método escribe en `out` (cualquier objeto con write).
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self._ids = itertools.count(1)
+
+    def value(self, key, value, parent):
+        w = self.out.write
+        if isinstance(value, dict):
+            self.render_object(value)
+        elif isinstance(value, list):
+            self.render_list(key, value, parent)
+        else:
+            w(html.escape(_text(value), quote=False))
+
+    def render_object(self, obj):
+        w = self.out.write
+        w('<table class="nested-table">')
+        items = obj.items() if isinstance(obj, dict) else (
+            (("element", v) for v in obj) if isinstance(obj, list) else ()
+        )
+        parent = obj if isinstance(obj, dict) else {}
+        for k, v in items:
+            w("<tr><th>")
+            w(html.escape(normalize_key(k), quote=False))
+            w("</th><td>")
+            self.value(k, v, parent)
+            w("</td></tr>\n")
+        w("</table>")
+
+    def render_list(self, key, items, parent):
+        w = self.out.write
+
+        # CASO ESPECIAL: lista de variantes (colapsable)
+        if key == "variants":
+            vid = f"variants-{next(self._ids)}"
+            w("<div><strong>Variantes: ")
+            w(html.escape(_text(parent.get("variants_count")), quote=False))
+            w(f"</strong><button type=\"button\" onclick=\"toggleVisibility('{vid}')\" "
+              "style=\"margin-left:10px;\">Mostrar / Ocultar</button></div>\n")
+            w(f'<div id="{vid}" style="display:none; margin-top:8px;">')
+            self._object_rows(items)
+            w("</div>")
+
+        # CASO GENÉRICO: lista con algún objeto/lista no vacío
+        elif any(isinstance(v, (dict, list)) and v for v in items):
+            self._object_rows(items)
+
+        # Lista de valores simples
+        else:
+            w("<ul>")
+            for v in items:
+                w("<li>")
+                w(html.escape(_text(v), quote=False))
+                w("</li>")
+            w("</ul>")
+
+    def _object_rows(self, items):
+        w = self.out.write
+        w('<table class="nested-table">')
+        for v in items:
+            w("<tr><td>")
+            self.render_object(v)
+            w("</td></tr>")
+        w("</table>")
+
+    def render_document(self, doc):
+        w = self.out.write
+        w("<tr>")
+        for k, v in doc.items():
+            w("<td>")
+            self.value(k, v, doc)
+            w("</td>")
+        w("</tr>\n")
+
+
+def _tee_xml(documents, xf):
+    for doc in documents:
+        node = etree.Element("element")
+        build_xml(node, doc)
+        xf.write(node, pretty_print=True)
+        yield doc
+
+
+def _header_row(first):
+    # cabecera: claves del primer registro
+    celdas = ""
+    if isinstance(first, dict):
+        celdas = "".join(f"<th>{html.escape(normalize_key(k), quote=False)}</th>" for k in first)
+    return f"<tr>{celdas}</tr>\n"
+
+
+def render_html_stream(documents, html_path, xml_path=None):
+    """
+    Escribe el HTML de la consulta directamente desde los documentos.
+    Si se indica xml_path, se genera también el XML en la misma pasada.
+    Devuelve el número de documentos.
+    """
+    if xml_path:
+        with etree.xmlfile(xml_path, encoding="utf-8") as xf:
+            xf.write_declaration()
+            with xf.element("root", type="list"):
+                xf.write("\n")
+                return render_html_stream(_tee_xml(documents, xf), html_path)
+
+    n = 0
+    with open(html_path, "w", encoding="utf-8") as f:
+        renderer = HtmlRenderer(f)
+        f.write(HTML_HEAD)
+        f.write("<body>\n<h1>Resultados de la consulta</h1>\n<table>\n")
+
+        documents = iter(documents)
+        first = next(documents, None)
+        f.write(_header_row(first))
+
+        if first is not None:
+            for doc in itertools.chain([first], documents):
+                renderer.render_document(doc)
+                n += 1
+
+        f.write("</table>\n</body>\n</html>\n")
+    return n
+
+
+# -------------------------------------------------------------
+# REPORTES PAGINADOS
+# -------------------------------------------------------------
+def page_path(html_path, page):
+    base, ext = os.path.splitext(html_path)
+    return f"{base}_p{page:04d}{ext}"
+
+
+def _nav(html_path, page, has_next):
+    enlaces = []
+    if page > 1:
+        enlaces.append(f'<a href="{os.path.basename(page_path(html_path, page - 1))}">&laquo; Anterior</a>')
+    enlaces.append(f'<a href="{os.path.basename(html_path)}">Índice</a>')
+    enlaces.append(f"Página {page}")
+    if has_next:
+        enlaces.append(f'<a href="{os.path.basename(page_path(html_path, page + 1))}">Siguiente &raquo;</a>')
+    return '<div class="nav">' + " | ".join(enlaces) + "</div>\n"
+
+
+def remove_old_pages(html_path):
+    # Borrar páginas de una ejecución anterior (page_path pasa de cuatro
+    # cifras a partir de la página 10000)
+    base, ext = os.path.splitext(html_path)
+    pagina = re.compile(re.escape(os.path.basename(base)) + r"_p\d{4,}" + re.escape(ext))
+    for old in glob.glob(glob.escape(base) + "_p[0-9]*" + glob.escape(ext)):
+        if pagina.fullmatch(os.path.basename(old)):
+            os.remove(old)
+
+
+def write_page_index(html_path, paginas, n):
+    """
+    Índice de páginas en html_path; paginas = [(primer doc, último doc)].
+    """
+    with open(html_path, "w", encoding="utf-8") as f:
+        f.write(HTML_HEAD)
+        f.write(f"<body>\n<h1>Resultados de la consulta</h1>\n<p>{n} documentos en {len(paginas)} páginas.</p>\n<ul>\n")
+        for page, (desde, hasta) in enumerate(paginas, start=1):
+            enlace = os.path.basename(page_path(html_path, page))
+            f.write(f'<li><a href="{enlace}">Página {page}</a> ({desde}&ndash;{hasta})</li>\n')
+        f.write("</ul>\n</body>\n</html>\n")
+
+
+def render_html_pages(documents, html_path, page_size, xml_path=None):
+    """
+    Divide el resultado en páginas de `page_size` documentos
+    (<name>_p0001.html, ...) con navegación anterior/siguiente, y escribe
+    en html_path un índice de páginas. Solo hay una página en memoria
+    (más un documento de anticipación para saber si existe la siguiente).
+    Devuelve el número de documentos.
+    """
+    if xml_path:
+        with etree.xmlfile(xml_path, encoding="utf-8") as xf:
+            xf.write_declaration()
+            with xf.element("root", type="list"):
+                xf.write("\n")
+                return render_html_pages(_tee_xml(documents, xf), html_path, page_size)
+
+    remove_old_pages(html_path)
+
+    documents = iter(documents)
+    siguiente = next(documents, None)
+    header = _header_row(siguiente)
+
+    paginas = []
+    n = 0
+    while siguiente is not None:
+        lote = [siguiente] + list(itertools.islice(documents, page_size - 1))
+        siguiente = next(documents, None)
+
+        page = len(paginas) + 1
+        nav = _nav(html_path, page, siguiente is not None)
+        with open(page_path(html_path, page), "w", encoding="utf-8") as f:
+            renderer = HtmlRenderer(f)
+            f.write(HTML_HEAD)
+            f.write(f"<body>\n<h1>Resultados de la consulta</h1>\n{nav}<table>\n{header}")
+            for doc in lote:
+                renderer.render_document(doc)
+            f.write(f"</table>\n{nav}</body>\n</html>\n")
+
+        paginas.append((n + 1, n + len(lote)))
+        n += len(lote)
+
+    write_page_index(html_path, paginas, n)
+    return n
+
+
 # -------------------------------------------------------------
 # APLICACIÓN XSLT
 # -------------------------------------------------------------
+_XSLT_CACHE = {}
+_XSLT_LOCK = threading.Lock()
+
+
+def get_xslt(xslt_path):
+    """
+    Devuelve la hoja XSLT compilada, compilándola solo una vez por proceso.
+    La clave es (ruta absoluta, mtime): si el fichero cambia se recompila.
+    """
+    path = os.path.abspath(xslt_path)
+    key = (path, os.path.getmtime(path))
+
+    with _XSLT_LOCK:
+        transform = _XSLT_CACHE.get(key)
+        if transform is None:
+            transform = etree.XSLT(etree.parse(path))
+            for old in [k for k in _XSLT_CACHE if k[0] == path]:
+                del _XSLT_CACHE[old]
+            _XSLT_CACHE[key] = transform
+    return transform
+
+
 def apply_xslt(xml_doc, xslt_path):
-    xslt = etree.parse(xslt_path)
-    transform = etree.XSLT(xslt)
-    return transform(xml_doc)
+    return get_xslt(xslt_path)(xml_doc)
+
+
+# -------------------------------------------------------------
+# EJECUCIÓN DE UNA CONSULTA (FASES)
+# -------------------------------------------------------------
+def query_to_xml(db, name, raw_query, outdir, stream=False, batch_size=None, cache=None, versions=None):
+    """
+    Fase de E/S: ejecuta la consulta en Mongo y escribe <name>.xml.
+    Devuelve (ruta_xml, numero_documentos).
+    """
+    cursor = open_query(db, name, raw_query, batch_size, cache, versions)
+    xml_path = os.path.join(outdir, f"{name}.xml")
+
+    if stream:
+        # Cursor → XML en disco sin pasar por una lista en memoria
+        n = write_xml_stream(cursor, xml_path)
+    else:
+        results = list(cursor)
+        n = len(results)
+
+        # Convertir JSON → XML
+        xml_doc = etree.ElementTree(json_to_xml(results))
+        xml_doc.write(xml_path, pretty_print=True, encoding="utf-8")
+
+    return xml_path, n
+
+
+def query_to_html(db, name, raw_query, outdir, write_xml=False, batch_size=None, page_size=0,
+                  cache=None, versions=None):
+    """
+    Render directo: cursor → HTML sin XML intermedio (salvo write_xml).
+    Con page_size > 0 el HTML se divide en páginas con un índice.
+    Devuelve (ruta_html, numero_documentos).
+    """
+    cursor = open_query(db, name, raw_query, batch_size, cache, versions)
+    html_path = os.path.join(outdir, f"{name}.html")
+    xml_path = os.path.join(outdir, f"{name}.xml") if write_xml else None
+    if page_size:
+        return html_path, render_html_pages(cursor, html_path, page_size, xml_path)
+    return html_path, render_html_stream(cursor, html_path, xml_path)
+
+
+def xml_to_html(xml_path, xslt_path, html_path):
+    """
+    Fase de CPU: aplica la XSLT al XML y escribe el HTML.
+    Se ejecuta en un proceso aparte; devuelve la duración en segundos.
+    """
+    t0 = time.perf_counter()
+    html_doc = apply_xslt(etree.parse(xml_path), xslt_path)
+    html_doc.write(html_path, pretty_print=True, method="html", encoding="utf-8")
+    return time.perf_counter() - t0
+
+
+def iter_xml_pages(xml_path, page_size):
+    """
+    Lee el XML de una consulta con iterparse y devuelve sus documentos
+    (hijos <element> de la raíz) en árboles <root type="list"> de como
+    máximo page_size documentos. Solo hay una página en memoria.
+    """
+    contexto = etree.iterparse(xml_path, events=("start", "end"))
+    _, raiz = next(contexto)
+
+    pagina = None
+    for evento, elem in contexto:
+        if evento != "end" or elem.getparent() is not raiz:
+            continue
+        if pagina is None:
+            pagina = etree.Element("root", type="list")
+        pagina.append(copy.deepcopy(elem))
+        raiz.remove(elem)
+        if len(pagina) == page_size:
+            yield pagina
+            pagina = None
+    if pagina is not None:
+        yield pagina
+
+
+def _html_nav(nav):
+    return etree.fromstring(nav.strip(), etree.HTMLParser()).find(".//div")
+
+
+def xml_to_html_pages(xml_path, xslt_path, html_path, page_size):
+    """
+    Como xml_to_html, pero aplica la XSLT página a página (page_size
+    documentos) con la navegación de render_html_pages y su índice, sin
+    cargar el XML completo. Devuelve la duración en segundos.
+    """
+    t0 = time.perf_counter()
+    transform = get_xslt(xslt_path)
+    remove_old_pages(html_path)
+
+    paginas = []
+    n = 0
+    actual = None
+    for siguiente in itertools.chain(iter_xml_pages(xml_path, page_size), [None]):
+        if actual is not None:
+            page = len(paginas) + 1
+            html_doc = transform(etree.ElementTree(actual))
+            body = html_doc.getroot().find(".//body") if html_doc.getroot() is not None else None
+            if body is not None:
+                # Misma posición que en render_html_pages: tras el título y al final
+                nav = _nav(html_path, page, siguiente is not None)
+                body.insert(1 if len(body) and body[0].tag == "h1" else 0, _html_nav(nav))
+                body.append(_html_nav(nav))
+            html_doc.write(page_path(html_path, page), pretty_print=True, method="html", encoding="utf-8")
+            paginas.append((n + 1, n + len(actual)))
+            n += len(actual)
+        actual = siguiente
+
+    write_page_index(html_path, paginas, n)
+    return time.perf_counter() - t0
+
+
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+
+
+def run_reports(db, queries, query_options, args):
+    """
+    Ejecuta todas las secciones de queries.txt solapando fases:
+    un pool de hilos lanza las consultas Mongo y escribe el XML y, en
+    cuanto una termina, su XSLT pasa a un pool de procesos.
+    Devuelve {nombre: {"docs", "mongo_xml", "xslt", "error"}}.
+    """
+    jobs = max(1, getattr(args, "jobs", DEFAULT_JOBS))
+
+    cache = versions = None
+    if getattr(args, "query_cache", False):
+        cache = QueryResultCache(max_bytes=args.cache_max_mb * 1024 * 1024)
+        versions = load_data_versions(args.data_versions)
+    tiempos = {name: {"docs": None, "mongo_xml": None, "xslt": None, "error": None} for name in queries}
+
+    def fase_mongo(name, raw_query):
+        print(f"[INFO] Ejecutando consulta '{name}'")
+        t0 = time.perf_counter()
+        resultado = query_to_xml(db, name, raw_query, args.outdir, args.stream, args.batch_size,
+                                 cache, versions)
+        return resultado, time.perf_counter() - t0
+
+    def fase_directa(name, raw_query):
+        print(f"[INFO] Ejecutando consulta '{name}' (render directo)")
+        t0 = time.perf_counter()
+        resultado = query_to_html(db, name, raw_query, args.outdir, args.write_xml,
+                                  args.batch_size, args.page_size, cache, versions)
+        return resultado, time.perf_counter() - t0
+
+    # El render directo solo reproduce template.xslt: las secciones con su
+    # propia hoja XSLT siguen por el camino XML → XSLT (paginado por lotes
+    # de documentos con --page-size)
+    directo = {
+        name for name in queries
+        if args.renderer == "direct" and "xslt" not in query_options.get(name, {})
+    }
+
+    with ThreadPoolExecutor(max_workers=jobs) as hilos, ProcessPoolExecutor(max_workers=jobs) as procesos:
+        consultas = {
+            hilos.submit(fase_directa if name in directo else fase_mongo, name, raw_query): name
+            for name, raw_query in queries.items()
+        }
+        transformaciones = {}
+
+        for fut in as_completed(consultas):
+            name = consultas[fut]
+            try:
+                (out_path, n), segundos = fut.result()
+            except Exception as e:
+                tiempos[name]["error"] = str(e)
+                print(f"[ERROR] procesando '{name}': {e}")
+                continue
+
+            tiempos[name].update(docs=n, mongo_xml=segundos)
+            if not n:
+                print(f"[WARN] La consulta '{name}' no devolvió resultados.")
+
+            if name in directo:
+                print(f"[OK] HTML generado: {out_path} ({n} documentos)")
+                continue
+
+            xml_path = out_path
+            print(f"[OK] XML generado: {xml_path} ({n} documentos)")
+
+            xslt_path = query_options.get(name, {}).get("xslt", args.xslt)
+            html_path = os.path.join(args.outdir, f"{name}.html")
+            if args.page_size:
+                fut_xslt = procesos.submit(xml_to_html_pages, xml_path, xslt_path, html_path, args.page_size)
+            else:
+                fut_xslt = procesos.submit(xml_to_html, xml_path, xslt_path, html_path)
+            transformaciones[fut_xslt] = (name, html_path)
+
+        for fut in as_completed(transformaciones):
+            name, html_path = transformaciones[fut]
+            try:
+                tiempos[name]["xslt"] = fut.result()
+                print(f"[OK] HTML generado: {html_path}")
+            except Exception as e:
+                tiempos[name]["error"] = str(e)
+                print(f"[ERROR] procesando '{name}': {e}")
+
+    return tiempos
+
+
+def print_timing_summary(tiempos):
+    print("\n[INFO] Resumen de tiempos por consulta:")
+    print(f"   {'consulta':<30} {'docs':>7} {'mongo+xml':>10} {'xslt':>8}  estado")
+    # En el render directo "mongo+xml" incluye la generación del HTML
+    for name, t in tiempos.items():
+        docs = "-" if t["docs"] is None else t["docs"]
+        mongo = "-" if t["mongo_xml"] is None else f"{t['mongo_xml']:.2f}s"
+        xslt = "-" if t["xslt"] is None else f"{t['xslt']:.2f}s"
+        estado = "ERROR" if t["error"] else "OK"
+        print(f"   {name:<30} {docs:>7} {mongo:>10} {xslt:>8}  {estado}")
 
 
 # -------------------------------------------------------------
@@ -129,15 +697,52 @@ def main():
     parser.add_argument("--queries", required=True)
     parser.add_argument("--xslt", required=True)
     parser.add_argument("--outdir", required=True)
+    parser.add_argument("--stream", action="store_true",
+                        help="Escribe el XML documento a documento desde el cursor "
+                             "(la XSLT posterior carga el XML entero; ver --renderer direct)")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="batch_size del cursor MongoDB")
+    parser.add_argument("--renderer", choices=["xslt", "direct"], default="xslt",
+                        help="xslt: JSON → XML → XSLT; direct: JSON → HTML sin XML intermedio")
+    parser.add_argument("--write-xml", action="store_true",
+                        help="Con --renderer direct, genera también el XML")
+    parser.add_argument("--page-size", type=int, default=0,
+                        help="Documentos por página HTML (0 = un único fichero); implica --renderer direct, "
+                             "las secciones con su propia XSLT se transforman página a página")
+    parser.add_argument("--query-cache", action="store_true",
+                        help="Sirve desde caché local las consultas cuyos datos no han cambiado")
+    parser.add_argument("--data-versions", default=DEFAULT_VERSIONS_FILE,
+                        help="Versiones por colección registradas por la carga (data_versions.json)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Tamaño máximo de la caché de resultados")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help="Consultas (hilos) y transformaciones XSLT (procesos) en paralelo")
+    parser.add_argument("--explain", action="store_true",
+                        help="No genera reportes: guarda explain(\"executionStats\") de cada consulta en --outdir")
+    parser.add_argument("--explain-max-ms", type=float, default=DEFAULT_MAX_MS,
+                        help="Umbral de tiempo en servidor para marcar una consulta como lenta")
+    parser.add_argument("--explain-max-ratio", type=float, default=DEFAULT_MAX_RATIO,
+                        help="Umbral de documentos examinados por documento devuelto")
+    parser.add_argument("--no-tls", action="store_true",
+                        help="Conexión sin TLS (p. ej. un mongod local)")
 
     args = parser.parse_args()
 
+    # La paginación solo es posible generando el HTML en streaming
+    if args.page_size and args.renderer != "direct":
+        print("[INFO] --page-size activa el render directo (sin XSLT)")
+        args.renderer = "direct"
+
+    # La XSLT necesita el árbol completo: --stream solo acota la fase Mongo → XML
+    if args.stream and args.renderer == "xslt":
+        print("[WARN] --stream con --renderer xslt: la transformación carga el XML completo en memoria; "
+              "use --renderer direct para generar el HTML en streaming")
+
     # Conectar a Mongo
     try:
         client = MongoClient(
             args.uri,
-            tls=True,
-            tlsAllowInvalidCertificates=True,
+            **({} if args.no_tls else {"tls": True, "tlsAllowInvalidCertificates": True}),
             serverSelectionTimeoutMS=30000
         )
         db = client[args.db]
@@ -153,6 +758,7 @@ def main():
     # Leer consultas
     try:
         queries = load_queries(args.queries)
+        query_options = load_query_options(args.queries)
     except Exception as e:
         print(f"[ERROR] leyendo queries: {e}")
         return
@@ -160,33 +766,13 @@ def main():
     # Crear carpeta de salida
     os.makedirs(args.outdir, exist_ok=True)
 
-    # Ejecutar cada consulta
-    for name, raw_query in queries.items():
-        print(f"\n[INFO] Ejecutando consulta '{name}'")
-
-        try:
-            collection_name, op = parse_mongo_query(raw_query)
-            results = list(op(db[collection_name]))
-
-            if not results:
-                print(f"[WARN] La consulta '{name}' no devolvió resultados.")
-
-            # Convertir JSON → XML
-            xml_root = json_to_xml(results)
-            xml_doc = etree.ElementTree(xml_root)
-
-            xml_path = os.path.join(args.outdir, f"{name}.xml")
-            xml_doc.write(xml_path, pretty_print=True, encoding="utf-8")
-            print(f"[OK] XML generado: {xml_path}")
-
-            # Aplicar XSLT → HTML
-            html_doc = apply_xslt(xml_doc, args.xslt)
-            html_path = os.path.join(args.outdir, f"{name}.html")
-            html_doc.write(html_path, pretty_print=True, method="html", encoding="utf-8")
-            print(f"[OK] HTML generado: {html_path}")
+    if args.explain:
+        informe = run_explain(db, queries, args.outdir, args.explain_max_ms, args.explain_max_ratio)
+        print_explain_summary(informe)
+        return
 
-        except Exception as e:
-            print(f"[ERROR] procesando '{name}': {e}")
+    tiempos = run_reports(db, queries, query_options, args)
+    print_timing_summary(tiempos)
 
 
 if __name__ == "__main__":
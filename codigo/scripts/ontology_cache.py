@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ontología compilada y cacheada por hash del fichero OWL.
+
+Parsear ontologia.owl (RDF/XML) con rdflib en cada exportación es un coste
+fijo que se repite aunque la ontología no cambie. Aquí se parsea una sola
+vez y se guarda un resumen compacto en .cache/ontology/<sha256>.json:
+- clases (owl:Class con IRI),
+- propiedades objeto y de datos,
+- dominios y rangos por propiedad (las uniones owl:unionOf se expanden),
+- cierre transitivo de rdfs:subClassOf (superclases de cada clase).
+
+Si el fichero OWL cambia, su hash también, y se compila de nuevo.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List
+
+from rdflib import Graph, URIRef
+from rdflib.collection import Collection
+from rdflib.namespace import OWL, RDF, RDFS
+
+from query_cache import file_digest
+
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / ".cache" / "ontology"
+FORMAT_VERSION = 1
+
+
+# =========================
+# Compilación
+# =========================
+
+def _members(g: Graph, node: Any) -> List[str]:
+    """
+    IRIs de un dominio/rango: la propia IRI o, si es un nodo en blanco con
+    owl:unionOf, las de la unión.
+    """
+    if isinstance(node, URIRef):
+        return [str(node)]
+    miembros = []
+    for lista in g.objects(node, OWL.unionOf):
+        for m in Collection(g, lista):
+            miembros += _members(g, m)
+    return miembros
+
+
+def _closure(directas: Dict[str, set]) -> Dict[str, List[str]]:
+    cierre = {}
+    for clase in directas:
+        vistas, pendientes = set(), list(directas[clase])
+        while pendientes:
+            sup = pendientes.pop()
+            if sup not in vistas and sup != clase:
+                vistas.add(sup)
+                pendientes += directas.get(sup, ())
+        cierre[clase] = sorted(vistas)
+    return cierre
+
+
+def compile_ontology(owl_path: str) -> Dict[str, Any]:
+    g = Graph()
+    g.parse(owl_path)
+
+    clases = {str(s) for s in g.subjects(RDF.type, OWL.Class) if isinstance(s, URIRef)}
+
+    directas = {c: set() for c in clases}
+    for s, o in g.subject_objects(RDFS.subClassOf):
+        if isinstance(s, URIRef):
+            directas.setdefault(str(s), set()).update(_members(g, o))
+
+    def por_propiedad(predicado):
+        resultado = {}
+        for s, o in g.subject_objects(predicado):
+            if isinstance(s, URIRef):
+                resultado.setdefault(str(s), set()).update(_members(g, o))
+        return {p: sorted(v) for p, v in sorted(resultado.items())}
+
+    return {
+        "format": FORMAT_VERSION,
+        "source": os.path.basename(owl_path),
+        "classes": sorted(clases),
+        "object_properties": sorted(str(s) for s in g.subjects(RDF.type, OWL.ObjectProperty) if isinstance(s, URIRef)),
+        "datatype_properties": sorted(str(s) for s in g.subjects(RDF.type, OWL.DatatypeProperty) if isinstance(s, URIRef)),
+        "domains": por_propiedad(RDFS.domain),
+        "ranges": por_propiedad(RDFS.range),
+        "superclasses": _closure(directas),
+    }
+
+
+# =========================
+# Caché
+# =========================
+
+def load_ontology(owl_path: str, cache_dir: Path = DEFAULT_CACHE_DIR) -> Dict[str, Any]:
+    """
+    Ontología compilada: desde la caché si ya se compiló este mismo
+    fichero (mismo sha256), si no se compila y se guarda.
+    """
+    digest = file_digest(owl_path)
+    cache_path = Path(cache_dir) / f"{digest}.json"
+
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            ontologia = json.load(f)
+        if ontologia.get("format") == FORMAT_VERSION:
+            return ontologia
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    ontologia = compile_ontology(owl_path)
+    ontologia["sha256"] = digest
+    os.makedirs(cache_path.parent, exist_ok=True)
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(ontologia, f, ensure_ascii=False)
+    os.replace(tmp, cache_path)
+    return ontologia
+
+
+def ontology_properties(ontologia: Dict[str, Any]) -> set:
+    return set(ontologia["object_properties"]) | set(ontologia["datatype_properties"])
@@ -0,0 +1,198 @@
+"""
+Caché local de resultados de las consultas de reportes (queries.txt).
+
+La clave de cada entrada combina la consulta ya parseada (colección,
+operación y argumentos) con la versión de datos de todas las colecciones
+que lee (la base y las de sus $lookup), tal y como la registró el paso de
+carga en data_versions.json. Si no cambia ni la consulta ni los datos,
+el resultado se sirve desde disco sin consultar MongoDB.
+
+Los resultados se guardan como BSON comprimido con gzip (conserva tipos
+como ObjectId o fechas) y la caché se limita por tamaño total,
+eliminando primero las entradas usadas hace más tiempo (LRU).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import bson
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    ".cache", "query_results"
+)
+DEFAULT_VERSIONS_FILE = os.path.join(os.path.dirname(DEFAULT_CACHE_DIR), "data_versions.json")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+# -------------------------------------------------------------
+# VERSIONES DE DATOS (escritas por el paso de carga)
+# -------------------------------------------------------------
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloque in iter(lambda: f.read(chunk_size), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def load_data_versions(path=DEFAULT_VERSIONS_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def record_data_version(collection, source_file, path=DEFAULT_VERSIONS_FILE):
+    """
+    Registra la versión de una colección recién cargada: hash del fichero
+    de origen más la hora de carga.
+    """
+    versions = load_data_versions(path)
+    versions[collection] = {
+        "version": file_digest(source_file),
+        "source": os.path.basename(source_file),
+        "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    }
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(versions, f, indent=4)
+    os.replace(tmp, path)
+
+
+# -------------------------------------------------------------
+# DEPENDENCIAS Y CLAVE
+# -------------------------------------------------------------
+def pipeline_collections(pipeline):
+    """
+    Colecciones leídas por un pipeline: "from" de $lookup/$graphLookup
+    y "coll" de $unionWith, incluidos los sub-pipelines (también los de
+    cada rama de $facet).
+    """
+    colecciones = set()
+    for stage in pipeline or []:
+        facet = stage.get("$facet") if isinstance(stage, dict) else None
+        if isinstance(facet, dict):
+            for rama in facet.values():
+                colecciones |= pipeline_collections(rama)
+        for op in ("$lookup", "$graphLookup", "$unionWith"):
+            spec = stage.get(op) if isinstance(stage, dict) else None
+            if spec is None:
+                continue
+            if isinstance(spec, str):
+                colecciones.add(spec)
+                continue
+            if spec.get("from") or spec.get("coll"):
+                colecciones.add(spec.get("from") or spec.get("coll"))
+            colecciones |= pipeline_collections(spec.get("pipeline"))
+    return colecciones
+
+
+def cache_key(collection, op, args, versions):
+    """
+    Devuelve la clave de la consulta, o None si alguna colección de la que
+    depende no tiene versión registrada (en ese caso no se cachea).
+    """
+    deps = {collection}
+    if op == "aggregate":
+        deps |= pipeline_collections(args["pipeline"] if isinstance(args, dict) else args)
+
+    if any(c not in versions for c in deps):
+        return None
+
+    material = {
+        "collection": collection,
+        "op": op,
+        "args": args,
+        "versions": {c: versions[c]["version"] for c in sorted(deps)}
+    }
+    texto = json.dumps(material, sort_keys=True, default=str)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------
+# ALMACÉN DE RESULTADOS
+# -------------------------------------------------------------
+class QueryResultCache:
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.bson.gz")
+
+    def get(self, key):
+        """
+        Iterador de los documentos guardados, o None si no hay entrada.
+        """
+        path = self._path(key)
+        try:
+            # Se abre ya: aunque otra consulta la expulse, el fichero sigue legible
+            f = gzip.open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # marca de uso para la política LRU
+        return self._read(f)
+
+    @staticmethod
+    def _read(f):
+        with f:
+            yield from bson.decode_file_iter(f)
+
+    def tee(self, key, documents):
+        """
+        Devuelve los documentos tal cual mientras los guarda en la caché.
+        La entrada solo se publica si el iterador se consume entero.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        completo = False
+        try:
+            with gzip.open(tmp, "wb") as f:
+                for doc in documents:
+                    f.write(bson.encode(doc))
+                    yield doc
+            completo = True
+        finally:
+            if completo:
+                os.replace(tmp, path)
+                self.evict()
+            elif os.path.exists(tmp):
+                os.remove(tmp)
+
+    def evict(self):
+        """
+        Borra las entradas menos usadas hasta quedar por debajo de max_bytes.
+        """
+        with self._lock:
+            entradas = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".bson.gz"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entradas.append((st.st_mtime, st.st_size, path))
+
+            total = sum(size for _, size, _ in entradas)
+            for _, size, path in sorted(entradas):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,265 @@
+"""
+Captura de planes de ejecución de las consultas de queries.txt.
+
+Para cada sección se ejecuta explain con verbosidad "executionStats" y se
+resume, etapa a etapa:
+- documentos y claves de índice examinados frente a documentos devueltos,
+- tipo de acceso (COLLSCAN / IXSCAN) y los índices usados,
+- tiempo en el servidor.
+
+Los $lookup de aggregate aparecen como etapas propias (MongoDB 5.0+
+informa de totalDocsExamined, collectionScans e indexesUsed), que es
+donde se ve el coste de un sub-pipeline con $expr/$in. Cuando el motor
+SBE (6.0+) empuja el $lookup al plan, no hay lista "stages": el $lookup
+es un nodo EQ_LOOKUP del queryPlan, y su estrategia dice si la colección
+externa se recorre entera (HashJoin, NestedLoopJoin) o por índice
+(IndexedLoopJoin).
+
+El resultado se guarda como JSON (informe resumido más el explain
+original de cada consulta) y se marcan las consultas que superan los
+umbrales configurados.
+"""
+
+import os
+import time
+
+from bson import json_util
+
+from mongo_shell_parser import parse_query
+
+
+DEFAULT_MAX_MS = 1000
+DEFAULT_MAX_RATIO = 100
+SCAN_STAGES = ("COLLSCAN", "IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "CLUSTERED_IXSCAN", "COUNT_SCAN", "DISTINCT_SCAN")
+INDEXED_LOOKUP_STRATEGIES = ("IndexedLoopJoin", "DynamicIndexedLoopJoin")
+
+
+# -------------------------------------------------------------
+# EJECUCIÓN DEL EXPLAIN
+# -------------------------------------------------------------
+def explain_query(db, raw_query):
+    """
+    Devuelve (explain, segundos medidos en el cliente).
+    """
+    query = parse_query(raw_query)
+    t0 = time.perf_counter()
+    explain = db.command({"explain": query.command(), "verbosity": "executionStats"})
+    return explain, time.perf_counter() - t0
+
+
+# -------------------------------------------------------------
+# RESUMEN DEL PLAN
+# -------------------------------------------------------------
+def _plan_nodes(plan):
+    """
+    Nodos de un árbol de plan, en profundidad. Recorre
+    inputStage/inputStages, el "queryPlan" de SBE y los shards.
+    """
+    if not isinstance(plan, dict):
+        return
+
+    yield plan
+    hijos = []
+    for campo in ("inputStage", "queryPlan", "winningPlan"):
+        if isinstance(plan.get(campo), dict):
+            hijos.append(plan[campo])
+    hijos += plan.get("inputStages") or []
+    hijos += plan.get("shards") or []
+    for hijo in hijos:
+        yield from _plan_nodes(hijo)
+
+
+def _plan_scans(plan):
+    """
+    Etapas de acceso a datos de un árbol de plan: [(etapa, indice)].
+    """
+    return [(n["stage"], n.get("indexName")) for n in _plan_nodes(plan) if n.get("stage") in SCAN_STAGES]
+
+
+def _lookup_stages(plan):
+    """
+    Un resumen por cada $lookup empujado al plan SBE (nodo EQ_LOOKUP). El
+    explain no da documentos examinados de la colección externa, solo la
+    estrategia: fuera de IndexedLoopJoin se recorre entera.
+    """
+    etapas = []
+    for nodo in _plan_nodes(plan):
+        if nodo.get("stage") != "EQ_LOOKUP":
+            continue
+        estrategia = nodo.get("strategy")
+        indexado = estrategia in INDEXED_LOOKUP_STRATEGIES
+        etapas.append({
+            "stage": "EQ_LOOKUP",
+            "collection": nodo.get("foreignCollection"),
+            "access": ["IXSCAN"] if indexado else ["COLLSCAN"],
+            "indexes": [nodo["indexName"]] if nodo.get("indexName") else [],
+            "strategy": estrategia,
+            "docs_examined": None,
+            "keys_examined": None,
+            "n_returned": None,
+            "server_ms": None,
+        })
+    return etapas
+
+
+def _cursor_stage(nombre, explain):
+    """
+    Resumen de la parte "find" de una consulta: el explain de find/distinct
+    o la etapa $cursor de un aggregate.
+    """
+    planner = explain.get("queryPlanner", {})
+    stats = explain.get("executionStats", {})
+    scans = _plan_scans(planner.get("winningPlan", {}))
+
+    return {
+        "stage": nombre,
+        "collection": planner.get("namespace"),
+        "access": sorted({s for s, _ in scans}),
+        "indexes": sorted({i for _, i in scans if i}),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "n_returned": stats.get("nReturned"),
+        "server_ms": stats.get("executionTimeMillis"),
+    }
+
+
+def _pipeline_stage(stage):
+    nombre = next((k for k in stage if k.startswith("$")), "?")
+    spec = stage.get(nombre)
+
+    if nombre == "$cursor":
+        resumen = _cursor_stage(nombre, spec)
+        resumen["server_ms"] = stage.get("executionTimeMillisEstimate", resumen["server_ms"])
+        resumen["n_returned"] = stage.get("nReturned", resumen["n_returned"])
+        return resumen
+
+    acceso = []
+    if stage.get("collectionScans"):
+        acceso.append("COLLSCAN")
+    if stage.get("indexesUsed"):
+        acceso.append("IXSCAN")
+
+    return {
+        "stage": nombre,
+        "collection": spec.get("from") if isinstance(spec, dict) else None,
+        "access": acceso,
+        "indexes": list(stage.get("indexesUsed") or []),
+        "collection_scans": stage.get("collectionScans"),
+        "docs_examined": stage.get("totalDocsExamined"),
+        "keys_examined": stage.get("totalKeysExamined"),
+        "n_returned": stage.get("nReturned"),
+        "server_ms": stage.get("executionTimeMillisEstimate"),
+    }
+
+
+def _suma(etapas, campo):
+    valores = [e[campo] for e in etapas if e.get(campo) is not None]
+    return sum(valores) if valores else None
+
+
+def summarize_explain(explain):
+    """
+    Convierte la salida de explain (find, distinct o aggregate, con o sin
+    etapas separadas) en un resumen uniforme con la lista de etapas y los
+    totales de la consulta.
+    """
+    if "stages" in explain:
+        etapas = []
+        for s in explain["stages"]:
+            etapas.append(_pipeline_stage(s))
+            if "$cursor" in s:
+                etapas += _lookup_stages(s["$cursor"].get("queryPlanner", {}).get("winningPlan", {}))
+        # Los tiempos estimados de aggregate son acumulados: vale el último
+        tiempos = [e["server_ms"] for e in etapas if e["server_ms"] is not None]
+        server_ms = tiempos[-1] if tiempos else None
+        n_returned = next((e["n_returned"] for e in reversed(etapas) if e["n_returned"] is not None), None)
+    else:
+        etapas = [_cursor_stage("find", explain)]
+        etapas += _lookup_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        server_ms = etapas[0]["server_ms"]
+        n_returned = etapas[0]["n_returned"]
+
+    docs = _suma(etapas, "docs_examined")
+    return {
+        "n_returned": n_returned,
+        "docs_examined": docs,
+        "keys_examined": _suma(etapas, "keys_examined"),
+        "ratio": None if docs is None else round(docs / max(n_returned or 0, 1), 2),
+        "collscan": any("COLLSCAN" in e["access"] for e in etapas),
+        "server_ms": server_ms,
+        "stages": etapas,
+    }
+
+
+def check_thresholds(resumen, max_ms=DEFAULT_MAX_MS, max_ratio=DEFAULT_MAX_RATIO):
+    """
+    Motivos por los que la consulta se considera lenta (lista vacía si ninguno).
+    """
+    motivos = []
+    if resumen["server_ms"] is not None and resumen["server_ms"] > max_ms:
+        motivos.append(f"tiempo en servidor {resumen['server_ms']} ms > {max_ms} ms")
+    if resumen["ratio"] is not None and resumen["ratio"] > max_ratio:
+        motivos.append(f"examinados/devueltos {resumen['ratio']} > {max_ratio}")
+    for e in resumen["stages"]:
+        # Un COLLSCAN dentro de $lookup se repite por cada documento de entrada
+        if e["stage"] != "$cursor" and e.get("collection_scans"):
+            motivos.append(f"{e['stage']} sobre {e['collection']}: {e['collection_scans']} COLLSCAN")
+        elif e["stage"] == "EQ_LOOKUP" and "COLLSCAN" in e["access"]:
+            motivos.append(f"$lookup sobre {e['collection']}: COLLSCAN ({e['strategy']})")
+    return motivos
+
+
+# -------------------------------------------------------------
+# INFORME
+# -------------------------------------------------------------
+def run_explain(db, queries, outdir, max_ms=DEFAULT_MAX_MS, max_ratio=DEFAULT_MAX_RATIO):
+    """
+    Ejecuta explain sobre todas las consultas y escribe:
+    - <outdir>/explain_report.json: resumen, umbrales y consultas marcadas
+    - <outdir>/explain/<consulta>.json: salida completa de explain
+    Devuelve el informe.
+    """
+    raw_dir = os.path.join(outdir, "explain")
+    os.makedirs(raw_dir, exist_ok=True)
+
+    informe = {"thresholds": {"max_ms": max_ms, "max_ratio": max_ratio}, "queries": {}}
+    for name, raw_query in queries.items():
+        print(f"[INFO] explain de '{name}'")
+        try:
+            explain, segundos = explain_query(db, raw_query)
+        except Exception as e:
+            print(f"[ERROR] explain de '{name}': {e}")
+            informe["queries"][name] = {"error": str(e)}
+            continue
+
+        with open(os.path.join(raw_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(explain, indent=2))
+
+        resumen = summarize_explain(explain)
+        resumen["client_ms"] = round(segundos * 1000, 1)
+        resumen["flags"] = check_thresholds(resumen, max_ms, max_ratio)
+        informe["queries"][name] = resumen
+
+    with open(os.path.join(outdir, "explain_report.json"), "w", encoding="utf-8") as f:
+        f.write(json_util.dumps(informe, indent=2))
+    return informe
+
+
+def print_explain_summary(informe):
+    print("\n[INFO] Planes de ejecución:")
+    print(f"   {'consulta':<30} {'devueltos':>9} {'examinados':>10} {'ratio':>8} {'ms':>7}  acceso")
+    for name, r in informe["queries"].items():
+        if "error" in r:
+            print(f"   {name:<30} ERROR: {r['error']}")
+            continue
+        acceso = sorted({a for e in r["stages"] for a in e["access"]})
+        print(f"   {name:<30} {str(r['n_returned']):>9} {str(r['docs_examined']):>10} "
+              f"{str(r['ratio']):>8} {str(r['server_ms']):>7}  {'/'.join(acceso) or '-'}")
+
+    marcadas = {n: r["flags"] for n, r in informe["queries"].items() if r.get("flags")}
+    for name, motivos in marcadas.items():
+        print(f"   ⚠️ Consulta '{name}' supera los umbrales:")
+        for m in motivos:
+            print(f"      {m}")
+    if not marcadas:
+        print("   Ninguna consulta supera los umbrales.")
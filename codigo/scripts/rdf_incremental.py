@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Mantenimiento incremental del grafo RDF del reto 5.
+
+En lugar de volver a exportar todo, guarda en un estado local (SQLite) la
+versión y las tripletas de cada documento exportado y, en cada ejecución,
+emite solo las tripletas a borrar y a añadir de los documentos que han
+cambiado, como SPARQL Update o como delta N-Quads.
+
+Los cambios se detectan:
+- con change streams, reanudando desde el resume token guardado
+  (requiere replica set; basta uno local de un nodo), o
+- si no hay token, el servidor no admite change streams o el stream se
+  invalida (drop o rename de la colección, p. ej. la carga en sombra de
+  mongo_loader), recorriendo la colección y comparando la versión de cada
+  documento (_content_hash de mongo_loader o, si no está, el hash de su
+  contenido).
+
+Las tripletas son exactamente las de reto5 --skolemize, que nombra los
+nodos anidados con IRIs skolemizadas (reto5.GenIds): un nodo en blanco no
+se podría identificar en un DELETE DATA. Los deltas solo se pueden
+aplicar a un grafo exportado así.
+
+La primera ejecución no tiene estado, así que su delta contiene la
+exportación completa como inserciones; aplicado sobre el grafo de reto5
+de los mismos datos no cambia nada. Con --seed GRAFO se registra el
+estado sin emitirlas, para cuando GRAFO se acaba de exportar (con
+--skolemize, que se comprueba en su manifest).
+"""
+
+import argparse
+import io
+import os
+import sqlite3
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import bson
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from rdflib import Dataset, Graph, URIRef
+from rdflib.namespace import RDF, RDFS
+
+from mongo_loader import HASH_FIELD, content_hash
+from reto5 import (BASE, TripleWriter, add_document, class_uri, export_collections,
+                   graph_is_skolemized, load_ontology_classes, nt_term)
+
+
+DEFAULT_STATE_DIR = Path(__file__).resolve().parents[2] / ".cache" / "rdf_state"
+DELTA_DELETE = URIRef(f"{str(BASE)}delta/delete")
+DELTA_INSERT = URIRef(f"{str(BASE)}delta/insert")
+
+
+# =========================
+# Tripletas de un documento
+# =========================
+
+def document_triples(collection: str, doc: Dict[str, Any]) -> set:
+    """
+    Conjunto de líneas N-Triples de un documento (sin la declaración de clase),
+    idénticas a las que escribe la exportación completa de reto5 --skolemize.
+    """
+    out = io.StringIO()
+    # classes_in_ont con la clase ya incluida: se declara aparte, una vez por colección
+    add_document(TripleWriter(out), collection, doc, {class_uri(collection)}, skolemize=True)
+    return set(out.getvalue().splitlines())
+
+
+def document_version(doc: Dict[str, Any]) -> str:
+    return doc.get(HASH_FIELD) or content_hash(doc)
+
+
+# =========================
+# Estado local
+# =========================
+
+class RdfState:
+    """
+    Estado de la exportación incremental:
+    - collections: resume token de cada colección exportada
+    - docs: versión y tripletas (comprimidas) de cada documento
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS collections (
+                name TEXT PRIMARY KEY,
+                resume_token BLOB
+            );
+            CREATE TABLE IF NOT EXISTS docs (
+                collection TEXT,
+                doc_id TEXT,
+                version TEXT,
+                triples BLOB,
+                PRIMARY KEY (collection, doc_id)
+            );
+        """)
+
+    def has_collection(self, name: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM collections WHERE name = ?", (name,)).fetchone() is not None
+
+    def resume_token(self, name: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT resume_token FROM collections WHERE name = ?", (name,)).fetchone()
+        if not row or row[0] is None:
+            return None
+        return bson.decode(row[0])
+
+    def set_resume_token(self, name: str, token: Optional[dict]) -> None:
+        valor = bson.encode(token) if token else None
+        self.conn.execute("INSERT OR REPLACE INTO collections (name, resume_token) VALUES (?, ?)", (name, valor))
+
+    def version(self, collection: str, doc_id: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT version FROM docs WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def triples(self, collection: str, doc_id: str) -> set:
+        row = self.conn.execute(
+            "SELECT triples FROM docs WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+        ).fetchone()
+        return set(zlib.decompress(row[0]).decode("utf-8").splitlines()) if row else set()
+
+    def put(self, collection: str, doc_id: str, version: str, triples: set) -> None:
+        datos = zlib.compress("\n".join(sorted(triples)).encode("utf-8"))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO docs (collection, doc_id, version, triples) VALUES (?, ?, ?, ?)",
+            (collection, doc_id, version, datos),
+        )
+
+    def delete(self, collection: str, doc_id: str) -> None:
+        self.conn.execute("DELETE FROM docs WHERE collection = ? AND doc_id = ?", (collection, doc_id))
+
+    def doc_ids(self, collection: str) -> set:
+        return {r[0] for r in self.conn.execute("SELECT doc_id FROM docs WHERE collection = ?", (collection,))}
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+# =========================
+# Detección de cambios
+# =========================
+
+# Eventos tras los que el stream deja de describir la colección: un drop o
+# un rename (la carga en sombra hace rename con dropTarget sobre ella)
+STREAM_RESET_EVENTS = ("invalidate", "drop", "rename", "dropDatabase")
+
+
+def changed_ids_from_stream(col, token: dict):
+    """
+    (ids modificados, nuevo token) desde el resume token, o None si no se
+    puede usar el change stream (standalone, token caducado, colección
+    sustituida...).
+    """
+    ids = set()
+    try:
+        with col.watch(resume_after=token) as stream:
+            while True:
+                cambio = stream.try_next()
+                if cambio is None:
+                    break
+                if cambio.get("operationType") in STREAM_RESET_EVENTS:
+                    print(f"  ⚠️ {col.name}: change stream invalidado ({cambio['operationType']}); "
+                          f"se compara por versiones")
+                    return None
+                if "documentKey" in cambio:
+                    ids.add(cambio["documentKey"]["_id"])
+            return ids, stream.resume_token
+    except PyMongoError as e:
+        print(f"  ⚠️ {col.name}: change stream no disponible ({e}); se compara por versiones")
+        return None
+
+
+def current_resume_token(col) -> Optional[dict]:
+    """
+    Token del momento actual, tomado ANTES de recorrer la colección para
+    que los cambios concurrentes se vean en la siguiente ejecución.
+    """
+    try:
+        with col.watch() as stream:
+            stream.try_next()
+            return stream.resume_token
+    except PyMongoError:
+        return None
+
+
+# =========================
+# Delta
+# =========================
+
+class DeltaWriter:
+    """
+    Acumula en ficheros temporales las líneas a borrar y a añadir y al
+    cerrar escribe el delta como SPARQL Update o como N-Quads (grafos
+    DELTA_DELETE y DELTA_INSERT).
+    """
+
+    def __init__(self, out_path: str, fmt: str = "sparql"):
+        self.out_path = out_path
+        self.fmt = fmt
+        self.borrar = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.anadir = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.n_borrar = 0
+        self.n_anadir = 0
+
+    def delete(self, lineas: Iterable[str]) -> None:
+        for linea in lineas:
+            self.borrar.write(linea + "\n")
+            self.n_borrar += 1
+
+    def insert(self, lineas: Iterable[str]) -> None:
+        for linea in lineas:
+            self.anadir.write(linea + "\n")
+            self.n_anadir += 1
+
+    def _copiar(self, origen, out, grafo: Optional[URIRef]) -> None:
+        origen.seek(0)
+        for linea in origen:
+            linea = linea.rstrip("\n")
+            if grafo is not None:
+                # "<s> <p> <o> ." -> "<s> <p> <o> <g> ."
+                linea = f"{linea[:-1]}<{grafo}> ."
+            out.write(f"  {linea}\n" if grafo is None else f"{linea}\n")
+
+    def close(self) -> None:
+        tmp_path = f"{self.out_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as out:
+            if self.fmt == "sparql":
+                out.write("DELETE DATA {\n")
+                self._copiar(self.borrar, out, None)
+                out.write("} ;\nINSERT DATA {\n")
+                self._copiar(self.anadir, out, None)
+                out.write("}\n")
+            else:
+                self._copiar(self.borrar, out, DELTA_DELETE)
+                self._copiar(self.anadir, out, DELTA_INSERT)
+        os.replace(tmp_path, self.out_path)
+        self.borrar.close()
+        self.anadir.close()
+
+
+def apply_delta(g: Graph, delta_path: str) -> None:
+    """
+    Aplica a un Graph un delta generado por export_incremental.
+    """
+    if delta_path.endswith(".nq"):
+        ds = Dataset()
+        ds.parse(delta_path, format="nquads")
+        for s, p, o in ds.graph(DELTA_DELETE):
+            g.remove((s, p, o))
+        for s, p, o in ds.graph(DELTA_INSERT):
+            g.add((s, p, o))
+    else:
+        g.update(Path(delta_path).read_text(encoding="utf-8"))
+
+
+# =========================
+# Exportación incremental
+# =========================
+
+def _sync_document(state: RdfState, delta: Optional[DeltaWriter], collection: str, doc: Dict[str, Any]) -> bool:
+    """
+    Actualiza el estado del documento y escribe su diferencia en el delta
+    (con delta None solo se registra el estado).
+    """
+    doc_id = str(doc["_id"])
+    version = document_version(doc)
+    if state.version(collection, doc_id) == version:
+        return False
+
+    nuevas = document_triples(collection, doc)
+    if delta is not None:
+        viejas = state.triples(collection, doc_id)
+        delta.delete(sorted(viejas - nuevas))
+        delta.insert(sorted(nuevas - viejas))
+    state.put(collection, doc_id, version, nuevas)
+    return True
+
+
+def _remove_document(state: RdfState, delta: DeltaWriter, collection: str, doc_id: str) -> None:
+    delta.delete(sorted(state.triples(collection, doc_id)))
+    state.delete(collection, doc_id)
+
+
+def export_incremental(
+    mongo_uri: str,
+    db_name: str,
+    ontology_owl: str,
+    out_path: str,
+    include_collections: Optional[Iterable[str]] = None,
+    state_path: Optional[str] = None,
+    fmt: str = "sparql",
+    seed: bool = False,
+) -> Dict[str, int]:
+    """
+    Escribe en out_path el delta desde la ejecución anterior y actualiza el
+    estado. Devuelve {"documentos": cambiados, "borrar": n, "anadir": n}.
+
+    Con seed, las colecciones sin estado se registran sin escribir sus
+    tripletas en el delta: el grafo de reto5 exportado de estos mismos
+    datos ya las contiene.
+    """
+    classes_in_ont = load_ontology_classes(ontology_owl)
+    db = MongoClient(mongo_uri)[db_name]
+    state = RdfState(state_path or str(DEFAULT_STATE_DIR / f"{db_name}.sqlite"))
+    delta = DeltaWriter(out_path, fmt)
+    cambiados = 0
+
+    for col_name in export_collections(db, include_collections):
+        col = db[col_name]
+
+        nueva = not state.has_collection(col_name)
+        destino = None if nueva and seed else delta
+        if nueva and not seed:
+            clase = class_uri(col_name)
+            if clase not in classes_in_ont:
+                delta.insert([f"{nt_term(clase)} {nt_term(RDF.type)} {nt_term(RDFS.Class)} ."])
+
+        token = state.resume_token(col_name)
+        resultado = changed_ids_from_stream(col, token) if token else None
+
+        if resultado is not None:
+            ids, nuevo_token = resultado
+            for _id in ids:
+                doc = col.find_one({"_id": _id})
+                if doc is None:
+                    _remove_document(state, delta, col_name, str(_id))
+                    cambiados += 1
+                else:
+                    cambiados += _sync_document(state, delta, col_name, doc)
+        else:
+            nuevo_token = current_resume_token(col)
+            vistos = set()
+            for doc in col.find():
+                vistos.add(str(doc["_id"]))
+                cambiados += _sync_document(state, destino, col_name, doc)
+            for doc_id in state.doc_ids(col_name) - vistos:
+                _remove_document(state, delta, col_name, doc_id)
+                cambiados += 1
+
+        state.set_resume_token(col_name, nuevo_token)
+        print(f"  ✔ {col_name}: {'change stream' if resultado is not None else 'comparación de versiones'}")
+
+    # El estado solo se confirma si el delta se ha escrito entero
+    delta.close()
+    state.commit()
+    state.close()
+
+    print(f"✔ Delta RDF generado: {out_path}")
+    print(f"✔ Documentos cambiados: {cambiados}  (-{delta.n_borrar} / +{delta.n_anadir} tripletas)")
+    return {"documentos": cambiados, "borrar": delta.n_borrar, "anadir": delta.n_anadir}
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+    ap = argparse.ArgumentParser(description="Reto 5 incremental: delta RDF de los cambios en MongoDB")
+    ap.add_argument("--mongo-uri", required=True)
+    ap.add_argument("--db", required=True)
+    ap.add_argument("--ontology", required=True)
+    ap.add_argument("--collections", default="")
+    ap.add_argument("--format", choices=["sparql", "nq"], default="sparql",
+                    help="sparql: DELETE DATA / INSERT DATA; nq: N-Quads con grafos delete/insert")
+    ap.add_argument("--out", default=None)
+    ap.add_argument("--state", default=None,
+                    help="Fichero de estado (por defecto .cache/rdf_state/<db>.sqlite)")
+    ap.add_argument("--seed", default=None, metavar="GRAFO",
+                    help="Registra el estado de las colecciones nuevas sin emitir sus tripletas: "
+                         "GRAFO se acaba de exportar de los mismos datos con reto5 --skolemize")
+
+    args = ap.parse_args()
+    if args.seed and not graph_is_skolemized(args.seed):
+        ap.error(f"--seed: {args.seed} no se exportó con reto5 --skolemize (o falta su manifest)")
+
+    BASE_DIR = Path(__file__).resolve().parents[2]
+    RESULTS_DIR = BASE_DIR / "resultados" / "reto5"
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    extension = ".ru" if args.format == "sparql" else ".nq"
+    out_path = RESULTS_DIR / f"grafo_melanoma.delta{extension}" if args.out is None else Path(args.out)
+    cols = [c.strip() for c in args.collections.split(",") if c.strip()] or None
+
+    export_incremental(
+        mongo_uri=args.mongo_uri,
+        db_name=args.db,
+        ontology_owl=args.ontology,
+        out_path=str(out_path),
+        include_collections=cols,
+        state_path=args.state,
+        fmt=args.format,
+        seed=args.seed is not None,
+    )
+
+
+if __name__ == "__main__":
+    main()
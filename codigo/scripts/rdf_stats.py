@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Índice de estadísticas del grafo (estilo VoID) generado por reto5.
+
+Mientras se exporta el grafo se acumulan:
+- particiones de clase: clase -> entidades distintas (void:classPartition),
+- particiones de propiedad: propiedad -> tripletas, con el desglose por
+  tipo de objeto IRI / nodo en blanco / literal (void:propertyPartition),
+- mapa instancia -> clases (solo sujetos IRI).
+
+Se guarda junto al grafo como <grafo>.stats.json, con el tamaño y fecha
+del fichero para detectar si ha quedado desfasado. reto6 responde desde
+aquí las consultas de esquema de Consultas_SPARQL.txt (1 a 3) sin
+recorrer las tripletas. La Consulta 4 devuelve los propios valores
+literales, que no caben en un índice resumido, y se sigue evaluando
+contra el grafo.
+"""
+
+import json
+import os
+from typing import Any, Dict, Optional
+
+from rdflib import BNode, Literal, URIRef, Variable
+from rdflib.namespace import OWL, RDF
+
+from sparql_cache import normalize_query
+
+
+# =========================
+# Acumulación durante la exportación
+# =========================
+
+class GraphStats:
+    """
+    Se alimenta con add(tripleta) (misma interfaz que Graph/TripleWriter).
+    Usa conjuntos, así que las tripletas repetidas no cuentan dos veces en
+    clases e instancias; los contadores de propiedades son de tripletas
+    escritas. Los de varios procesos se combinan con update().
+    """
+
+    def __init__(self):
+        self.triples = 0
+        self.class_members: Dict[str, set] = {}
+        self.properties: Dict[str, list] = {}
+        self.instances: Dict[str, set] = {}
+
+    def add(self, triple) -> None:
+        s, p, o = triple
+        self.triples += 1
+
+        conteo = self.properties.get(p)
+        if conteo is None:
+            conteo = self.properties[p] = [0, 0, 0]
+        conteo[2 if isinstance(o, Literal) else 1 if isinstance(o, BNode) else 0] += 1
+
+        if p == RDF.type:
+            self.class_members.setdefault(str(o), set()).add(str(s))
+            if isinstance(s, URIRef):
+                self.instances.setdefault(str(s), set()).add(str(o))
+
+    def update(self, other: "GraphStats") -> None:
+        self.triples += other.triples
+        for p, (iri, bnode, lit) in other.properties.items():
+            conteo = self.properties.setdefault(p, [0, 0, 0])
+            conteo[0] += iri
+            conteo[1] += bnode
+            conteo[2] += lit
+        for clase, miembros in other.class_members.items():
+            self.class_members.setdefault(clase, set()).update(miembros)
+        for inst, clases in other.instances.items():
+            self.instances.setdefault(inst, set()).update(clases)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "triples": self.triples,
+            "classes": {c: {"entities": len(m)} for c, m in sorted(self.class_members.items())},
+            "properties": {
+                str(p): {"triples": sum(c), "iri_objects": c[0], "bnode_objects": c[1], "literal_objects": c[2]}
+                for p, c in sorted(self.properties.items())
+            },
+            "instances": {i: sorted(c) for i, c in sorted(self.instances.items())},
+        }
+
+
+def collect_stats(triples) -> GraphStats:
+    stats = GraphStats()
+    for t in triples:
+        stats.add(t)
+    return stats
+
+
+def stats_path(graph_path: str) -> str:
+    return f"{graph_path}.stats.json"
+
+
+def write_graph_stats(graph_path: str, stats: GraphStats) -> None:
+    st = os.stat(graph_path)
+    datos = {"file": os.path.basename(graph_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    datos.update(stats.to_dict())
+    with open(stats_path(graph_path), "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+
+
+def load_graph_stats(graph_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Índice del grafo, o None si no existe o no corresponde al fichero actual.
+    """
+    try:
+        st = os.stat(graph_path)
+        with open(stats_path(graph_path), "r", encoding="utf-8") as f:
+            datos = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if datos.get("size") != st.st_size or datos.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return datos
+
+
+# =========================
+# Consultas de esquema
+# =========================
+
+CONSULTA_CLASES = """
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+SELECT DISTINCT ?clase
+WHERE { ?individuo rdf:type ?clase . }
+ORDER BY ?clase
+"""
+
+CONSULTA_INSTANCIAS = """
+PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+PREFIX owl: <http://www.w3.org/2002/07/owl#>
+SELECT DISTINCT ?individuo ?clase
+WHERE {
+  ?individuo rdf:type ?clase .
+  FILTER (
+    !isBlank(?individuo) &&
+    ?clase != owl:Class &&
+    ?clase != owl:ObjectProperty &&
+    ?clase != owl:DatatypeProperty &&
+    ?clase != rdf:Property
+  )
+}
+ORDER BY ?clase
+"""
+
+CONSULTA_PROPIEDADES_OBJETO = """
+SELECT DISTINCT ?propiedad
+WHERE { ?sujeto ?propiedad ?objeto . FILTER (!isLiteral(?objeto)) }
+ORDER BY ?propiedad
+"""
+
+TIPOS_EXCLUIDOS = {str(OWL.Class), str(OWL.ObjectProperty), str(OWL.DatatypeProperty), str(RDF.Property)}
+
+
+class StatsResult:
+    """
+    Resultado SELECT con la interfaz que usan los escritores de reto6
+    (vars, type e iteración por filas).
+    """
+    type = "SELECT"
+
+    def __init__(self, vars_, rows):
+        self.vars = [Variable(v) for v in vars_]
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _clases(datos):
+    return StatsResult(["clase"], [(URIRef(c),) for c in sorted(datos["classes"])])
+
+
+def _instancias(datos):
+    filas = [
+        (URIRef(i), URIRef(c))
+        for i, clases in datos["instances"].items()
+        for c in clases if c not in TIPOS_EXCLUIDOS
+    ]
+    filas.sort(key=lambda f: (str(f[1]), str(f[0])))
+    return StatsResult(["individuo", "clase"], filas)
+
+
+def _propiedades_objeto(datos):
+    props = sorted(p for p, c in datos["properties"].items() if c["iri_objects"] or c["bnode_objects"])
+    return StatsResult(["propiedad"], [(URIRef(p),) for p in props])
+
+
+def _canonical(query: str) -> str:
+    # Los espacios junto a llaves, paréntesis y puntos no cambian la consulta
+    texto = normalize_query(query)
+    for signo in ("{", "}", "(", ")", "."):
+        texto = texto.replace(f" {signo}", signo).replace(f"{signo} ", signo)
+    return texto
+
+
+SCHEMA_QUERIES = {
+    _canonical(CONSULTA_CLASES): _clases,
+    _canonical(CONSULTA_INSTANCIAS): _instancias,
+    _canonical(CONSULTA_PROPIEDADES_OBJETO): _propiedades_objeto,
+}
+
+
+def is_schema_query(query: str) -> bool:
+    return _canonical(query) in SCHEMA_QUERIES
+
+
+def answer_from_stats(datos: Dict[str, Any], query: str) -> Optional[StatsResult]:
+    """
+    Resultado de la consulta a partir del índice si es una de las de
+    esquema conocidas; None en cualquier otro caso.
+    """
+    responder = SCHEMA_QUERIES.get(_canonical(query))
+    return None if responder is None else responder(datos)
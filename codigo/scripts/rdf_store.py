@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Almacén RDF persistente para el reto 6.
+
+reto6 parseaba grafo_melanoma.ttl entero en un Graph en memoria en cada
+ejecución, y el parseo dominaba el tiempo total. Aquí el grafo se carga
+una sola vez en un fichero SQLite que luego se abre en milisegundos.
+
+SQLiteStore es un Store de rdflib, así que el motor SPARQL de rdflib y
+los resultados de g.query() no cambian. Cada término se guarda una sola
+vez en la tabla "terms"; las tripletas son tres enteros con tres índices
+(SPO, POS y OSP), de modo que cualquier patrón con algún término fijo se
+resuelve con un índice.
+
+El almacén recuerda la huella (tamaño y fecha) del fichero de origen;
+si el fichero cambia, se reconstruye.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Optional
+
+from rdflib import BNode, Dataset, Graph, Literal, URIRef
+from rdflib.store import Store, VALID_STORE
+
+
+DEFAULT_STORE_DIR = Path(__file__).resolve().parents[2] / ".cache" / "rdf_store"
+FLUSH_EVERY = 20000
+CACHE_MAX = 200000
+
+
+# =========================
+# Codificación de términos
+# =========================
+
+def encode_term(term: Any) -> str:
+    if isinstance(term, URIRef):
+        return "U" + str(term)
+    if isinstance(term, BNode):
+        return "B" + str(term)
+    if isinstance(term, Literal):
+        return "L" + json.dumps([str(term), str(term.datatype or ""), term.language or ""], ensure_ascii=False)
+    raise TypeError(f"Término RDF no soportado: {term!r}")
+
+
+def decode_term(key: str) -> Any:
+    tipo, valor = key[0], key[1:]
+    if tipo == "U":
+        return URIRef(valor)
+    if tipo == "B":
+        return BNode(valor)
+    lex, datatype, lang = json.loads(valor)
+    return Literal(lex, datatype=datatype or None, lang=lang or None)
+
+
+# =========================
+# Store SQLite
+# =========================
+
+class SQLiteStore(Store):
+    """
+    Store de rdflib sin contextos sobre SQLite. Las inserciones se agrupan
+    en lotes (executemany) y se vuelcan antes de cualquier lectura.
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration: Optional[str] = None, identifier=None):
+        self.conn: Optional[sqlite3.Connection] = None
+        self._ids = {}
+        self._terms = {}
+        self._pendientes = []
+        super().__init__(configuration, identifier)
+
+    # --- ciclo de vida -----------------------------------------------
+    def open(self, configuration: str, create: bool = False):
+        if not create and not os.path.exists(configuration):
+            raise FileNotFoundError(configuration)
+        self.conn = sqlite3.connect(configuration, check_same_thread=False)
+        self.conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL);
+            CREATE TABLE IF NOT EXISTS triples (
+                s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL,
+                PRIMARY KEY (s, p, o)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS triples_pos ON triples (p, o, s);
+            CREATE INDEX IF NOT EXISTS triples_osp ON triples (o, s, p);
+            CREATE TABLE IF NOT EXISTS namespaces (prefix TEXT PRIMARY KEY, uri TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction: bool = False):
+        if self.conn is not None:
+            self.commit()
+            self.conn.close()
+            self.conn = None
+
+    def commit(self):
+        self._flush()
+        self.conn.commit()
+
+    # --- metadatos ---------------------------------------------------
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # --- términos ----------------------------------------------------
+    def _term_id(self, term: Any, create: bool = False) -> Optional[int]:
+        key = encode_term(term)
+        if key in self._ids:
+            return self._ids[key]
+        if create:
+            self.conn.execute("INSERT OR IGNORE INTO terms (key) VALUES (?)", (key,))
+        row = self.conn.execute("SELECT id FROM terms WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if len(self._ids) > CACHE_MAX:
+            self._ids.clear()
+        self._ids[key] = row[0]
+        return row[0]
+
+    def _term(self, term_id: int) -> Any:
+        term = self._terms.get(term_id)
+        if term is None:
+            key = self.conn.execute("SELECT key FROM terms WHERE id = ?", (term_id,)).fetchone()[0]
+            term = decode_term(key)
+            if len(self._terms) > CACHE_MAX:
+                self._terms.clear()
+            self._terms[term_id] = term
+        return term
+
+    # --- escritura ---------------------------------------------------
+    def add(self, triple, context=None, quoted: bool = False):
+        Store.add(self, triple, context, quoted)
+        self._pendientes.append(tuple(self._term_id(t, create=True) for t in triple))
+        if len(self._pendientes) >= FLUSH_EVERY:
+            self._flush()
+
+    def addN(self, quads):
+        for s, p, o, c in quads:
+            self.add((s, p, o), c)
+
+    def _flush(self):
+        if self._pendientes:
+            self.conn.executemany("INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)", self._pendientes)
+            self._pendientes = []
+
+    def remove(self, triple_pattern, context=None):
+        self._flush()
+        where, params = self._where(triple_pattern)
+        if where is None:
+            return
+        Store.remove(self, triple_pattern, context)
+        self.conn.execute(f"DELETE FROM triples{where}", params)
+
+    # --- lectura -----------------------------------------------------
+    def _where(self, triple_pattern):
+        """
+        Cláusula WHERE del patrón, o (None, None) si algún término fijo no
+        existe en el almacén (el patrón no puede tener resultados).
+        """
+        condiciones, params = [], []
+        for columna, term in zip(("s", "p", "o"), triple_pattern):
+            if term is None:
+                continue
+            term_id = self._term_id(term)
+            if term_id is None:
+                return None, None
+            condiciones.append(f"{columna} = ?")
+            params.append(term_id)
+        return (" WHERE " + " AND ".join(condiciones) if condiciones else ""), params
+
+    def triples(self, triple_pattern, context=None):
+        self._flush()
+        where, params = self._where(triple_pattern)
+        if where is None:
+            return
+        for s, p, o in self.conn.execute(f"SELECT s, p, o FROM triples{where}", params):
+            yield (self._term(s), self._term(p), self._term(o)), iter(())
+
+    def __len__(self, context=None) -> int:
+        self._flush()
+        return self.conn.execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    # --- espacios de nombres -----------------------------------------
+    def bind(self, prefix: str, namespace, override: bool = True):
+        if not override and self.namespace(prefix) is not None:
+            return
+        self.conn.execute("DELETE FROM namespaces WHERE uri = ?", (str(namespace),))
+        self.conn.execute("INSERT OR REPLACE INTO namespaces (prefix, uri) VALUES (?, ?)", (prefix, str(namespace)))
+
+    def namespace(self, prefix: str):
+        row = self.conn.execute("SELECT uri FROM namespaces WHERE prefix = ?", (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace):
+        row = self.conn.execute("SELECT prefix FROM namespaces WHERE uri = ?", (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, uri in self.conn.execute("SELECT prefix, uri FROM namespaces").fetchall():
+            yield prefix, URIRef(uri)
+
+
+# =========================
+# Construcción y apertura
+# =========================
+
+def source_fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def default_store_path(graph_path: str) -> str:
+    nombre = Path(graph_path).name.split(".")[0]
+    return str(DEFAULT_STORE_DIR / f"{nombre}.sqlite")
+
+
+def open_store(store_path: str) -> Graph:
+    store = SQLiteStore()
+    store.open(store_path, create=False)
+    # Sin enlazar los prefijos por defecto: el almacén ya tiene los del
+    # grafo y enlazarlos escribiría en él, bloqueando a los demás lectores
+    return Graph(store=store, bind_namespaces="none")
+
+
+def _open_source(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+GRAPH_FORMATS = {".nt": "nt", ".nq": "nquads", ".ttl": "turtle"}
+
+
+def guess_format(graph_path: str) -> str:
+    """
+    Formato rdflib según la extensión del grafo (sin contar .gz); turtle
+    si no se reconoce.
+    """
+    nombre = graph_path[:-3] if graph_path.endswith(".gz") else graph_path
+    return GRAPH_FORMATS.get(Path(nombre).suffix, "turtle")
+
+
+def parse_graph(g: Graph, graph_path: str, fmt: Optional[str] = None) -> Graph:
+    """
+    Añade a g las tripletas del grafo de reto5 (Turtle, N-Triples o
+    N-Quads, con o sin .gz). Con fmt None se deduce de la extensión.
+    """
+    fmt = fmt or guess_format(graph_path)
+    if fmt == "nquads":
+        # Grafo sin contextos: las tripletas de todos los grafos van al grafo por defecto
+        ds = Dataset()
+        with _open_source(graph_path) as f:
+            ds.parse(f, format="nquads")
+        for s, p, o, _ in ds.quads((None, None, None, None)):
+            g.add((s, p, o))
+    else:
+        with _open_source(graph_path) as f:
+            g.parse(f, format=fmt)
+    return g
+
+
+def build_store(graph_path: str, store_path: str, fmt: Optional[str] = None) -> Graph:
+    """
+    Parsea el grafo de reto5 (ver parse_graph) en un almacén nuevo. Se
+    construye en un fichero temporal que sustituye al anterior solo al
+    terminar.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+    tmp_path = f"{store_path}.tmp"
+    for sufijo in ("", "-wal", "-shm"):
+        if os.path.exists(tmp_path + sufijo):
+            os.remove(tmp_path + sufijo)
+
+    store = SQLiteStore()
+    store.open(tmp_path, create=True)
+    parse_graph(Graph(store=store), graph_path, fmt)
+
+    store.set_meta("source", source_fingerprint(graph_path))
+    store.close()
+    os.replace(tmp_path, store_path)
+    for sufijo in ("-wal", "-shm"):
+        if os.path.exists(tmp_path + sufijo):
+            os.remove(tmp_path + sufijo)
+    return open_store(store_path)
+
+
+def load_store(graph_path: str, store_path: Optional[str] = None, fmt: Optional[str] = None,
+               rebuild: bool = False) -> Graph:
+    """
+    Abre el almacén del grafo; lo (re)construye si no existe, si se pide
+    o si el fichero de origen ha cambiado desde la última construcción.
+    """
+    store_path = store_path or default_store_path(graph_path)
+
+    if not rebuild and os.path.exists(store_path):
+        g = open_store(store_path)
+        if not os.path.exists(graph_path) or g.store.get_meta("source") == source_fingerprint(graph_path):
+            return g
+        print("El grafo de origen ha cambiado: se reconstruye el almacén")
+        g.close()
+
+    print(f"Construyendo almacén RDF: {store_path}")
+    return build_store(graph_path, store_path, fmt)
@@ -2,16 +2,26 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime, date
+from functools import lru_cache
 from typing import Any, Dict, Iterable, Optional
 
 from pymongo import MongoClient
 from bson import ObjectId, DBRef
 
-from rdflib import Graph, Namespace, URIRef, BNode, Literal
+from rdflib import Dataset, Graph, Namespace, URIRef, BNode, Literal
 from rdflib.namespace import RDF, RDFS, OWL, XSD
 
+from ontology_cache import load_ontology
+from rdf_stats import GraphStats, collect_stats, write_graph_stats
+
 
 # =========================
 # Namespaces
@@ -25,6 +35,10 @@ BASE = Namespace("http://example.org/melanoma_es/")  # individuos
 # Utilidades
 # =========================
 
+# El número de claves distintas es muy pequeño frente al de documentos:
+# predicados, clases y pistas de colección se calculan una vez por clave.
+
+@lru_cache(maxsize=None)
 def safe_predicate(ns: Namespace, key: str) -> URIRef:
     key = key.strip().replace(" ", "_")
     key = "".join(ch for ch in key if ch.isalnum() or ch in ["_", "-"])
@@ -33,8 +47,63 @@ def safe_predicate(ns: Namespace, key: str) -> URIRef:
     return ns[key]
 
 
+@lru_cache(maxsize=None)
+def key_hint(key: str) -> Optional[str]:
+    """
+    Colección a la que apunta una clave terminada en "id"/"_id"
+    (p. ej. "patient_id" -> "patient"), o None.
+    """
+    if not key.lower().endswith(("id", "_id")):
+        return None
+    hint = key[:-2] if key.lower().endswith("id") else key[:-3]
+    return hint.strip("_").lower() or None
+
+
+@lru_cache(maxsize=None)
+def class_uri(collection: str) -> URIRef:
+    return MEL[collection]
+
+
+@lru_cache(maxsize=None)
+def _uri_prefix(collection: str) -> str:
+    return f"{str(BASE)}{collection}/"
+
+
 def doc_uri(collection: str, _id: Any) -> URIRef:
-    return URIRef(f"{str(BASE)}{collection}/{str(_id)}")
+    return URIRef(f"{_uri_prefix(collection)}{str(_id)}")
+
+
+class GenIds:
+    """
+    Nodos anidados de un documento (subdocumentos sin _id) con skolemize:
+    en lugar de nodos en blanco, IRIs skolemizadas deterministas (RDF 1.1,
+    /.well-known/genid/<colección>/<_id>/<n>, n = orden de aparición).
+    Así la exportación completa y los deltas de rdf_incremental nombran
+    igual los mismos nodos y un DELETE DATA puede borrarlos. Solo hace
+    falta si el grafo se mantiene con rdf_incremental: las consultas que
+    distinguen individuos con isBlank ven estos nodos como IRIs.
+    """
+    __slots__ = ("prefix", "n")
+
+    def __init__(self, collection: str, _id: Any):
+        self.prefix = f"{str(BASE)}.well-known/genid/{collection}/{str(_id)}/"
+        self.n = 0
+
+    def __call__(self) -> URIRef:
+        uri = URIRef(f"{self.prefix}{self.n}")
+        self.n += 1
+        return uri
+
+
+@lru_cache(maxsize=4096)
+def compile_shape(keys: tuple) -> tuple:
+    """
+    Precompila la forma de un documento (la tupla de sus claves) en la lista
+    plana de operaciones (clave, predicado, pista) que aplican add_document y
+    add_value. Los documentos de una colección comparten casi siempre forma,
+    así que en la práctica hay una entrada por colección y nivel de anidación.
+    """
+    return tuple((k, safe_predicate(MEL, k), key_hint(k)) for k in keys if k != "_id")
 
 
 def is_primitive(v: Any) -> bool:
@@ -42,6 +111,20 @@ def is_primitive(v: Any) -> bool:
 
 
 def to_literal(v: Any) -> Literal:
+    # Los valores repetidos (estados, tipos, genes...) reutilizan el mismo Literal
+    try:
+        return _cached_literal(type(v), v)
+    except TypeError:
+        return _make_literal(v)
+
+
+@lru_cache(maxsize=65536)
+def _cached_literal(_tipo: type, v: Any) -> Literal:
+    # El tipo forma parte de la clave: True == 1 pero sus literales difieren
+    return _make_literal(v)
+
+
+def _make_literal(v: Any) -> Literal:
     if v is None:
         return Literal("", datatype=XSD.string)
     if isinstance(v, bool):
@@ -57,14 +140,128 @@ def to_literal(v: Any) -> Literal:
     return Literal(str(v), datatype=XSD.string)
 
 
+# =========================
+# Escritura en streaming (N-Triples / N-Quads)
+# =========================
+
+def _escape_literal(texto: str) -> str:
+    return (
+        texto.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def nt_term(term: Any, bnode_prefix: str = "") -> str:
+    if isinstance(term, URIRef):
+        return f"<{term}>"
+    if isinstance(term, BNode):
+        return f"_:{bnode_prefix}{term}"
+    texto = f'"{_escape_literal(str(term))}"'
+    if term.language:
+        return f"{texto}@{term.language}"
+    if term.datatype:
+        return f"{texto}^^<{term.datatype}>"
+    return texto
+
+
+@lru_cache(maxsize=None)
+def _nt_uri(uri: URIRef) -> str:
+    # Predicados: pocos y repetidos en cada tripleta
+    return f"<{uri}>"
+
+
+class TripleWriter:
+    """
+    Sustituto de Graph para add_document/add_value: cada tripleta se
+    escribe al momento como una línea N-Triples (o N-Quads si hay grafo
+    con nombre), así que la memoria no depende del tamaño del grafo.
+
+    A diferencia de Graph no se eliminan duplicados: en RDF una tripleta
+    repetida no cambia el grafo y cualquier carga posterior los descarta.
+    """
+
+    def __init__(self, out, quads: bool = False, bnode_prefix: str = "", stats: Optional[GraphStats] = None):
+        self.out = out
+        self.quads = quads
+        # Prefijo de nodos en blanco: evita colisiones entre shards de procesos distintos
+        self.bnode_prefix = bnode_prefix
+        self.graph: Optional[URIRef] = None
+        self.count = 0
+        # Índice de estadísticas (rdf_stats) que se va llenando al escribir
+        self.stats = stats
+
+    def add(self, triple) -> None:
+        s, p, o = triple
+        b = self.bnode_prefix
+        line = f"{nt_term(s, b)} {_nt_uri(p)} {nt_term(o, b)}"
+        if self.quads and self.graph is not None:
+            line += f" <{self.graph}>"
+        self.out.write(line + " .\n")
+        self.count += 1
+        if self.stats is not None:
+            self.stats.add(triple)
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def open_output(path: str, compress: Optional[bool] = None):
+    """
+    Abre el fichero de salida en texto; si termina en .gz (o compress=True)
+    se comprime al vuelo.
+    """
+    if path.endswith(".gz") if compress is None else compress:
+        return gzip.open(path, "wt", encoding="utf-8", newline="\n")
+    return open(path, "w", encoding="utf-8", newline="\n")
+
+
+def collection_graph(collection: str) -> URIRef:
+    return URIRef(f"{str(BASE)}graph/{collection}")
+
+
+def write_graph_manifest(out_path: str, triples: int, skolemized: bool = False) -> None:
+    """
+    Escribe <out_path>.manifest.json con el sha256, tamaño, fecha y número
+    de tripletas del grafo. reto6 lo usa como huella del grafo sin tener
+    que volver a leer el fichero; rdf_incremental --seed comprueba en él
+    que los nodos anidados están skolemizados.
+    """
+    h = hashlib.sha256()
+    with open(out_path, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    st = os.stat(out_path)
+    manifest = {
+        "file": os.path.basename(out_path),
+        "sha256": h.hexdigest(),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "triples": triples,
+        "skolemized": skolemized,
+        "generated_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+    }
+    with open(f"{out_path}.manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def graph_is_skolemized(out_path: str) -> bool:
+    try:
+        with open(f"{out_path}.manifest.json", encoding="utf-8") as f:
+            return bool(json.load(f).get("skolemized"))
+    except (OSError, ValueError):
+        return False
+
+
 # =========================
 # Carga de ontología
 # =========================
 
 def load_ontology_classes(owl_path: str) -> set:
-    g = Graph()
-    g.parse(owl_path)
-    return set(g.subjects(RDF.type, OWL.Class))
+    # Clases owl:Class de la ontología compilada (ver ontology_cache): el
+    # RDF/XML solo se parsea cuando cambia el fichero
+    return {URIRef(c) for c in load_ontology(owl_path)["classes"]}
 
 
 # =========================
@@ -77,11 +274,12 @@ def add_value(
     pred: URIRef,
     value: Any,
     collection_hint: Optional[str] = None,
+    genid=BNode,
 ) -> None:
 
     if isinstance(value, list):
         for item in value:
-            add_value(g, subj, pred, item, collection_hint)
+            add_value(g, subj, pred, item, collection_hint, genid)
         return
 
     if isinstance(value, DBRef):
@@ -96,18 +294,11 @@ def add_value(
         return
 
     if isinstance(value, dict):
-        obj = doc_uri(collection_hint, value["_id"]) if "_id" in value else BNode()
+        obj = doc_uri(collection_hint, value["_id"]) if "_id" in value else genid()
         g.add((subj, pred, obj))
 
-        for k, v in value.items():
-            if k == "_id":
-                continue
-            p2 = safe_predicate(MEL, k)
-            hint2 = None
-            if k.lower().endswith(("id", "_id")):
-                hint2 = k[:-2] if k.lower().endswith("id") else k[:-3]
-                hint2 = hint2.strip("_").lower() or None
-            add_value(g, obj, p2, v, hint2)
+        for k, p2, hint2 in compile_shape(tuple(value)):
+            add_value(g, obj, p2, value[k], hint2, genid)
         return
 
     if is_primitive(value):
@@ -126,42 +317,63 @@ def add_document(
     collection: str,
     doc: Dict[str, Any],
     classes_in_ont: set,
+    skolemize: bool = False,
 ) -> None:
 
     _id = doc.get("_id")
     subj = doc_uri(collection, _id) if _id else BNode()
+    genid = GenIds(collection, _id) if skolemize and _id else BNode
 
-    class_uri = MEL[collection]
-    g.add((subj, RDF.type, class_uri))
+    clase = class_uri(collection)
+    g.add((subj, RDF.type, clase))
 
-    if class_uri not in classes_in_ont:
-        g.add((class_uri, RDF.type, RDFS.Class))
+    if clase not in classes_in_ont:
+        g.add((clase, RDF.type, RDFS.Class))
+        # Se declara una sola vez (en streaming no hay Graph que deduplique)
+        classes_in_ont.add(clase)
 
-    for k, v in doc.items():
-        if k == "_id":
-            continue
-
-        pred = safe_predicate(MEL, k)
-
-        hint = None
-        if k.lower().endswith(("id", "_id")):
-            hint = k[:-2] if k.lower().endswith("id") else k[:-3]
-            hint = hint.strip("_").lower() or None
-
-        add_value(g, subj, pred, v, hint)
+    for k, pred, hint in compile_shape(tuple(doc)):
+        add_value(g, subj, pred, doc[k], hint, genid)
 
 
 # =========================
 # Exportación principal
 # =========================
 
+def export_collections(db, include_collections: Optional[Iterable[str]] = None):
+    # Fuera las colecciones internas de la carga (mongo_loader): _etl_meta y sombras
+    collections = include_collections or db.list_collection_names()
+    return [c for c in collections if not c.startswith(("system.", "_")) and not c.endswith("__shadow")]
+
+
 def export_mongo_to_rdf(
     mongo_uri: str,
     db_name: str,
     ontology_owl: str,
     out_path: str,
     include_collections: Optional[Iterable[str]] = None,
+    out_format: str = "turtle",
+    workers: int = 1,
+    keep_shards: bool = False,
+    skolemize: bool = False,
 ) -> None:
+    """
+    out_format "turtle" construye el Graph en memoria y lo serializa;
+    "nt" y "nq" escriben en streaming (ver export_mongo_to_stream) o, con
+    workers > 1, en paralelo por shards (ver export_mongo_parallel).
+    Con skolemize los nodos anidados son IRIs (ver GenIds).
+    """
+
+    if out_format in ("nt", "nq") and (workers > 1 or keep_shards):
+        export_mongo_parallel(mongo_uri, db_name, ontology_owl, out_path, include_collections,
+                              quads=out_format == "nq", workers=workers, keep_shards=keep_shards,
+                              skolemize=skolemize)
+        return
+
+    if out_format in ("nt", "nq"):
+        export_mongo_to_stream(mongo_uri, db_name, ontology_owl, out_path,
+                               include_collections, quads=out_format == "nq", skolemize=skolemize)
+        return
 
     classes_in_ont = load_ontology_classes(ontology_owl)
 
@@ -176,19 +388,227 @@ def export_mongo_to_rdf(
     g.bind("owl", OWL)
     g.bind("xsd", XSD)
 
-    collections = include_collections or db.list_collection_names()
-
-    for col in collections:
-        if col.startswith("system."):
-            continue
+    for col in export_collections(db, include_collections):
         for doc in db[col].find():
-            add_document(g, col, doc, classes_in_ont)
+            add_document(g, col, doc, classes_in_ont, skolemize)
 
     g.serialize(destination=out_path, format="turtle")
+    write_graph_manifest(out_path, len(g), skolemize)
+    write_graph_stats(out_path, collect_stats(g))
     print(f"✔ Grafo RDF generado: {out_path}")
     print(f"✔ Tripletas: {len(g)}")
 
 
+def export_mongo_to_stream(
+    mongo_uri: str,
+    db_name: str,
+    ontology_owl: str,
+    out_path: str,
+    include_collections: Optional[Iterable[str]] = None,
+    quads: bool = False,
+    skolemize: bool = False,
+) -> int:
+    """
+    Escribe las tripletas en N-Triples (o N-Quads, un grafo con nombre por
+    colección) a medida que se recorre cada cursor. Si out_path termina
+    en .gz se comprime al vuelo. Devuelve el número de tripletas escritas.
+    """
+
+    classes_in_ont = load_ontology_classes(ontology_owl)
+
+    client = MongoClient(mongo_uri)
+    db = client[db_name]
+
+    tmp_path = f"{out_path}.tmp"
+    with open_output(tmp_path, compress=out_path.endswith(".gz")) as out:
+        writer = TripleWriter(out, quads=quads, stats=GraphStats())
+        for col in export_collections(db, include_collections):
+            writer.graph = collection_graph(col)
+            for doc in db[col].find():
+                add_document(writer, col, doc, classes_in_ont, skolemize)
+    os.replace(tmp_path, out_path)
+    write_graph_manifest(out_path, len(writer), skolemize)
+    write_graph_stats(out_path, writer.stats)
+
+    print(f"✔ Grafo RDF generado ({'N-Quads' if quads else 'N-Triples'}): {out_path}")
+    print(f"✔ Tripletas: {len(writer)}")
+    return len(writer)
+
+
+# =========================
+# Exportación en paralelo (shards)
+# =========================
+
+def plan_partitions(db, collections: Iterable[str], partitions: int) -> list:
+    """
+    Divide cada colección en rangos contiguos de _id: [(col, desde, hasta)],
+    con desde incluido, hasta excluido y None como extremo abierto.
+
+    Los rangos de _id solo comparan valores del mismo tipo BSON, así que si
+    una colección mezcla tipos de _id se exporta como un único rango.
+    """
+    plan = []
+    for col in collections:
+        total = db[col].estimated_document_count()
+        primero = db[col].find_one({}, {"_id": 1}, sort=[("_id", 1)])
+        ultimo = db[col].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+
+        if total < 2 * partitions or primero is None or type(primero["_id"]) is not type(ultimo["_id"]):
+            plan.append((col, None, None))
+            continue
+
+        paso = total // partitions
+        cortes = []
+        for i in range(1, partitions):
+            doc = db[col].find_one({}, {"_id": 1}, sort=[("_id", 1)], skip=i * paso)
+            if doc is not None and (not cortes or doc["_id"] != cortes[-1]):
+                cortes.append(doc["_id"])
+
+        limites = [None] + cortes + [None]
+        plan += [(col, limites[i], limites[i + 1]) for i in range(len(limites) - 1)]
+    return plan
+
+
+def _id_range_filter(desde: Any, hasta: Any) -> Dict[str, Any]:
+    rango = {}
+    if desde is not None:
+        rango["$gte"] = desde
+    if hasta is not None:
+        rango["$lt"] = hasta
+    return {"_id": rango} if rango else {}
+
+
+def export_partition(
+    mongo_uri: str,
+    db_name: str,
+    classes_in_ont: set,
+    partition: tuple,
+    shard_path: str,
+    shard_id: int,
+    quads: bool = False,
+    skolemize: bool = False,
+) -> tuple:
+    """
+    Convierte un rango de _id de una colección en un shard N-Triples/N-Quads.
+    Se ejecuta en un proceso aparte, con su propia conexión a MongoDB.
+    Devuelve (tripletas escritas, estadísticas del shard).
+    """
+    col, desde, hasta = partition
+    db = MongoClient(mongo_uri)[db_name]
+
+    with open_output(shard_path) as out:
+        writer = TripleWriter(out, quads=quads, bnode_prefix=f"s{shard_id}_", stats=GraphStats())
+        writer.graph = collection_graph(col)
+        for doc in db[col].find(_id_range_filter(desde, hasta)):
+            add_document(writer, col, doc, classes_in_ont, skolemize)
+    return len(writer), writer.stats
+
+
+def export_mongo_parallel(
+    mongo_uri: str,
+    db_name: str,
+    ontology_owl: str,
+    out_path: str,
+    include_collections: Optional[Iterable[str]] = None,
+    quads: bool = False,
+    workers: int = 2,
+    partitions: Optional[int] = None,
+    keep_shards: bool = False,
+    skolemize: bool = False,
+) -> int:
+    """
+    Exportación multiproceso: cada (colección, rango de _id) se convierte
+    en un shard en <out_path>.shards/ y al final los shards se concatenan
+    en out_path (los .gz concatenados siguen siendo un gzip válido).
+    Con keep_shards se dejan los shards y un manifest.json en lugar del
+    fichero único.
+    """
+
+    classes_in_ont = load_ontology_classes(ontology_owl)
+    db = MongoClient(mongo_uri)[db_name]
+    collections = export_collections(db, include_collections)
+    plan = plan_partitions(db, collections, partitions or workers)
+
+    shard_dir = Path(f"{out_path}.shards")
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    sufijo = (".nq" if quads else ".nt") + (".gz" if out_path.endswith(".gz") else "")
+    shards = [str(shard_dir / f"shard_{i:04d}{sufijo}") for i in range(len(plan))]
+
+    # La clase de cada colección solo la declara su primer shard
+    primeros = {}
+    for i, (col, _, _) in enumerate(plan):
+        primeros.setdefault(col, i)
+    clases = [
+        classes_in_ont if primeros[col] == i else classes_in_ont | {class_uri(col)}
+        for i, (col, _, _) in enumerate(plan)
+    ]
+
+    print(f"Exportando {len(plan)} particiones con {workers} procesos...")
+    conteos = [0] * len(plan)
+    stats = GraphStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = {
+            pool.submit(export_partition, mongo_uri, db_name, clases[i], part, shards[i], i, quads,
+                        skolemize): i
+            for i, part in enumerate(plan)
+        }
+        for fut in as_completed(futuros):
+            i = futuros[fut]
+            conteos[i], parcial = fut.result()
+            stats.update(parcial)
+            print(f"  ✔ {plan[i][0]} [{i}]: {conteos[i]} tripletas")
+
+    total = sum(conteos)
+    if keep_shards:
+        manifest = [
+            {"shard": os.path.basename(path), "collection": col, "from": str(desde), "to": str(hasta), "triples": n}
+            for path, (col, desde, hasta), n in zip(shards, plan, conteos)
+        ]
+        (shard_dir / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        print(f"✔ Shards RDF generados: {shard_dir}")
+    else:
+        tmp_path = f"{out_path}.tmp"
+        with open(tmp_path, "wb") as out:
+            for path in shards:
+                with open(path, "rb") as f:
+                    shutil.copyfileobj(f, out)
+        os.replace(tmp_path, out_path)
+        shutil.rmtree(shard_dir)
+        write_graph_manifest(out_path, total, skolemize)
+        write_graph_stats(out_path, stats)
+        print(f"✔ Grafo RDF generado ({'N-Quads' if quads else 'N-Triples'}): {out_path}")
+
+    print(f"✔ Tripletas: {total}")
+    return total
+
+
+def stream_to_turtle(stream_path: str, ttl_path: str) -> int:
+    """
+    Post-proceso opcional: convierte la salida N-Triples/N-Quads en Turtle.
+    Necesita cargar el grafo en memoria, como la exportación clásica.
+    """
+    quads = stream_path.endswith((".nq", ".nq.gz"))
+    opener = gzip.open if stream_path.endswith(".gz") else open
+
+    g = Graph()
+    with opener(stream_path, "rb") as f:
+        if quads:
+            ds = Dataset()
+            ds.parse(f, format="nquads")
+            for s, p, o, _ in ds.quads((None, None, None, None)):
+                g.add((s, p, o))
+        else:
+            g.parse(f, format="nt")
+
+    g.bind("mel", MEL)
+    g.bind("base", BASE)
+    g.serialize(destination=ttl_path, format="turtle")
+    write_graph_manifest(ttl_path, len(g), graph_is_skolemized(stream_path))
+    write_graph_stats(ttl_path, collect_stats(g))
+    print(f"✔ Turtle generado: {ttl_path} ({len(g)} tripletas)")
+    return len(g)
+
+
 # =========================
 # Main
 # =========================
@@ -200,8 +620,24 @@ def main():
     ap.add_argument("--ontology", required=True)
     ap.add_argument("--collections", default="")
     ap.add_argument("--out", default=None)
+    ap.add_argument("--format", choices=["turtle", "nt", "nq"], default="turtle",
+                    help="turtle: Graph en memoria; nt/nq: escritura en streaming")
+    ap.add_argument("--gzip", action="store_true",
+                    help="Con nt/nq, comprime la salida (.gz)")
+    ap.add_argument("--turtle", default=None,
+                    help="Con nt/nq, genera además este fichero Turtle a partir de la salida")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="Con nt/nq, procesos en paralelo (particiones por colección y rango de _id)")
+    ap.add_argument("--keep-shards", action="store_true",
+                    help="Con --workers, deja los shards y su manifest en lugar de unirlos")
+    ap.add_argument("--skolemize", action="store_true",
+                    help="Nombra los nodos anidados con IRIs /.well-known/genid/ en lugar de nodos "
+                         "en blanco (necesario para mantener el grafo con rdf_incremental)")
 
     args = ap.parse_args()
+    if args.gzip and args.out and not args.out.endswith(".gz"):
+        # La compresión se decide por la extensión de la salida (ver open_output)
+        ap.error("--gzip con --out necesita una ruta terminada en .gz")
 
     # 👉 RAÍZ DEL REPOSITORIO (EstandaresProyecto)
     BASE_DIR = Path(__file__).resolve().parents[2]
@@ -210,7 +646,10 @@ def main():
     RESULTS_DIR = BASE_DIR / "resultados" / "reto5"
     RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
-    out_path = RESULTS_DIR / "grafo_melanoma.ttl" if args.out is None else Path(args.out)
+    extension = {"turtle": ".ttl", "nt": ".nt", "nq": ".nq"}[args.format]
+    if args.format != "turtle" and args.gzip:
+        extension += ".gz"
+    out_path = RESULTS_DIR / f"grafo_melanoma{extension}" if args.out is None else Path(args.out)
 
     cols = [c.strip() for c in args.collections.split(",") if c.strip()] or None
 
@@ -220,8 +659,15 @@ def main():
         ontology_owl=args.ontology,
         out_path=str(out_path),
         include_collections=cols,
+        out_format=args.format,
+        workers=args.workers,
+        keep_shards=args.keep_shards,
+        skolemize=args.skolemize,
     )
 
+    if args.turtle and args.format != "turtle" and not args.keep_shards:
+        stream_to_turtle(str(out_path), args.turtle)
+
 
 if __name__ == "__main__":
     main()
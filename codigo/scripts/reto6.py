@@ -4,9 +4,23 @@
 import argparse
 from pathlib import Path
 import csv
+import hashlib
+import json
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 from rdflib import Graph
+from rdflib.namespace import RDF, RDFS
+from rdflib.plugins.sparql import prepareQuery
+
+from ontology_cache import load_ontology, ontology_properties
+from rdf_incremental import apply_delta
+from rdf_stats import answer_from_stats, is_schema_query, load_graph_stats
+from rdf_store import SQLiteStore, default_store_path, load_store, open_store, parse_graph
+from reto5 import graph_is_skolemized
+from query_cache import file_digest
+from sparql_cache import DEFAULT_MAX_BYTES, SparqlResultCache, graph_fingerprint, result_key
 
 
 # =========================================================
@@ -35,20 +49,320 @@ def split_queries(text: str):
 
 
 
-def write_select_results(csv_path: Path, result):
+def write_select_results(csv_path: Path, result, delimiter: str = ",", batch_size: int = 1000):
     """
-    Guarda resultados SELECT en CSV.
+    Guarda resultados SELECT en CSV (o TSV con delimiter="\t").
+    Las filas se escriben en lotes de batch_size conforme se leen.
+    Devuelve el número de filas.
     """
     vars_ = list(result.vars)
+    filas = 0
 
     with csv_path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
+        writer = csv.writer(f, delimiter=delimiter)
         writer.writerow([str(v) for v in vars_])
 
+        lote = []
+        for row in result:
+            # ResultRow es una tupla en el orden de vars_
+            lote.append(["" if valor is None else str(valor) for valor in row])
+            if len(lote) >= batch_size:
+                writer.writerows(lote)
+                filas += len(lote)
+                lote = []
+        writer.writerows(lote)
+        filas += len(lote)
+    return filas
+
+
+def write_select_parquet(parquet_path: Path, result, batch_size: int = 10000):
+    """
+    Guarda resultados SELECT en Parquet (columnas de texto), un row group
+    por lote. Requiere pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("La salida Parquet requiere pyarrow (pip install pyarrow)")
+
+    vars_ = [str(v) for v in result.vars]
+    schema = pa.schema([(v, pa.string()) for v in vars_])
+    filas = 0
+
+    with pq.ParquetWriter(str(parquet_path), schema) as writer:
+        lote = []
         for row in result:
-            writer.writerow(
-                [str(row.get(v)) if row.get(v) is not None else "" for v in vars_]
-            )
+            lote.append(row)
+            if len(lote) >= batch_size:
+                writer.write_table(_parquet_table(pa, schema, vars_, lote))
+                filas += len(lote)
+                lote = []
+        if lote or not filas:
+            writer.write_table(_parquet_table(pa, schema, vars_, lote))
+            filas += len(lote)
+    return filas
+
+
+def _parquet_table(pa, schema, vars_, lote):
+    columnas = [[None if row[i] is None else str(row[i]) for row in lote] for i in range(len(vars_))]
+    return pa.Table.from_arrays([pa.array(c, pa.string()) for c in columnas], schema=schema)
+
+
+SELECT_WRITERS = {
+    "csv": (".csv", lambda path, result: write_select_results(path, result)),
+    "tsv": (".tsv", lambda path, result: write_select_results(path, result, delimiter="\t")),
+    "parquet": (".parquet", lambda path, result: write_select_parquet(path, result)),
+}
+
+
+def load_graph(graph_path: Path, backend: str = "sqlite", store: str = None, fmt: str = None,
+               rebuild: bool = False) -> Graph:
+    """
+    Grafo a consultar: el almacén SQLite de rdf_store (construido una vez)
+    o el fichero parseado en memoria. Con fmt None el formato se deduce
+    de la extensión (.ttl, .nt, .nq, con o sin .gz).
+    """
+    if backend == "sqlite":
+        return load_store(str(graph_path), store, fmt, rebuild)
+    return parse_graph(Graph(), str(graph_path), fmt)
+
+
+# =========================================================
+# Ejecución de una consulta
+# =========================================================
+
+def run_query(g: Graph, i: int, q: str, results_dir: Path, out_format: str = "csv",
+              stats: dict = None) -> dict:
+    """
+    Ejecuta la Consulta i y guarda su resultado. Devuelve
+    {"consulta", "tipo", "filas", "segundos", "salida", "error", "cache", "stats"}.
+    Con stats (índice de rdf_stats), las consultas de esquema se responden
+    desde el índice sin evaluar el grafo.
+    """
+    t0 = time.perf_counter()
+    info = {"consulta": i, "tipo": None, "filas": None, "segundos": None, "salida": None, "error": None,
+            "cache": False, "stats": False}
+
+    try:
+        result = answer_from_stats(stats, q) if stats else None
+        if result is not None:
+            info["stats"] = True
+        else:
+            result = g.query(q)
+        info["tipo"] = result.type
+
+        # SELECT
+        if hasattr(result, "vars") and result.vars:
+            extension, escribir = SELECT_WRITERS[out_format]
+            out_path = results_dir / f"Consulta_{i}{extension}"
+            info["filas"] = escribir(out_path, result)
+
+        # ASK
+        elif isinstance(result, bool) or result.type == "ASK":
+            out_path = results_dir / f"Consulta_{i}.txt"
+            out_path.write_text(str(result if isinstance(result, bool) else result.askAnswer), encoding="utf-8")
+            info["filas"] = 1
+
+        # CONSTRUCT / DESCRIBE
+        else:
+            out_path = results_dir / f"Consulta_{i}.ttl"
+            result.serialize(destination=str(out_path), format="turtle")
+            info["filas"] = len(result.graph)
+
+        info["salida"] = str(out_path)
+    except Exception as e:
+        info["error"] = str(e)
+
+    info["segundos"] = time.perf_counter() - t0
+    return info
+
+
+# Grafo de cada proceso del pool: cada uno abre su propia conexión al almacén
+_WORKER_GRAPH = None
+
+
+def _init_worker(store_path: str):
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = open_store(store_path)
+
+
+def _run_query_worker(i: int, q: str, results_dir: Path, out_format: str) -> dict:
+    return run_query(_WORKER_GRAPH, i, q, results_dir, out_format)
+
+
+def run_queries(g: Graph, queries, results_dir: Path, out_format: str = "csv",
+                jobs: int = 1, store_path: str = None,
+                cache: SparqlResultCache = None, fingerprint: str = None, stats: dict = None):
+    """
+    Ejecuta las consultas (independientes entre sí). Con jobs > 1 y un
+    almacén SQLite, cada proceso abre su propia conexión (solo consulta)
+    y las consultas se evalúan en paralelo; con el grafo en memoria se
+    comparte entre hilos.
+
+    Con cache, las consultas ya resueltas sobre el mismo grafo (misma
+    huella) se copian desde la caché y solo se ejecutan las demás. Con
+    stats, las consultas de esquema se responden desde el índice de reto5.
+    """
+    pendientes = []
+    claves = {}
+    for i, q in enumerate(queries, start=1):
+        if stats is not None and is_schema_query(q):
+            info = run_query(g, i, q, results_dir, out_format, stats)
+            _print_query_result(info)
+            yield info
+            continue
+        if cache is not None:
+            claves[i] = result_key(q, fingerprint, out_format)
+            info = _cached_result(cache, claves[i], i, results_dir)
+            if info is not None:
+                _print_query_result(info)
+                yield info
+                continue
+        pendientes.append((i, q))
+
+    for info in _execute(g, pendientes, results_dir, out_format, jobs, store_path):
+        if cache is not None and not info["error"]:
+            cache.put(claves[info["consulta"]], info["salida"], {"tipo": info["tipo"], "filas": info["filas"]})
+        _print_query_result(info)
+        yield info
+
+
+def _execute(g: Graph, pendientes, results_dir: Path, out_format: str, jobs: int, store_path: str):
+    if jobs <= 1:
+        for i, q in pendientes:
+            print(f"\nEjecutando Consulta {i}...")
+            yield run_query(g, i, q, results_dir, out_format)
+        return
+
+    if not pendientes:
+        return
+
+    if store_path:
+        g.close()
+        pool = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(store_path,))
+        tarea = _run_query_worker
+    else:
+        # El parser SPARQL de rdflib (pyparsing) no es seguro entre hilos:
+        # las consultas se preparan aquí y los hilos solo las evalúan
+        pendientes = [(i, _prepare(q)) for i, q in pendientes]
+        pool = ThreadPoolExecutor(max_workers=jobs)
+        tarea = lambda i, q, d, f: run_query(g, i, q, d, f)
+
+    print(f"\nEjecutando {len(pendientes)} consultas con {jobs} workers...")
+    with pool:
+        futuros = [pool.submit(tarea, i, q, results_dir, out_format) for i, q in pendientes]
+        for fut in as_completed(futuros):
+            yield fut.result()
+
+
+def _cached_result(cache: SparqlResultCache, key: str, i: int, results_dir: Path):
+    t0 = time.perf_counter()
+    meta = cache.get(key, results_dir, f"Consulta_{i}")
+    if meta is None:
+        return None
+    return {"consulta": i, "tipo": meta.get("tipo"), "filas": meta.get("filas"),
+            "segundos": time.perf_counter() - t0, "salida": meta["salida"], "error": None, "cache": True,
+            "stats": False}
+
+
+def apply_delta_once(g: Graph, delta_path: str) -> bool:
+    """
+    Aplica el delta salvo que el almacén SQLite ya lo tenga registrado
+    (mismo sha256). Devuelve False si se ha omitido.
+    """
+    persistente = isinstance(g.store, SQLiteStore)
+    deltas = json.loads(g.store.get_meta("deltas") or "[]") if persistente else []
+    digest = file_digest(delta_path)
+    if digest in deltas:
+        return False
+
+    apply_delta(g, delta_path)
+    if persistente:
+        # El delta queda en el almacén: se registra para la huella del grafo
+        g.store.set_meta("deltas", json.dumps(deltas + [digest]))
+    g.commit()
+    return True
+
+
+def current_fingerprint(g: Graph, graph_path: Path, delta_path: str = None) -> str:
+    """
+    Huella del grafo consultado: la del fichero de reto5 más los deltas
+    aplicados (los del almacén SQLite persisten entre ejecuciones).
+    """
+    if graph_path.exists():
+        partes = [graph_fingerprint(str(graph_path))]
+    else:
+        partes = [g.store.get_meta("source") if isinstance(g.store, SQLiteStore) else str(graph_path)]
+
+    if isinstance(g.store, SQLiteStore):
+        partes.append(g.store.get_meta("deltas") or "[]")
+    elif delta_path:
+        partes.append(file_digest(delta_path))
+    return hashlib.sha256("|".join(partes).encode("utf-8")).hexdigest()
+
+
+def _prepare(q: str):
+    try:
+        return prepareQuery(q)
+    except Exception:
+        # Se deja el texto: el error se informará al ejecutarla
+        return q
+
+
+def _print_query_result(info: dict):
+    i = info["consulta"]
+    if info["error"]:
+        print(f"ERROR en Consulta {i}: {info['error']}")
+    elif info["cache"]:
+        print(f"✔ Consulta {i}: resultado en caché, copiado a {info['salida']}")
+    elif info["stats"]:
+        print(f"✔ Consulta {i}: respondida desde el índice de estadísticas, guardada en {info['salida']}")
+    else:
+        print(f"✔ Consulta {i}: resultado guardado en {info['salida']}")
+
+
+def print_query_summary(infos):
+    print("\nResumen por consulta:")
+    print(f"   {'consulta':<10} {'tipo':<10} {'filas':>8} {'tiempo':>9}  estado")
+    for info in sorted(infos, key=lambda x: x["consulta"]):
+        filas = "-" if info["filas"] is None else info["filas"]
+        if info["error"]:
+            estado = "ERROR"
+        else:
+            estado = "CACHE" if info["cache"] else "STATS" if info["stats"] else "OK"
+        print(f"   {info['consulta']:<10} {str(info['tipo'] or '-'):<10} {filas:>8} {info['segundos']:>8.2f}s  {estado}")
+
+
+def print_stats_summary(stats: dict, ontologia: dict = None):
+    """
+    Modo --stats: resumen del índice de reto5 sin cargar el grafo. Con la
+    ontología compilada (ontology_cache) se indican además las clases y
+    propiedades del grafo que no están declaradas en ella.
+    """
+    print(f"\nTripletas: {stats['triples']}  |  instancias con clase: {len(stats['instances'])}")
+
+    print(f"\nClases ({len(stats['classes'])}):")
+    for clase, c in sorted(stats["classes"].items(), key=lambda x: -x[1]["entities"]):
+        print(f"   {c['entities']:>8}  {clase}")
+
+    print(f"\nPropiedades ({len(stats['properties'])}):")
+    print(f"   {'tripletas':>9} {'IRI':>8} {'blanco':>8} {'literal':>8}  propiedad")
+    for prop, c in sorted(stats["properties"].items(), key=lambda x: -x[1]["triples"]):
+        print(f"   {c['triples']:>9} {c['iri_objects']:>8} {c['bnode_objects']:>8} {c['literal_objects']:>8}  {prop}")
+
+    if ontologia is None:
+        return
+    # rdf:type y las declaraciones rdfs:Class de reto5 no son vocabulario de la ontología
+    clases = [c for c in stats["classes"] if c not in ontologia["classes"] and c != str(RDFS.Class)]
+    propiedades = [p for p in stats["properties"] if p not in ontology_properties(ontologia) and p != str(RDF.type)]
+    print(f"\nComparación con la ontología ({ontologia['source']}):")
+    print(f"   Clases sin declarar: {len(clases)} de {len(stats['classes'])}")
+    for c in clases:
+        print(f"      {c}")
+    print(f"   Propiedades sin declarar: {len(propiedades)} de {len(stats['properties'])}")
+    for p in propiedades:
+        print(f"      {p}")
 
 
 # =========================================================
@@ -66,16 +380,77 @@ def main():
     )
     ap.add_argument(
         "--queries",
-        required=True,
-        help="Fichero Consultas SPARQL.txt",
+        default=None,
+        help="Fichero Consultas SPARQL.txt (obligatorio salvo con --stats)",
     )
     ap.add_argument(
         "--format",
-        default="turtle",
-        help="Formato del grafo RDF (turtle por defecto)",
+        default=None,
+        help="Formato del grafo RDF (por defecto según la extensión: .ttl, .nt, .nq)",
+    )
+    ap.add_argument(
+        "--backend",
+        choices=["sqlite", "memory"],
+        default="sqlite",
+        help="sqlite: almacén persistente construido una vez (rdf_store); memory: parsea el grafo en cada ejecución",
+    )
+    ap.add_argument(
+        "--store",
+        default=None,
+        help="Fichero del almacén SQLite (por defecto .cache/rdf_store/<grafo>.sqlite)",
+    )
+    ap.add_argument(
+        "--rebuild-store",
+        action="store_true",
+        help="Reconstruye el almacén aunque el grafo de origen no haya cambiado",
+    )
+    ap.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Consultas en paralelo (procesos sobre el almacén SQLite, hilos con --backend memory)",
+    )
+    ap.add_argument(
+        "--output-format",
+        choices=sorted(SELECT_WRITERS),
+        default="csv",
+        help="Formato de los resultados SELECT (parquet requiere pyarrow)",
+    )
+    ap.add_argument(
+        "--apply-delta",
+        default=None,
+        help="Delta de rdf_incremental (.ru o .nq) a aplicar al almacén antes de consultar",
+    )
+    ap.add_argument(
+        "--result-cache",
+        action="store_true",
+        help="Reutiliza resultados de consultas ya ejecutadas sobre el mismo grafo (.cache/sparql_results)",
+    )
+    ap.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Tamaño máximo de la caché de resultados en MB",
+    )
+    ap.add_argument(
+        "--stats",
+        action="store_true",
+        help="Muestra el índice de estadísticas de reto5 (<grafo>.stats.json) sin cargar el grafo",
+    )
+    ap.add_argument(
+        "--ontology",
+        default=None,
+        help="Con --stats, ontología OWL con la que comparar (por defecto codigo/datos/ontologia/ontologia.owl)",
+    )
+    ap.add_argument(
+        "--no-stats-index",
+        action="store_true",
+        help="Evalúa también las consultas de esquema contra el grafo en lugar de usar el índice",
     )
 
     args = ap.parse_args()
+    if not args.stats and not args.queries:
+        ap.error("se necesita --queries (o --stats)")
 
     # -----------------------------------------------------
     # Raíz del repositorio
@@ -92,15 +467,33 @@ def main():
     RESULTS_DIR = BASE_DIR / "resultados" / "reto6"
     RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 
+    if args.apply_delta and not graph_is_skolemized(str(graph_path)):
+        ap.error("--apply-delta requiere un grafo exportado con reto5 --skolemize")
+
+    if args.stats:
+        stats = load_graph_stats(str(graph_path))
+        if stats is None:
+            print(f"No hay índice de estadísticas vigente para {graph_path} (se genera al exportar con reto5)")
+            return
+        owl_path = Path(args.ontology) if args.ontology else BASE_DIR / "codigo" / "datos" / "ontologia" / "ontologia.owl"
+        print_stats_summary(stats, load_ontology(str(owl_path)) if owl_path.exists() else None)
+        return
+
     # -----------------------------------------------------
     # Carga del grafo RDF
     # -----------------------------------------------------
     print(f"Cargando grafo RDF: {graph_path}")
+    t0 = time.perf_counter()
 
-    g = Graph()
-    g.parse(graph_path, format=args.format)
+    g = load_graph(graph_path, args.backend, args.store, args.format, args.rebuild_store)
 
-    print(f"Tripletas cargadas: {len(g)}")
+    if args.apply_delta:
+        if apply_delta_once(g, args.apply_delta):
+            print(f"Delta aplicado: {args.apply_delta}")
+        else:
+            print(f"Delta ya aplicado en el almacén, se omite: {args.apply_delta}")
+
+    print(f"Tripletas cargadas: {len(g)} ({time.perf_counter() - t0:.2f} s)")
 
     # -----------------------------------------------------
     # Lectura y separación de consultas
@@ -113,32 +506,24 @@ def main():
     # -----------------------------------------------------
     # Ejecución de consultas
     # -----------------------------------------------------
-    for i, q in enumerate(queries, start=1):
-        print(f"\nEjecutando Consulta {i}...")
+    store_path = None
+    if args.backend == "sqlite":
+        store_path = args.store or default_store_path(str(graph_path))
 
-        try:
-            result = g.query(q)
-        except Exception as e:
-            print(f"ERROR en Consulta {i}: {e}")
-            continue
+    cache, fingerprint = None, None
+    if args.result_cache:
+        cache = SparqlResultCache(max_bytes=args.cache_max_mb * 1024 * 1024)
+        fingerprint = current_fingerprint(g, graph_path, args.apply_delta)
 
-        # SELECT
-        if hasattr(result, "vars") and result.vars:
-            csv_path = RESULTS_DIR / f"Consulta_{i}.csv"
-            write_select_results(csv_path, result)
-            print(f"✔ Resultados guardados en {csv_path}")
+    # El índice describe el fichero de reto5: no vale si se han aplicado deltas
+    stats = None
+    deltas = g.store.get_meta("deltas") if isinstance(g.store, SQLiteStore) else None
+    if not args.no_stats_index and not args.apply_delta and not json.loads(deltas or "[]"):
+        stats = load_graph_stats(str(graph_path))
 
-        # ASK
-        elif isinstance(result, bool):
-            txt_path = RESULTS_DIR / f"Consulta_{i}.txt"
-            txt_path.write_text(str(result), encoding="utf-8")
-            print(f"✔ Resultado booleano guardado en {txt_path}")
-
-        # CONSTRUCT / DESCRIBE
-        else:
-            ttl_path = RESULTS_DIR / f"Consulta_{i}.ttl"
-            result.serialize(destination=str(ttl_path), format="turtle")
-            print(f"✔ Grafo resultado guardado en {ttl_path}")
+    infos = list(run_queries(g, queries, RESULTS_DIR, args.output_format, args.jobs, store_path,
+                             cache, fingerprint, stats))
+    print_query_summary(infos)
 
     print("\nReto 6 completado correctamente.")
 
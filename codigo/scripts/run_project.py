@@ -1,9 +1,13 @@
+import argparse
 import subprocess
 import sys
 import os
-import json
 from pymongo import MongoClient
 
+import mongo_indexes
+import mongo_loader
+import query_cache
+
 # ==============================================================================
 # ⚙️ CONFIGURACIÓN DE RUTAS GENÉRICAS (PORTABLE)
 # ==============================================================================
@@ -41,6 +45,10 @@ ARCHIVOS_A_COLECCIONES = {
     "uniprot.json": "uniprot"
 }
 
+# Carga en MongoDB: "upsert" (incremental) o "shadow" (colección sombra + rename)
+MODO_CARGA = "upsert"
+TAMANO_LOTE = 1000
+
 # ==============================================================================
 # PASO 1: CONVERSIÓN (ETL)
 # ==============================================================================
@@ -64,7 +72,7 @@ def paso_1_conversion():
 # ==============================================================================
 # PASO 2: CARGA A MONGODB
 # ==============================================================================
-def paso_2_upload():
+def paso_2_upload(modo=MODO_CARGA, lote=TAMANO_LOTE):
     print("\n" + "="*50)
     print("🚀 PASO 2: Subiendo datos a MongoDB...")
     print("="*50)
@@ -78,28 +86,39 @@ def paso_2_upload():
         db = client[DB_NAME]
         
         for filename, col_name in ARCHIVOS_A_COLECCIONES.items():
-            fpath = os.path.join(DIR_DATOS_LIMPIOS, filename)
+            fpath = mongo_loader.resolve_source(os.path.join(DIR_DATOS_LIMPIOS, filename))
             
-            if os.path.exists(fpath):
-                print(f"📥 Procesando: {filename} -> Colección: {col_name}")
-                with open(fpath, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                if data:
-                    # Limpiar colección previa e insertar nuevos
-                    db[col_name].delete_many({})
-                    
-                    if isinstance(data, list):
-                        db[col_name].insert_many(data)
-                        count = len(data)
+            if fpath:
+                print(f"📥 Procesando: {os.path.basename(fpath)} -> Colección: {col_name} (modo {modo})")
+                keys = mongo_loader.COLLECTION_KEYS[col_name]
+                delta_path = os.path.splitext(fpath)[0] + ".delta.json"
+                delta = mongo_loader.read_delta(delta_path)
+
+                aplicar_delta = modo == "upsert" and mongo_loader.delta_applicable(db, col_name, delta)
+                if aplicar_delta:
+                    stats = mongo_loader.apply_delta(db, col_name, delta_path, lote)
+                else:
+                    if modo == "shadow":
+                        stats = mongo_loader.load_shadow(db, col_name, fpath, keys, lote)
                     else:
-                        db[col_name].insert_one(data)
-                        count = 1
-                    print(f"   ✅ Insertados {count} documentos.")
+                        stats = mongo_loader.load_upsert(db, col_name, fpath, keys, lote)
+                    # El fichero completo está en la versión del delta escrito con él
+                    if delta and delta.get("version"):
+                        mongo_loader.set_data_version(db, col_name, delta["version"])
+
+                # Toda carga cambia la versión, también un delta solo con borrados
+                query_cache.record_data_version(col_name, fpath)
+                if stats["leidos"] or aplicar_delta:
+                    print(f"   ✅ {stats['escritos']} escritos, {stats['omitidos']} sin cambios, "
+                          f"{stats['borrados']} borrados.")
                 else:
                     print(f"   ⚠️ El archivo {filename} está vacío.")
             else:
                 print(f"   ⚠️ Archivo no encontrado (se omite): {filename}")
+
+        # Índices para las claves que usan los $lookup de queries.txt
+        if os.path.exists(QUERIES_FILE):
+            mongo_indexes.provision_indexes(db, QUERIES_FILE)
         
         client.close()
     
@@ -107,6 +126,7 @@ def paso_2_upload():
         print(f"❌ Error crítico en MongoDB: {e}")
         sys.exit(1)
 
+
 # ==============================================================================
 # PASO 3: REPORTES HTML
 # ==============================================================================
@@ -129,7 +149,12 @@ def paso_3_reportes():
         "--db", DB_NAME,
         "--queries", QUERIES_FILE,
         "--xslt", XSLT_FILE,
-        "--outdir", DIR_RESULTADOS
+        "--outdir", DIR_RESULTADOS,
+        # Con --stream el render directo escribe el HTML desde el cursor; las
+        # secciones con su propia hoja ("// xslt:") siguen por XML → XSLT
+        "--stream",
+        "--renderer", "direct",
+        "--query-cache"
     ]
 
     try:
@@ -143,7 +168,12 @@ def paso_3_reportes():
 # EJECUCIÓN
 # ==============================================================================
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Orquestador del proyecto: ETL → MongoDB → reportes HTML")
+    parser.add_argument("--modo-carga", choices=["upsert", "shadow"], default=MODO_CARGA)
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Documentos por bulk_write")
+    args = parser.parse_args()
+
     print(f"📂 Raíz del proyecto detectada: {PROJECT_ROOT}")
     paso_1_conversion()
-    paso_2_upload()
+    paso_2_upload(args.modo_carga, args.lote)
     paso_3_reportes()
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Caché de resultados de las consultas SPARQL del reto 6.
+
+La clave combina el texto normalizado de la consulta (sin comentarios ni
+espacios sobrantes), el formato de salida y la huella del grafo. La huella
+es el sha256 del fichero que reto5 deja en <grafo>.manifest.json; si no hay
+manifest o no corresponde al fichero actual, se calcula el hash del fichero.
+
+Cada entrada guarda el fichero de resultado (CSV/TSV/Parquet, TXT o TTL)
+tal cual, y se copia a resultados/reto6 en lugar de ejecutar la consulta.
+La caché se limita por tamaño total, eliminando primero las entradas
+usadas hace más tiempo (LRU).
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+from query_cache import file_digest
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    ".cache", "sparql_results"
+)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Cadenas, IRIs, comentarios y espacios (en ese orden de prioridad)
+_TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|<[^<>\s]*>|#[^\n]*|\s+|[^\s"\'<#]+|.', re.S)
+
+
+# -------------------------------------------------------------
+# CLAVE
+# -------------------------------------------------------------
+def normalize_query(query):
+    """
+    Quita comentarios y reduce los espacios fuera de cadenas e IRIs, de modo
+    que cambios de formato no invaliden la caché.
+    """
+    partes = []
+    for token in _TOKENS.findall(query):
+        if token.startswith("#"):
+            continue
+        if token.isspace():
+            if partes and partes[-1] != " ":
+                partes.append(" ")
+            continue
+        partes.append(token)
+    return "".join(partes).strip()
+
+
+def manifest_path(graph_path):
+    return f"{graph_path}.manifest.json"
+
+
+def graph_fingerprint(graph_path):
+    """
+    sha256 del grafo: el del manifest de reto5 si coincide con el fichero
+    (tamaño y fecha), o el calculado en el momento.
+    """
+    st = os.stat(graph_path)
+    try:
+        with open(manifest_path(graph_path), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("size") == st.st_size and manifest.get("mtime_ns") == st.st_mtime_ns:
+            return manifest["sha256"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+    return file_digest(graph_path)
+
+
+def result_key(query, fingerprint, out_format):
+    material = {"query": normalize_query(query), "graph": fingerprint, "format": out_format}
+    texto = json.dumps(material, sort_keys=True)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------------------
+# ALMACÉN DE RESULTADOS
+# -------------------------------------------------------------
+class SparqlResultCache:
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key, results_dir, stem):
+        """
+        Copia el resultado guardado a results_dir/<stem><extensión> y
+        devuelve sus metadatos (con "salida"), o None si no hay entrada.
+        """
+        entrada = self._dir(key)
+        try:
+            with open(os.path.join(entrada, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            destino = os.path.join(str(results_dir), stem + meta["extension"])
+            shutil.copyfile(os.path.join(entrada, "result" + meta["extension"]), destino)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+        os.utime(entrada)  # marca de uso para la política LRU
+        meta["salida"] = destino
+        return meta
+
+    def put(self, key, result_path, meta):
+        """
+        Guarda una copia del fichero de resultado con sus metadatos
+        (tipo, filas). Se escribe en un directorio temporal y se publica
+        con un rename.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        extension = "".join(os.path.basename(result_path).partition(".")[1:])
+        tmp = f"{self._dir(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        shutil.copyfile(result_path, os.path.join(tmp, "result" + extension))
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({**meta, "extension": extension}, f)
+
+        if os.path.exists(self._dir(key)):
+            shutil.rmtree(self._dir(key), ignore_errors=True)
+        try:
+            os.replace(tmp, self._dir(key))
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Borra las entradas menos usadas hasta quedar por debajo de max_bytes.
+        """
+        with self._lock:
+            entradas = []
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.endswith(".tmp") or not os.path.isdir(path):
+                    continue
+                try:
+                    size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+                    entradas.append((os.stat(path).st_mtime, size, path))
+                except FileNotFoundError:
+                    continue
+
+            total = sum(size for _, size, _ in entradas)
+            for _, size, path in sorted(entradas):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
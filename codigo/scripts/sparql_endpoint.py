@@ -0,0 +1,619 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Endpoint SPARQL 1.1 (protocolo de consulta) sobre el grafo del reto 5.
+
+El grafo se carga (o se abre el almacén SQLite de rdf_store) una sola vez
+al arrancar y queda en memoria mientras el servidor está activo, así que
+cada consulta solo paga su evaluación. Escucha únicamente en 127.0.0.1.
+
+- GET  /sparql?query=...                         (y POST con formulario
+  o con Content-Type application/sparql-query)
+- SELECT/ASK: JSON (application/sparql-results+json), CSV o TSV
+- CONSTRUCT/DESCRIBE: Turtle o N-Triples
+- GET  /metrics: latencia, filas, errores y timeouts por consulta
+
+Los resultados de SELECT y N-Triples se envían en streaming (chunked) a
+medida que se recorren. Las consultas (filas incluidas) se evalúan en un
+pool de --workers hilos, que es también el máximo de consultas a la vez:
+si no hay hueco o no producen la primera fila antes de --timeout se
+responde 503; si el plazo vence durante el envío, la respuesta se corta
+y la evaluación se cancela.
+El parser SPARQL de rdflib no es seguro entre hilos, así que la
+preparación de las consultas se serializa (y se reutiliza).
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+from rdflib import BNode, Graph, URIRef
+from rdflib.plugins.sparql import prepareQuery
+
+from rdf_store import default_store_path, open_store
+from reto6 import load_graph
+from sparql_cache import normalize_query
+
+
+HOST = "127.0.0.1"
+DEFAULT_PORT = 3030
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_WORKERS = 4
+CHUNK_SIZE = 64 * 1024
+ROW_BATCH = 500
+ROW_QUEUE = 8
+
+SELECT_TYPES = {
+    "json": "application/sparql-results+json",
+    "csv": "text/csv",
+    "tsv": "text/tab-separated-values",
+}
+GRAPH_TYPES = {
+    "turtle": "text/turtle",
+    "nt": "application/n-triples",
+}
+ACCEPT_ALIASES = {
+    "application/json": "json",
+    "text/plain": "nt",
+    "*/*": None,
+}
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+# =========================
+# Métricas
+# =========================
+
+class QueryMetrics:
+    """
+    Estadísticas por consulta (texto normalizado): número de ejecuciones,
+    filas, errores, timeouts y latencias (se guardan las últimas `keep`).
+    """
+
+    def __init__(self, keep: int = 1000):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._queries = {}
+        self.started = time.time()
+
+    def record(self, query: str, ms: float, rows: Optional[int], estado: str) -> None:
+        texto = normalize_query(query)
+        key = hashlib.sha1(texto.encode("utf-8")).hexdigest()[:12]
+        with self._lock:
+            m = self._queries.get(key)
+            if m is None:
+                m = self._queries[key] = {
+                    "query": texto[:300], "count": 0, "errors": 0, "timeouts": 0,
+                    "rows": 0, "latencies": deque(maxlen=self.keep),
+                }
+            m["count"] += 1
+            m["rows"] += rows or 0
+            if estado == "error":
+                m["errors"] += 1
+            elif estado == "timeout":
+                m["timeouts"] += 1
+            m["latencies"].append(ms)
+
+    @staticmethod
+    def _percentil(valores: list, p: float) -> Optional[float]:
+        if not valores:
+            return None
+        return round(valores[min(len(valores) - 1, int(p * len(valores)))], 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            consultas = {}
+            for key, m in self._queries.items():
+                lat = sorted(m["latencies"])
+                consultas[key] = {
+                    "query": m["query"],
+                    "count": m["count"],
+                    "errors": m["errors"],
+                    "timeouts": m["timeouts"],
+                    "rows": m["rows"],
+                    "ms_avg": round(sum(lat) / len(lat), 1) if lat else None,
+                    "ms_p50": self._percentil(lat, 0.50),
+                    "ms_p95": self._percentil(lat, 0.95),
+                    "ms_max": round(lat[-1], 1) if lat else None,
+                }
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": sum(c["count"] for c in consultas.values()),
+            "queries": consultas,
+        }
+
+
+# =========================
+# Serialización
+# =========================
+
+def json_term(term: Any) -> dict:
+    if isinstance(term, URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, BNode):
+        return {"type": "bnode", "value": str(term)}
+    d = {"type": "literal", "value": str(term)}
+    if term.language:
+        d["xml:lang"] = term.language
+    elif term.datatype:
+        d["datatype"] = str(term.datatype)
+    return d
+
+
+def select_json(vars_: list, rows):
+    yield json.dumps({"head": {"vars": vars_}})[:-1] + ', "results": {"bindings": ['
+    for n, row in enumerate(rows):
+        binding = {v: json_term(t) for v, t in zip(vars_, row) if t is not None}
+        yield ("," if n else "") + "\n" + json.dumps(binding, ensure_ascii=False)
+    yield "\n]}}\n"
+
+
+def select_csv(vars_: list, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+    writer.writerow(vars_)
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(["" if t is None else str(t) for t in row])
+        yield buffer.getvalue()
+
+
+def select_tsv(vars_: list, rows):
+    yield "\t".join(f"?{v}" for v in vars_) + "\n"
+    for row in rows:
+        yield "\t".join("" if t is None else t.n3() for t in row) + "\n"
+
+
+SELECT_SERIALIZERS = {"json": select_json, "csv": select_csv, "tsv": select_tsv}
+
+
+def negotiate(accept: str, formato: Optional[str], opciones: dict) -> Optional[str]:
+    """
+    Formato de respuesta: el parámetro format si se indica, si no el
+    primer tipo del Accept (por orden de q) que se sepa servir.
+    None si no hay ninguno aceptable.
+    """
+    if formato:
+        return formato if formato in opciones else None
+
+    candidatos = []
+    for pos, parte in enumerate((accept or "*/*").split(",")):
+        tipo, *params = [x.strip() for x in parte.split(";")]
+        q = 1.0
+        for p in params:
+            if p.startswith("q="):
+                try:
+                    q = float(p[2:])
+                except ValueError:
+                    pass
+        candidatos.append((-q, pos, tipo.lower()))
+
+    por_tipo = {mime: nombre for nombre, mime in opciones.items()}
+    for _, _, tipo in sorted(candidatos):
+        if tipo in por_tipo:
+            return por_tipo[tipo]
+        if tipo in ACCEPT_ALIASES:
+            alias = ACCEPT_ALIASES[tipo]
+            if alias is None or alias not in opciones:
+                return next(iter(opciones))
+            return alias
+    return None
+
+
+# =========================
+# Evaluación
+# =========================
+
+class _Channel:
+    """
+    Cola acotada entre el hilo del pool que evalúa una consulta y el hilo
+    de la petición que la envía: ("result", r), lotes ("rows", [...]),
+    ("end", None) o ("error", e). Si el consumidor se retrasa, el
+    productor espera; si cancela (plazo o cliente desconectado), el
+    productor lo ve y termina.
+    """
+
+    def __init__(self, plazo: float, size: int):
+        self.plazo = plazo
+        self.cola = queue.Queue(maxsize=size)
+        self.cancelado = threading.Event()
+
+    def expired(self) -> bool:
+        return self.cancelado.is_set() or time.monotonic() > self.plazo
+
+    def put(self, tipo: str, valor: Any) -> bool:
+        while not self.expired():
+            try:
+                self.cola.put((tipo, valor), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(self):
+        restante = self.plazo - time.monotonic()
+        try:
+            return self.cola.get(timeout=max(restante, 0))
+        except queue.Empty:
+            self.cancelado.set()
+            raise QueryTimeout("plazo agotado") from None
+
+
+class _CancellableGraph(Graph):
+    """
+    Vista del grafo (mismo store) para un hilo del pool. En cada patrón de
+    tripletas comprueba si la consulta en curso se ha cancelado, de modo
+    que rdflib deja de evaluarla en lugar de ocupar el hilo hasta el final.
+    """
+    canal: Optional[_Channel] = None
+
+    def triples(self, triple):
+        canal = self.canal
+        if canal is None:
+            yield from super().triples(triple)
+            return
+        for n, t in enumerate(super().triples(triple)):
+            if n % 1024 == 0 and canal.expired():
+                raise QueryTimeout("consulta cancelada")
+            yield t
+
+
+class SparqlService:
+    """
+    Grafo cargado más el pool de evaluación. Como mucho `workers`
+    consultas se evalúan a la vez (semáforo tomado antes de enviar la
+    consulta al pool y liberado cuando el hilo del pool termina con ella):
+    las demás esperan un hueco hasta su plazo y si no lo hay reciben 503.
+
+    Toda la evaluación, filas incluidas, ocurre en el hilo del pool, que
+    las pasa en lotes por una cola acotada al hilo de la petición. Con el
+    almacén SQLite cada hilo del pool abre su propia conexión, que nunca
+    sale de ese hilo.
+    """
+
+    def __init__(self, graph: Graph, store_path: Optional[str] = None,
+                 workers: int = DEFAULT_WORKERS, timeout: float = DEFAULT_TIMEOUT):
+        self.graph = graph
+        self.store_path = store_path
+        self.timeout = timeout
+        self.metrics = QueryMetrics()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sparql")
+        self._slots = threading.BoundedSemaphore(workers)
+        self._local = threading.local()
+        self._parse_lock = threading.Lock()
+        self._namespaces = dict(graph.namespaces())
+        self._prepared = lru_cache(maxsize=256)(self._prepare)
+
+    def _prepare(self, texto: str):
+        return prepareQuery(texto, initNs=self._namespaces)
+
+    def prepare(self, query: str):
+        with self._parse_lock:
+            return self._prepared(normalize_query(query))
+
+    def _thread_graph(self) -> _CancellableGraph:
+        g = getattr(self._local, "graph", None)
+        if g is None:
+            base = self.graph if self.store_path is None else open_store(self.store_path)
+            # Solo lectura: sin registrar los prefijos por defecto en el almacén
+            g = self._local.graph = _CancellableGraph(store=base.store, identifier=base.identifier,
+                                                      bind_namespaces="none")
+        return g
+
+    def _evaluate(self, prepared, canal: _Channel) -> None:
+        """
+        Hilo del pool: evalúa la consulta, obtiene la primera fila (donde
+        rdflib hace el trabajo de ORDER BY, GROUP BY, etc.) antes de
+        publicar el resultado y después envía el resto de filas en lotes.
+        """
+        g = self._thread_graph()
+        g.canal = canal
+        try:
+            result = g.query(prepared)
+            if result.type != "SELECT":
+                canal.put("result", result)
+                return
+
+            filas = iter(result)
+            lote = list(islice(filas, 1))
+            if not canal.put("result", result):
+                return
+            while lote:
+                if not canal.put("rows", lote):
+                    return
+                lote = list(islice(filas, ROW_BATCH))
+            canal.put("end", None)
+        except Exception as e:
+            canal.put("error", e)
+        finally:
+            g.canal = None
+            self._slots.release()
+
+    def _rows(self, canal: _Channel):
+        try:
+            while True:
+                tipo, valor = canal.get()
+                if tipo == "end":
+                    return
+                if tipo == "error":
+                    raise valor
+                yield from valor
+        finally:
+            # Fin normal, plazo vencido o cliente desconectado: el productor para
+            canal.cancelado.set()
+
+    def execute(self, query: str):
+        """
+        Devuelve (result, filas, plazo); filas es None salvo en SELECT y
+        hay que cerrarla (close) si no se recorre entera. Lanza
+        QueryTimeout si no hay hueco en el pool o resultado dentro del
+        tiempo máximo.
+        """
+        plazo = time.monotonic() + self.timeout
+        prepared = self.prepare(query)
+        if not self._slots.acquire(timeout=self.timeout):
+            raise QueryTimeout(f"sin hueco libre en {self.timeout:g} s")
+
+        canal = _Channel(plazo, ROW_QUEUE)
+        try:
+            self.pool.submit(self._evaluate, prepared, canal)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        try:
+            tipo, valor = canal.get()
+        except QueryTimeout:
+            raise QueryTimeout(f"la consulta superó {self.timeout:g} s") from None
+        if tipo == "error":
+            canal.cancelado.set()
+            raise valor
+        return valor, (self._rows(canal) if valor.type == "SELECT" else None), plazo
+
+
+def _with_deadline(filas, plazo: float, contador: list):
+    for fila in filas:
+        if time.monotonic() > plazo:
+            raise QueryTimeout("plazo agotado durante el envío")
+        contador[0] += 1
+        yield fila
+
+
+# =========================
+# HTTP
+# =========================
+
+class SparqlHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service: SparqlService = None
+
+    # --- rutas -------------------------------------------------------
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self._send_json(200, self.service.metrics.snapshot())
+        elif url.path == "/sparql":
+            self._handle_query(parse_qs(url.query))
+        else:
+            self._send_error(404, "Rutas disponibles: /sparql, /metrics")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/sparql":
+            self._send_error(404, "Rutas disponibles: /sparql, /metrics")
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8")
+        params = parse_qs(url.query)
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        if content_type == "application/sparql-query":
+            params["query"] = [body]
+        elif content_type == "application/x-www-form-urlencoded":
+            params.update(parse_qs(body))
+        elif content_type == "application/sparql-update":
+            params["update"] = [body]
+        else:
+            self._send_error(415, f"Content-Type no soportado: {content_type or '-'}")
+            return
+        self._handle_query(params)
+
+    # --- consulta ----------------------------------------------------
+    def _handle_query(self, params: dict):
+        self._streaming = False
+        if "update" in params:
+            self._send_error(400, "El endpoint es de solo lectura: SPARQL Update no está permitido")
+            return
+        queries = params.get("query") or []
+        if len(queries) != 1 or not queries[0].strip():
+            self._send_error(400, "Se necesita exactamente un parámetro query")
+            return
+
+        query = queries[0]
+        formato = (params.get("format") or [None])[0]
+        t0 = time.perf_counter()
+        contador = [0]
+        estado = "ok"
+        filas = None
+
+        try:
+            result, filas, plazo = self.service.execute(query)
+
+            if result.type in ("SELECT", "ASK"):
+                nombre = negotiate(self.headers.get("Accept"), formato, SELECT_TYPES)
+                if nombre is None:
+                    estado = "error"
+                    self._send_error(406, f"Formatos disponibles: {', '.join(SELECT_TYPES)}")
+                elif result.type == "ASK":
+                    contador[0] = 1
+                    self._send_ask(result.askAnswer, nombre)
+                else:
+                    vars_ = [str(v) for v in result.vars]
+                    cuerpo = SELECT_SERIALIZERS[nombre](vars_, _with_deadline(filas, plazo, contador))
+                    self._send_stream(SELECT_TYPES[nombre], cuerpo)
+            else:
+                nombre = negotiate(self.headers.get("Accept"), formato, GRAPH_TYPES)
+                contador[0] = len(result.graph)
+                if nombre is None:
+                    estado = "error"
+                    self._send_error(406, f"Formatos disponibles: {', '.join(GRAPH_TYPES)}")
+                elif nombre == "nt":
+                    lineas = (f"{s.n3()} {p.n3()} {o.n3()} .\n" for s, p, o in result.graph)
+                    self._send_stream(GRAPH_TYPES["nt"], lineas)
+                else:
+                    self._send_bytes(200, GRAPH_TYPES["turtle"], result.graph.serialize(format="turtle").encode("utf-8"))
+
+        except QueryTimeout as e:
+            estado = "timeout"
+            self._send_error(503, f"Tiempo agotado: {e}")
+        except Exception as e:
+            estado = "error"
+            self._send_error(400, f"Error en la consulta: {e}")
+        finally:
+            if filas is not None:
+                filas.close()
+            ms = (time.perf_counter() - t0) * 1000
+            self.service.metrics.record(query, ms, contador[0], estado)
+            print(f"[INFO] {estado.upper():<7} {ms:8.1f} ms  {contador[0]:>7} filas  "
+                  f"{normalize_query(query)[:80]}")
+
+    # --- respuestas --------------------------------------------------
+    def _send_ask(self, respuesta: bool, nombre: str):
+        if nombre == "json":
+            cuerpo = json.dumps({"head": {}, "boolean": bool(respuesta)})
+            self._send_bytes(200, SELECT_TYPES["json"], cuerpo.encode("utf-8"))
+        else:
+            # CSV/TSV no definen ASK: se devuelve el booleano en una columna
+            self._send_bytes(200, SELECT_TYPES[nombre], f"_askResult\n{str(bool(respuesta)).lower()}\n".encode("utf-8"))
+
+    def _send_stream(self, content_type: str, partes):
+        """
+        Envía las partes con Transfer-Encoding: chunked, agrupadas en
+        bloques de CHUNK_SIZE. Si el plazo vence a mitad, se cierra la
+        conexión sin el bloque final (el cliente ve una respuesta truncada).
+        """
+        self._streaming = True
+        self.send_response(200)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        buffer = []
+        pendiente = 0
+        try:
+            for parte in partes:
+                datos = parte.encode("utf-8")
+                buffer.append(datos)
+                pendiente += len(datos)
+                if pendiente >= CHUNK_SIZE:
+                    self._write_chunk(b"".join(buffer))
+                    buffer, pendiente = [], 0
+            if buffer:
+                self._write_chunk(b"".join(buffer))
+            self.wfile.write(b"0\r\n\r\n")
+        except Exception:
+            self.close_connection = True
+            raise
+
+    def _write_chunk(self, datos: bytes):
+        self.wfile.write(f"{len(datos):X}\r\n".encode("ascii") + datos + b"\r\n")
+
+    def _send_bytes(self, status: int, content_type: str, datos: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _send_json(self, status: int, obj: Any):
+        self._send_bytes(status, "application/json", json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8"))
+
+    def _send_error(self, status: int, mensaje: str):
+        if getattr(self, "_streaming", False):
+            # Cabeceras ya enviadas: la conexión se cierra sin más
+            return
+        self._send_bytes(status, "text/plain", (mensaje + "\n").encode("utf-8"))
+
+    def log_message(self, format, *args):
+        # Cada consulta ya se registra en _handle_query
+        pass
+
+
+def make_server(service: SparqlService, port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    handler = type("Handler", (SparqlHandler,), {"service": service})
+    server = ThreadingHTTPServer((HOST, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# =========================
+# Main
+# =========================
+
+def main():
+    ap = argparse.ArgumentParser(description="Endpoint SPARQL local sobre el grafo del reto 5")
+    ap.add_argument("--graph", default=None,
+                    help="Ruta al grafo RDF (por defecto: resultados/reto5/grafo_melanoma.ttl)")
+    ap.add_argument("--format", default=None,
+                    help="Formato del grafo RDF (por defecto según la extensión: .ttl, .nt, .nq)")
+    ap.add_argument("--backend", choices=["memory", "sqlite"], default="memory",
+                    help="memory: grafo en memoria; sqlite: almacén persistente de rdf_store")
+    ap.add_argument("--store", default=None,
+                    help="Fichero del almacén SQLite (por defecto .cache/rdf_store/<grafo>.sqlite)")
+    ap.add_argument("--rebuild-store", action="store_true",
+                    help="Reconstruye el almacén aunque el grafo de origen no haya cambiado")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                    help="Segundos máximos por consulta")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                    help="Consultas evaluadas a la vez")
+    args = ap.parse_args()
+
+    BASE_DIR = Path(__file__).resolve().parents[2]
+    if args.graph is None:
+        graph_path = BASE_DIR / "resultados" / "reto5" / "grafo_melanoma.ttl"
+    else:
+        graph_path = Path(args.graph)
+
+    print(f"Cargando grafo RDF: {graph_path}")
+    t0 = time.perf_counter()
+    g = load_graph(graph_path, args.backend, args.store, args.format, args.rebuild_store)
+    print(f"Tripletas cargadas: {len(g)} ({time.perf_counter() - t0:.2f} s)")
+
+    store_path = None
+    if args.backend == "sqlite":
+        store_path = args.store or default_store_path(str(graph_path))
+
+    service = SparqlService(g, store_path, args.workers, args.timeout)
+    server = make_server(service, args.port)
+    print(f"Endpoint SPARQL en http://{HOST}:{args.port}/sparql (métricas en /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo el endpoint...")
+    finally:
+        server.server_close()
+        service.pool.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    main()
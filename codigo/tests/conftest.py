@@ -0,0 +1,42 @@
+"""
+Configuración común de los tests: los scripts de codigo/scripts se
+importan como módulos sueltos, igual que cuando se ejecutan.
+"""
+
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+MONGO_TEST_URI = os.environ.get("MONGO_TEST_URI", "mongodb://localhost:27017/?directConnection=true")
+
+
+@pytest.fixture
+def mongod():
+    """
+    Cliente de un mongod local (MONGO_TEST_URI); el test se salta si no hay
+    ninguno accesible.
+    """
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(MONGO_TEST_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        pytest.skip(f"no hay mongod accesible en {MONGO_TEST_URI}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def replica_set(mongod):
+    """
+    Como mongod, pero exige un replica set (change streams).
+    """
+    if not mongod.admin.command("hello").get("setName"):
+        pytest.skip("el mongod de pruebas no es un replica set")
+    return mongod
@@ -0,0 +1,161 @@
+"""
+conversion_mongobd: la conversión por bloques da los mismos documentos que
+la lectura completa del TSV, el motor por columnas los mismos que el fila
+a fila, las tareas del ETL en paralelo informan de cada fallo y los
+deltas de OncoKB no se pierden entre descargas.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from conversion_mongobd import (
+    MUTATION_COLUMNS, PATIENT_COLUMNS, SAMPLE_COLUMNS, ETLTask, convert_to_json, download_and_convert_oncokb,
+    oncokb_version, run_etl_tasks,
+)
+
+ESTUDIO = Path(__file__).resolve().parents[1] / "datos" / "mel_tsam_liang_2017"
+
+FILAS = [
+    # El primer bloque (2 filas) tiene huecos en posiciones y recuentos;
+    # el segundo no, y su cromosoma parece un número
+    {"Hugo_Symbol": "BRAF", "Chromosome": "7", "Start_Position": "140453136", "t_ref_count": "10"},
+    {"Hugo_Symbol": "NRAS", "Chromosome": "X", "Start_Position": "", "t_ref_count": ""},
+    {"Hugo_Symbol": "KIT", "Chromosome": "4", "Start_Position": "102", "t_ref_count": "7"},
+    {"Hugo_Symbol": "TP53", "Chromosome": "17", "Start_Position": "7577120", "t_ref_count": "3"},
+]
+
+
+def _maf(path):
+    lineas = ["#version 2.4", "\t".join(MUTATION_COLUMNS)]
+    for fila in FILAS:
+        valores = {c: f"{c}_{fila['Hugo_Symbol']}" for c in MUTATION_COLUMNS}
+        valores.update({"End_Position": "", "t_alt_count": "1", "t_depth": "", "Variant_Type": "SNP"})
+        valores.update(fila)
+        lineas.append("\t".join(valores[c] for c in MUTATION_COLUMNS))
+    path.write_text("\n".join(lineas) + "\n", encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("engine", ["vectorized", "records"])
+def test_chunked_matches_unchunked(tmp_path, engine):
+    maf = _maf(tmp_path / "data_mutations.txt")
+    completo, bloques = tmp_path / "out" / "completo.json", tmp_path / "out" / "bloques.json"
+
+    convert_to_json(str(maf), str(completo), MUTATION_COLUMNS, engine=engine)
+    convert_to_json(str(maf), str(bloques), MUTATION_COLUMNS, chunksize=2, engine=engine)
+
+    esperado = json.loads(completo.read_text(encoding="utf-8"))
+    assert json.loads(bloques.read_text(encoding="utf-8")) == esperado
+    assert esperado[2]["variant_id"] == "KIT_102_SNP"
+    assert esperado[1]["location"]["coordinates"]["start"] is None
+    assert esperado[0]["location"]["chromosome"] == "7"
+
+
+@pytest.mark.parametrize("fichero,columnas", [
+    ("data_clinical_patient.txt", PATIENT_COLUMNS),
+    ("data_clinical_sample.txt", SAMPLE_COLUMNS),
+])
+def test_vectorized_engine_matches_records(tmp_path, fichero, columnas):
+    vectorizado, registros = tmp_path / "vectorizado.json", tmp_path / "registros.json"
+
+    convert_to_json(str(ESTUDIO / fichero), str(vectorizado), columnas, engine="vectorized")
+    convert_to_json(str(ESTUDIO / fichero), str(registros), columnas, engine="records")
+
+    esperado = json.loads(registros.read_text(encoding="utf-8"))
+    assert len(esperado) > 30
+    assert json.loads(vectorizado.read_text(encoding="utf-8")) == esperado
+
+
+# =========================
+# ETL en paralelo
+# =========================
+
+def _descarga_fallida(url):
+    raise ConnectionError(f"sin conexión con {url}")
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_etl_tasks_report(tmp_path, workers):
+    salida = tmp_path / "out"
+    tareas = [
+        ETLTask("patients", "cpu", convert_to_json, (str(ESTUDIO / "data_clinical_patient.txt"),
+                                                      str(salida / "patients.json"), PATIENT_COLUMNS)),
+        ETLTask("variants", "cpu", convert_to_json, (str(tmp_path / "no_existe.txt"), str(salida / "variants.json"),
+                                                      MUTATION_COLUMNS), {"chunksize": 10}),
+        ETLTask("oncokb", "io", _descarga_fallida, ("http://oncokb.test",)),
+        ETLTask("samples", "cpu", convert_to_json, (str(ESTUDIO / "data_clinical_sample.txt"),
+                                                     str(salida / "samples.json"), SAMPLE_COLUMNS)),
+    ]
+
+    resultados = run_etl_tasks(tareas, workers=workers)
+
+    # Mismo orden que las tareas; un fallo no detiene a las demás
+    assert [r["nombre"] for r in resultados] == ["patients", "variants", "oncokb", "samples"]
+    assert all(r["segundos"] is not None for r in resultados)
+    errores = {r["nombre"]: r["error"] for r in resultados}
+    assert errores["patients"] is None and errores["samples"] is None
+    assert errores["variants"].startswith("FileNotFoundError")
+    assert errores["oncokb"] == "ConnectionError: sin conexión con http://oncokb.test"
+    assert json.loads((salida / "samples.json").read_text(encoding="utf-8"))
+
+
+# =========================
+# OncoKB incremental
+# =========================
+
+class _Respuesta:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class _Sesion:
+    def __init__(self, respuestas):
+        self.respuestas = list(respuestas)
+        self.cabeceras = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.cabeceras.append(headers)
+        return self.respuestas.pop(0)
+
+
+def _gen(symbol, level="LEVEL_1"):
+    return {"hugoSymbol": symbol, "highestSensitiveLevel": level, "alterations": []}
+
+
+def _oncokb(tmp_path, respuestas, incremental=True):
+    salida = tmp_path / "out" / "oncokb_genes.json"
+    sesion = _Sesion(respuestas)
+    for r in respuestas:
+        download_and_convert_oncokb(str(salida), incremental=incremental, url="http://oncokb.test",
+                                    state_dir=str(tmp_path / "state"), session=sesion)
+    delta = json.loads((tmp_path / "out" / "oncokb_genes.delta.json").read_text(encoding="utf-8"))
+    return delta, sesion
+
+
+def test_oncokb_full_refresh_saves_state(tmp_path):
+    _, sesion = _oncokb(tmp_path, [_Respuesta(200, [_gen("BRAF")], {"ETag": '"v1"'})], incremental=False)
+    _, sesion = _oncokb(tmp_path, [_Respuesta(304)])
+    assert sesion.cabeceras[0] == {"If-None-Match": '"v1"'}
+
+
+def test_oncokb_unapplied_deltas_accumulate(tmp_path):
+    v1 = [_gen("BRAF"), _gen("NRAS"), _gen("KIT")]
+    v2 = [_gen("BRAF", "LEVEL_2"), _gen("NRAS"), _gen("KIT")]
+    v3 = [_gen("BRAF", "LEVEL_2"), _gen("KIT", "LEVEL_3"), _gen("TP53")]
+    delta, _ = _oncokb(tmp_path, [_Respuesta(200, v1), _Respuesta(200, v2), _Respuesta(304), _Respuesta(200, v3)])
+
+    assert delta["full"] is False
+    assert delta["version"] == oncokb_version(v3)
+    assert delta["bases"] == [oncokb_version(v1), oncokb_version(v2)]
+    assert sorted(u["gene"]["symbol"] for u in delta["upserts"]) == ["BRAF", "KIT", "TP53"]
+    assert delta["deletes"] == ["NRAS"]
@@ -0,0 +1,37 @@
+"""
+mongo_indexes: no se crean índices sobre campos ausentes en los datos y
+la clave de negocio usa el índice único de mongo_loader.
+"""
+
+import pytest
+
+from mongo_indexes import provision_indexes
+
+QUERIES = """[genes_oncokb]
+db.variants.aggregate([
+  { "$lookup": { "from": "oncokb_genes", "localField": "gene.symbol", "foreignField": "HugoSymbol", "as": "oncokb" } }
+])
+"""
+
+
+@pytest.fixture
+def db():
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient()["mongo_indexes_test"]
+
+
+def test_absent_lookup_field_is_not_indexed(db, tmp_path):
+    queries = tmp_path / "queries.txt"
+    queries.write_text(QUERIES, encoding="utf-8")
+    db.oncokb_genes.insert_one({"gene": {"symbol": "BRAF"}})
+    db.variants.insert_one({"variant_id": "BRAF_1_SNP", "samples": {"tumor_sample": "S-1"}, "gene": {"symbol": "BRAF"},
+                            "location": {"coordinates": {"end": 1}}, "alleles": {"reference": "A", "tumor": {"allele1": "T"}}})
+
+    pendientes = provision_indexes(db, str(queries))
+
+    indices = db.oncokb_genes.index_information()
+    assert not any(k == "HugoSymbol" for info in indices.values() for k, _ in info["key"])
+    assert indices["gene.symbol_1"].get("unique")
+    clave = "variant_id_1_samples.tumor_sample_1_location.coordinates.end_1_alleles.reference_1_alleles.tumor.allele1_1"
+    assert db.variants.index_information()[clave].get("unique")
+    assert any("HugoSymbol" in m for m in pendientes["genes_oncokb"])
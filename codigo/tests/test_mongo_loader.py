@@ -0,0 +1,108 @@
+"""
+mongo_loader contra un mongod local (se omiten si no hay servidor):
+índice único con claves repetidas en un lote, alelos distintos en la
+misma posición, índices de la sombra y deltas aplicados solo sobre su
+versión base.
+"""
+
+import json
+import uuid
+
+import pytest
+
+import mongo_loader
+from mongo_loader import (
+    COLLECTION_KEYS, apply_delta, dedupe_batch, delta_applicable, ensure_key_index, get_data_version,
+    load_shadow, load_upsert, set_data_version,
+)
+
+
+@pytest.fixture
+def db(mongod):
+    nombre = f"mongo_loader_{uuid.uuid4().hex[:8]}"
+    yield mongod[nombre]
+    mongod.drop_database(nombre)
+
+
+def _json(path, docs):
+    path.write_text(json.dumps(docs), encoding="utf-8")
+    return str(path)
+
+
+def _genes(*simbolos):
+    return [{"gene": {"symbol": s}, "level": n} for n, s in enumerate(simbolos)]
+
+
+def _variante(fin, ref, alelo, muestra="S-1"):
+    # Dos filas del MAF en la misma posición y muestra: mismo variant_id
+    return {"variant_id": "KIT_102_INS", "samples": {"tumor_sample": muestra},
+            "location": {"coordinates": {"start": 102, "end": fin}},
+            "alleles": {"reference": ref, "tumor": {"allele1": alelo}}}
+
+
+def test_same_position_alleles_are_distinct_keys():
+    lote = [_variante(103, "-", "A"), _variante(103, "-", "AT"), _variante(104, "GT", "-"), _variante(103, "-", "A")]
+    assert len(dedupe_batch(lote, COLLECTION_KEYS["variants"])) == 3
+
+
+def test_same_position_alleles_are_all_loaded(db, tmp_path):
+    docs = [_variante(103, "-", "A"), _variante(103, "-", "AT"), _variante(103, "-", "A", "S-2")]
+    load_upsert(db, "variants", _json(tmp_path / "v.json", docs), COLLECTION_KEYS["variants"])
+    assert db.variants.count_documents({}) == 3
+
+    load_shadow(db, "variants", _json(tmp_path / "v.json", docs), COLLECTION_KEYS["variants"])
+    assert db.variants.count_documents({}) == 3
+
+
+def test_repeated_keys_in_one_batch_keep_the_last(db, tmp_path):
+    docs = [{"patient_id": "P-1", "v": 1}, {"patient_id": "P-2", "v": 1}, {"patient_id": "P-1", "v": 2}]
+    stats = load_upsert(db, "patients", _json(tmp_path / "p.json", docs), ("patient_id",))
+
+    assert stats["escritos"] == 2
+    assert db.patients.count_documents({}) == 2
+    assert db.patients.find_one({"patient_id": "P-1"})["v"] == 2
+
+
+def test_key_index_becomes_unique(db):
+    db.patients.create_index("patient_id")
+    db.patients.insert_many([{"patient_id": "P-1"}, {"patient_id": "P-1"}])
+
+    ensure_key_index(db.patients, ("patient_id",))
+
+    assert db.patients.index_information()["patient_id_1"].get("unique")
+    assert db.patients.count_documents({}) == 1
+
+
+def test_shadow_keeps_live_indexes(db, tmp_path):
+    db.samples.insert_one({"sample_id": "S-0"})
+    db.samples.create_index("patient.id", name="lookup_patient")
+
+    # La clave S-1 se repite en dos lotes distintos
+    docs = [{"sample_id": "S-1", "v": 1}, {"sample_id": "S-2"}, {"sample_id": "S-1", "v": 2}]
+    load_shadow(db, "samples", _json(tmp_path / "s.json", docs), ("sample_id",), batch_size=2)
+
+    indices = db.samples.index_information()
+    assert "lookup_patient" in indices and indices["sample_id_1"].get("unique")
+    assert sorted(d["sample_id"] for d in db.samples.find()) == ["S-1", "S-2"]
+    assert db.samples.find_one({"sample_id": "S-1"})["v"] == 2
+    assert "samples" + mongo_loader.SHADOW_SUFFIX not in db.list_collection_names()
+
+
+def test_delta_only_applies_on_its_base_version(db, tmp_path):
+    load_upsert(db, "oncokb_genes", _json(tmp_path / "g.json", _genes("BRAF", "NRAS")), ("gene.symbol",))
+    delta = {"key": "gene.symbol", "full": False, "version": "v2", "bases": ["v1"],
+             "upserts": _genes("KIT"), "deletes": ["NRAS"]}
+    delta_path = _json(tmp_path / "g.delta.json", delta)
+
+    # Sin versión registrada (o con otra) no se aplica: hace falta la carga completa
+    assert not delta_applicable(db, "oncokb_genes", delta)
+    set_data_version(db, "oncokb_genes", "v0")
+    assert not delta_applicable(db, "oncokb_genes", delta)
+
+    set_data_version(db, "oncokb_genes", "v1")
+    assert delta_applicable(db, "oncokb_genes", delta)
+    apply_delta(db, "oncokb_genes", delta_path)
+
+    assert get_data_version(db, "oncokb_genes") == "v2"
+    assert sorted(d["gene"]["symbol"] for d in db.oncokb_genes.find()) == ["BRAF", "KIT"]
+    assert not delta_applicable(db, "oncokb_genes", dict(delta, full=True))
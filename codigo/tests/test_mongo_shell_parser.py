@@ -0,0 +1,131 @@
+"""
+mongo_shell_parser: find con filtro, proyección y modificadores,
+opciones de aggregate, constructores BSON, expresiones regulares,
+secuencias de escape y queries.txt frente al antiguo regex + json.loads.
+"""
+
+import json
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from bson import ObjectId
+from bson.int64 import Int64
+from bson.regex import Regex
+
+from mongo_shell_parser import MongoShellSyntaxError, parse_query, parse_value
+from mongoxml_to_html import load_queries
+
+QUERIES_FILE = Path(__file__).resolve().parents[1] / "scripts" / "queries.txt"
+
+
+class _Coleccion:
+    """Registra los argumentos con que se llama a find/aggregate."""
+
+    def find(self, filtro, **kwargs):
+        return ("find", filtro, kwargs)
+
+    def aggregate(self, pipeline, **kwargs):
+        return ("aggregate", pipeline, kwargs)
+
+
+def test_find_with_projection_and_modifiers():
+    q = parse_query("""db.samples.find(
+        { 'patient.id': "P-1", stage: { $in: ['III', 'IV'] }, },  // coma final
+        { _id: 0, sample_id: 1 }
+    ).sort({ sample_id: -1 }).skip(10).limit(5);""")
+
+    assert (q.collection, q.op) == ("samples", "find")
+    assert q.filter == {"patient.id": "P-1", "stage": {"$in": ["III", "IV"]}}
+    assert q.modifiers == {"sort": {"sample_id": -1}, "skip": 10, "limit": 5}
+    assert q.command() == {"find": "samples", "filter": q.filter, "projection": {"_id": 0, "sample_id": 1},
+                           "sort": {"sample_id": -1}, "skip": 10, "limit": 5}
+    assert q.execute(_Coleccion(), batch_size=100) == ("find", q.filter, {
+        "projection": {"_id": 0, "sample_id": 1}, "sort": [("sample_id", -1)], "skip": 10, "limit": 5,
+        "batch_size": 100})
+
+
+def test_get_collection_and_find_one():
+    q = parse_query('db.getCollection("oncokb.genes").findOne({ level: 1 })')
+    assert (q.collection, q.op, q.filter) == ("oncokb.genes", "findOne", {"level": 1})
+    assert q.command()["limit"] == 1
+
+
+def test_aggregate_options():
+    q = parse_query('db.variants.aggregate([{ $match: { "gene.symbol": "BRAF" } }], '
+                    '{ allowDiskUse: true, batchSize: 50, comment: "informe" })')
+
+    assert q.pipeline == [{"$match": {"gene.symbol": "BRAF"}}]
+    assert q.options == {"allowDiskUse": True, "batchSize": 50, "comment": "informe"}
+    assert q.command() == {"aggregate": "variants", "pipeline": q.pipeline, "cursor": {"batchSize": 50},
+                           "allowDiskUse": True, "comment": "informe"}
+    assert q.execute(_Coleccion())[2] == {"allowDiskUse": True, "batchSize": 50, "comment": "informe"}
+
+    with pytest.raises(MongoShellSyntaxError, match="explain"):
+        parse_query("db.variants.aggregate([], { explain: true })")
+
+
+def test_allow_disk_use_without_argument():
+    assert parse_query("db.variants.find({}).allowDiskUse().limit(1)").modifiers == {"allowDiskUse": True, "limit": 1}
+    with pytest.raises(MongoShellSyntaxError, match="espera un argumento"):
+        parse_query("db.variants.find({}).limit()")
+
+
+def test_bson_constructors():
+    valor = parse_value("""{
+        fecha: ISODate("2024-03-01T10:00:00Z"), desde: new Date('2024-03-01'),
+        id: ObjectId("65e1a0b2c3d4e5f601234567"), n: NumberLong("9007199254740993"), m: NumberInt(7),
+    }""")
+
+    assert valor["fecha"] == datetime(2024, 3, 1, 10, tzinfo=timezone.utc)
+    assert valor["desde"] == datetime(2024, 3, 1, tzinfo=timezone.utc)
+    assert valor["id"] == ObjectId("65e1a0b2c3d4e5f601234567")
+    assert isinstance(valor["n"], Int64) and valor["n"] == 9007199254740993
+    assert valor["m"] == 7
+
+    with pytest.raises(MongoShellSyntaxError, match="constructor no soportado"):
+        parse_value("eval('1')")
+
+
+def test_regex_literals():
+    valor = parse_value(r"{ gene: /^BRAF\/V600/i, otro: RegExp('^KIT', 'm') }")
+    assert valor["gene"] == Regex(r"^BRAF\/V600", "i")
+    assert valor["otro"] == Regex("^KIT", "m")
+
+
+def test_infinity_and_nan():
+    valor = parse_value("[Infinity, -Infinity, +Infinity, NaN, -2.5e3]")
+    assert valor[:3] == [float("inf"), float("-inf"), float("inf")]
+    assert valor[3] != valor[3]
+    assert valor[4] == -2500.0
+
+
+def test_string_escapes():
+    assert parse_value(r'"a\"b\n\u00e9\/"') == 'a"b\né/'
+
+
+@pytest.mark.parametrize("texto,posicion", [
+    ('"abc\\', 5),
+    (r'"\u12"', 2),
+    (r'"\u00g1"', 2),
+    ('"\\u', 2),
+])
+def test_bad_escape_raises_with_position(texto, posicion):
+    with pytest.raises(MongoShellSyntaxError, match=f"posición {posicion}:"):
+        parse_value(texto)
+
+
+def _legacy_spec(raw_query):
+    # El parseo anterior: regex sobre db.<col>.<op>(...) y json.loads de los argumentos
+    collection, op, args = re.match(r"db\.(\w+)\.(\w+)\((.*)\)", raw_query.replace("\n", "")).groups()
+    return collection, op, json.loads(args.strip()) if args.strip() else {}
+
+
+@pytest.mark.parametrize("nombre,raw", sorted(load_queries(str(QUERIES_FILE)).items()))
+def test_queries_file_matches_legacy_parse(nombre, raw):
+    collection, op, args = _legacy_spec(raw)
+    q = parse_query(raw)
+
+    assert (q.collection, q.op) == (collection, op)
+    assert (q.pipeline if op == "aggregate" else q.filter) == args
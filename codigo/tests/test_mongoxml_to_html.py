@@ -0,0 +1,159 @@
+"""
+mongoxml_to_html: el XML escrito en streaming desde el cursor es el mismo
+que el del árbol completo, las hojas XSLT se compilan una vez y se
+recompilan si cambian, y --page-size también pagina las secciones con su
+propia hoja XSLT, transformando el XML por lotes de documentos. Las
+consultas en paralelo generan los mismos informes que en serie.
+"""
+
+import argparse
+import os
+from pathlib import Path
+
+import pytest
+from lxml import etree
+
+import mongoxml_to_html
+from mongoxml_to_html import (
+    get_xslt, iter_xml_pages, load_query_options, page_path, query_to_xml, remove_old_pages, write_xml_stream,
+    xml_to_html, xml_to_html_pages,
+)
+
+TEMPLATE = str(Path(__file__).resolve().parents[1] / "scripts" / "template.xslt")
+
+
+def _xml(tmp_path, n):
+    docs = [{"patient_id": f"P-{i}", "variants": [{"gene": "BRAF"}, {"gene": "NRAS"}]} for i in range(n)]
+    xml_path = str(tmp_path / "consulta.xml")
+    write_xml_stream(iter(docs), xml_path)
+    return xml_path
+
+
+def test_iter_xml_pages_splits_top_level_documents(tmp_path):
+    paginas = list(iter_xml_pages(_xml(tmp_path, 5), 2))
+
+    assert [len(p) for p in paginas] == [2, 2, 1]
+    assert [p.findtext("element/patient_id") for p in paginas] == ["P-0", "P-2", "P-4"]
+    assert len(paginas[0].find("element/variants")) == 2
+
+
+def test_xslt_sections_are_paginated(tmp_path):
+    html_path = str(tmp_path / "consulta.html")
+    xml_to_html_pages(_xml(tmp_path, 5), TEMPLATE, html_path, 2)
+
+    paginas = [page_path(html_path, p) for p in (1, 2, 3)]
+    assert all(os.path.exists(p) for p in paginas)
+    assert not os.path.exists(page_path(html_path, 4))
+
+    segunda = etree.parse(paginas[1], etree.HTMLParser())
+    celdas = [td.text for td in segunda.iter("td") if td.text and td.text.startswith("P-")]
+    assert celdas == ["P-2", "P-3"]
+    assert len(segunda.findall(".//div[@class='nav']")) == 2
+    assert "5 documentos en 3 páginas" in Path(html_path).read_text(encoding="utf-8")
+
+
+def test_remove_old_pages_beyond_four_digits(tmp_path):
+    html_path = str(tmp_path / "consulta.html")
+    viejas = [page_path(html_path, p) for p in (1, 9999, 10000, 123456)]
+    otras = [html_path, str(tmp_path / "consulta_p12.html"), str(tmp_path / "consulta_p0001x.html"),
+             str(tmp_path / "otra_p0001.html")]
+    for path in viejas + otras:
+        Path(path).write_text("", encoding="utf-8")
+
+    remove_old_pages(html_path)
+
+    assert not any(os.path.exists(p) for p in viejas)
+    assert all(os.path.exists(p) for p in otras)
+
+
+def _canonico(path):
+    return etree.tostring(etree.parse(path, etree.XMLParser(remove_blank_text=True)), method="c14n")
+
+
+def test_streamed_xml_matches_tree(tmp_path):
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient()["mongoxml_test"]
+    db.patients.insert_many([
+        {"patient_id": f"P-{i}", "survival": {"months": 1.5 * i, "status": None},
+         "variants": [{"gene": "BRAF"}, {"gene": "NRAS", "tags": ["a", "b"]}], "tumor.ulcerado": i % 2 == 0}
+        for i in range(4)
+    ])
+    consulta = 'db.patients.find({}, {"_id": 0})'
+    (tmp_path / "arbol").mkdir()
+    (tmp_path / "stream").mkdir()
+
+    arbol, n_arbol = query_to_xml(db, "q", consulta, str(tmp_path / "arbol"))
+    stream, n_stream = query_to_xml(db, "q", consulta, str(tmp_path / "stream"), stream=True)
+
+    assert n_arbol == n_stream == 4
+    assert _canonico(stream) == _canonico(arbol)
+
+    xml_to_html(arbol, TEMPLATE, str(tmp_path / "arbol.html"))
+    xml_to_html(stream, TEMPLATE, str(tmp_path / "stream.html"))
+    assert (tmp_path / "stream.html").read_bytes() == (tmp_path / "arbol.html").read_bytes()
+
+
+HOJA = """<xsl:stylesheet version="1.0" xmlns:xsl="http://www.w3.org/1999/XSL/Transform">
+  <xsl:template match="/"><p>{}</p></xsl:template>
+</xsl:stylesheet>"""
+
+
+def test_xslt_cache_recompiles_when_mtime_changes(tmp_path):
+    hoja = tmp_path / "hoja.xslt"
+    hoja.write_text(HOJA.format("uno"), encoding="utf-8")
+    xml = etree.fromstring("<root/>")
+
+    primera = get_xslt(str(hoja))
+    assert get_xslt(str(hoja)) is primera
+    assert "uno" in str(primera(xml))
+
+    hoja.write_text(HOJA.format("dos"), encoding="utf-8")
+    mtime = os.path.getmtime(hoja) + 5
+    os.utime(hoja, (mtime, mtime))
+
+    segunda = get_xslt(str(hoja))
+    assert segunda is not primera
+    assert "dos" in str(segunda(xml))
+    assert [k for k in mongoxml_to_html._XSLT_CACHE if k[0] == str(hoja)] == [(str(hoja), mtime)]
+
+
+def test_xslt_option_per_section(tmp_path):
+    consultas = tmp_path / "queries.txt"
+    consultas.write_text("[a]\n// xslt: hojas/a.xslt\ndb.x.find({})\n\n[b]\n// comentario\ndb.y.find({})\n",
+                         encoding="utf-8")
+    assert load_query_options(str(consultas)) == {"a": {"xslt": str(tmp_path / "hojas" / "a.xslt")}, "b": {}}
+
+
+def _args(outdir, jobs):
+    return argparse.Namespace(
+        xslt=TEMPLATE, outdir=outdir, stream=False, batch_size=None, renderer="xslt", write_xml=False,
+        page_size=0, query_cache=False, jobs=jobs,
+    )
+
+
+def test_concurrent_reports_match_sequential(tmp_path):
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient()["mongoxml_test"]
+    db.patients.insert_many([{"patient_id": f"P-{i}", "edad": 40 + i} for i in range(6)])
+    db.samples.insert_many([{"sample_id": f"S-{i}", "patient_id": f"P-{i % 3}"} for i in range(5)])
+    consultas = {
+        "pacientes": 'db.patients.find({}, {"_id": 0}).sort({"edad": -1})',
+        "muestras": 'db.samples.find({"patient_id": "P-1"}, {"_id": 0})',
+        "vacia": 'db.patients.find({"edad": 0}, {"_id": 0})',
+        "erronea": 'db.patients.aggregate([{"$noExiste": {}}])',
+    }
+
+    resultados = {}
+    for jobs in (1, 3):
+        outdir = tmp_path / f"jobs{jobs}"
+        outdir.mkdir()
+        tiempos = mongoxml_to_html.run_reports(db, consultas, {}, _args(str(outdir), jobs))
+        resultados[jobs] = (
+            {name: (t["docs"], t["error"] is None) for name, t in tiempos.items()},
+            {p.name: p.read_bytes() for p in outdir.glob("*.html")},
+        )
+
+    assert resultados[3] == resultados[1]
+    docs, html = resultados[1]
+    assert docs == {"pacientes": (6, True), "muestras": (2, True), "vacia": (0, True), "erronea": (None, False)}
+    assert sorted(html) == ["muestras.html", "pacientes.html", "vacia.html"]
@@ -0,0 +1,89 @@
+"""
+ontology_cache: la ontología compilada coincide con un parseo directo de
+ontologia.owl, se recompila si cambia el fichero, y las uniones
+owl:unionOf y el cierre de rdfs:subClassOf se expanden bien.
+"""
+
+import shutil
+from pathlib import Path
+
+from rdflib import Graph, URIRef
+from rdflib.namespace import OWL, RDF
+
+import ontology_cache
+from ontology_cache import load_ontology
+
+OWL_PATH = Path(__file__).resolve().parents[1] / "datos" / "ontologia" / "ontologia.owl"
+
+EX = "http://example.org/onto#"
+MINI = """<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#"
+         xmlns:owl="http://www.w3.org/2002/07/owl#"
+         xml:base="http://example.org/onto">
+  <owl:Class rdf:about="#Entidad"/>
+  <owl:Class rdf:about="#Muestra"><rdfs:subClassOf rdf:resource="#Entidad"/></owl:Class>
+  <owl:Class rdf:about="#Biopsia"><rdfs:subClassOf rdf:resource="#Muestra"/></owl:Class>
+  <owl:Class rdf:about="#Paciente"><rdfs:subClassOf rdf:resource="#Entidad"/></owl:Class>
+  <owl:ObjectProperty rdf:about="#tieneNota">
+    <rdfs:domain>
+      <owl:Class>
+        <owl:unionOf rdf:parseType="Collection">
+          <owl:Class rdf:about="#Paciente"/>
+          <owl:Class rdf:about="#Muestra"/>
+        </owl:unionOf>
+      </owl:Class>
+    </rdfs:domain>
+    <rdfs:range rdf:resource="#Entidad"/>
+  </owl:ObjectProperty>
+</rdf:RDF>
+"""
+
+
+def _iris(g, tipo):
+    return sorted(str(s) for s in g.subjects(RDF.type, tipo) if isinstance(s, URIRef))
+
+
+def test_cached_ontology_matches_direct_parse(tmp_path, monkeypatch):
+    g = Graph()
+    g.parse(str(OWL_PATH))
+
+    compilaciones = []
+    compilar = ontology_cache.compile_ontology
+    monkeypatch.setattr(ontology_cache, "compile_ontology", lambda path: compilaciones.append(path) or compilar(path))
+
+    primera = load_ontology(str(OWL_PATH), tmp_path)
+    cacheada = load_ontology(str(OWL_PATH), tmp_path)
+
+    assert cacheada == primera and len(compilaciones) == 1
+    assert cacheada["classes"] == _iris(g, OWL.Class)
+    assert cacheada["object_properties"] == _iris(g, OWL.ObjectProperty)
+    assert cacheada["datatype_properties"] == _iris(g, OWL.DatatypeProperty)
+
+
+def test_changed_owl_is_recompiled(tmp_path):
+    owl = tmp_path / "ontologia.owl"
+    shutil.copyfile(OWL_PATH, owl)
+    antes = load_ontology(str(owl), tmp_path / "cache")
+
+    owl.write_text(MINI, encoding="utf-8")
+    despues = load_ontology(str(owl), tmp_path / "cache")
+
+    assert despues["sha256"] != antes["sha256"]
+    assert despues["classes"] == [EX + c for c in ("Biopsia", "Entidad", "Muestra", "Paciente")]
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 2
+
+
+def test_union_domains_and_subclass_closure(tmp_path):
+    owl = tmp_path / "mini.owl"
+    owl.write_text(MINI, encoding="utf-8")
+    ontologia = load_ontology(str(owl), tmp_path / "cache")
+
+    assert ontologia["domains"] == {EX + "tieneNota": [EX + "Muestra", EX + "Paciente"]}
+    assert ontologia["ranges"] == {EX + "tieneNota": [EX + "Entidad"]}
+    assert ontologia["superclasses"] == {
+        EX + "Entidad": [],
+        EX + "Muestra": [EX + "Entidad"],
+        EX + "Biopsia": [EX + "Entidad", EX + "Muestra"],
+        EX + "Paciente": [EX + "Entidad"],
+    }
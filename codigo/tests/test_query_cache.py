@@ -0,0 +1,113 @@
+"""
+query_cache: dependencias de un pipeline (incluidos $facet), aciertos y
+fallos de la caché, invalidación por versión de datos y expulsión LRU
+por tamaño.
+"""
+
+import os
+import time
+
+import pytest
+
+from mongoxml_to_html import open_query
+from query_cache import QueryResultCache, cache_key, load_data_versions, pipeline_collections, record_data_version
+
+CONSULTA = """db.samples.aggregate([
+  { "$facet": {
+      "conteo": [{ "$count": "n" }],
+      "con_paciente": [
+        { "$lookup": { "from": "patients", "localField": "patient.id", "foreignField": "patient_id", "as": "p" } },
+        { "$project": { "_id": 0, "sample_id": 1, "n_p": { "$size": "$p" } } }
+      ]
+  } }
+])"""
+
+
+def test_facet_lookups_are_dependencies():
+    pipeline = [
+        {"$facet": {"a": [{"$lookup": {"from": "patients", "as": "p"}}],
+                    "b": [{"$unionWith": {"coll": "variants", "pipeline": [
+                        {"$facet": {"c": [{"$graphLookup": {"from": "samples"}}]}}]}}]}},
+        {"$lookup": {"from": "oncokb_genes", "as": "o"}},
+    ]
+    assert pipeline_collections(pipeline) == {"patients", "variants", "samples", "oncokb_genes"}
+
+
+def test_cache_key_needs_every_dependency_version():
+    pipeline = [{"$facet": {"a": [{"$lookup": {"from": "patients", "as": "p"}}]}}]
+    versiones = {"samples": {"version": "1"}}
+    assert cache_key("samples", "aggregate", pipeline, versiones) is None
+
+    versiones["patients"] = {"version": "1"}
+    clave = cache_key("samples", "aggregate", pipeline, versiones)
+    versiones["patients"] = {"version": "2"}
+    assert clave is not None and cache_key("samples", "aggregate", pipeline, versiones) != clave
+
+
+# =========================
+# open_query con mongomock
+# =========================
+
+@pytest.fixture
+def db():
+    mongomock = pytest.importorskip("mongomock")
+    db = mongomock.MongoClient()["query_cache_test"]
+    db.patients.insert_many([{"patient_id": "P-1"}, {"patient_id": "P-2"}])
+    db.samples.insert_many([{"sample_id": "S-1", "patient": {"id": "P-1"}},
+                            {"sample_id": "S-2", "patient": {"id": "P-3"}}])
+    return db
+
+
+def _version(tmp_path, col, contenido):
+    origen = tmp_path / f"{col}.json"
+    origen.write_text(contenido, encoding="utf-8")
+    record_data_version(col, str(origen), str(tmp_path / "versions.json"))
+    return load_data_versions(str(tmp_path / "versions.json"))
+
+
+def _con_paciente(documentos):
+    return {d["sample_id"]: d["n_p"] for d in list(documentos)[0]["con_paciente"]}
+
+
+def test_hit_miss_and_invalidation_by_data_version(db, tmp_path, capsys):
+    cache = QueryResultCache(str(tmp_path / "cache"))
+    _version(tmp_path, "samples", "v1")
+    versiones = _version(tmp_path, "patients", "v1")
+
+    assert _con_paciente(open_query(db, "q", CONSULTA, cache=cache, versions=versiones)) == {"S-1": 1, "S-2": 0}
+    assert "desde caché" not in capsys.readouterr().out
+
+    # Cambia una colección que solo se lee dentro del $facet: sin nueva versión se sirve la caché
+    db.patients.insert_one({"patient_id": "P-3"})
+    assert _con_paciente(open_query(db, "q", CONSULTA, cache=cache, versions=versiones)) == {"S-1": 1, "S-2": 0}
+    assert "desde caché" in capsys.readouterr().out
+
+    versiones = _version(tmp_path, "patients", "v2")
+    assert _con_paciente(open_query(db, "q", CONSULTA, cache=cache, versions=versiones)) == {"S-1": 1, "S-2": 1}
+    assert "desde caché" not in capsys.readouterr().out
+
+
+def test_partial_read_is_not_published(tmp_path):
+    cache = QueryResultCache(str(tmp_path))
+    docs = cache.tee("k", iter([{"n": 1}, {"n": 2}]))
+    next(docs)
+    docs.close()
+
+    assert cache.get("k") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_eviction_by_size_removes_least_recently_used(tmp_path):
+    cache = QueryResultCache(str(tmp_path), max_bytes=10 ** 9)
+    lote = [{"n": i, "texto": os.urandom(512).hex()} for i in range(20)]
+    for i, key in enumerate(("a", "b", "c")):
+        assert list(cache.tee(key, iter(lote))) == lote
+        os.utime(cache._path(key), (time.time() - 100 + i, time.time() - 100 + i))
+    tamano = os.path.getsize(cache._path("a"))
+
+    list(cache.get("a"))  # "a" pasa a ser la más reciente
+    cache.max_bytes = 2 * tamano
+    cache.evict()
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
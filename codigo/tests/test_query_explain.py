@@ -0,0 +1,90 @@
+"""
+query_explain: resumen de planes clásicos y SBE ($lookup empujado como
+EQ_LOOKUP) y, si hay un mongod local, explain real de un $lookup.
+"""
+
+import uuid
+
+import pytest
+
+from query_explain import check_thresholds, run_explain, summarize_explain
+
+# Forma del explain de un aggregate con $lookup empujado a SBE (MongoDB 6.0+)
+SBE_LOOKUP = {
+    "explainVersion": "2",
+    "queryPlanner": {
+        "namespace": "db.samples",
+        "winningPlan": {
+            "queryPlan": {
+                "stage": "EQ_LOOKUP",
+                "foreignCollection": "db.patients",
+                "localField": "patient.id",
+                "foreignField": "patient_id",
+                "asField": "paciente",
+                "strategy": "HashJoin",
+                "inputStage": {"stage": "COLLSCAN", "direction": "forward"},
+            },
+            "slotBasedPlan": {"slots": "...", "stages": "..."},
+        },
+    },
+    "executionStats": {"nReturned": 38, "executionTimeMillis": 3, "totalDocsExamined": 72,
+                       "totalKeysExamined": 0},
+}
+
+
+def test_sbe_lookup_collscan_is_flagged():
+    resumen = summarize_explain(SBE_LOOKUP)
+
+    lookup = resumen["stages"][1]
+    assert (lookup["stage"], lookup["collection"], lookup["access"]) == ("EQ_LOOKUP", "db.patients", ["COLLSCAN"])
+    assert resumen["n_returned"] == 38
+    assert "$lookup sobre db.patients: COLLSCAN (HashJoin)" in check_thresholds(resumen)
+
+
+def test_sbe_indexed_lookup_is_not_flagged():
+    explain = {**SBE_LOOKUP, "queryPlanner": {"namespace": "db.samples", "winningPlan": {"queryPlan": {
+        **SBE_LOOKUP["queryPlanner"]["winningPlan"]["queryPlan"],
+        "strategy": "IndexedLoopJoin", "indexName": "patient_id_1",
+    }}}}
+    resumen = summarize_explain(explain)
+
+    assert resumen["stages"][1]["indexes"] == ["patient_id_1"]
+    assert check_thresholds(resumen) == []
+
+
+def test_classic_lookup_stage_is_flagged():
+    explain = {"stages": [
+        {"$cursor": {"queryPlanner": {"namespace": "db.samples", "winningPlan": {"stage": "COLLSCAN"}},
+                     "executionStats": {"nReturned": 38, "totalDocsExamined": 38}},
+         "nReturned": 38, "executionTimeMillisEstimate": 0},
+        {"$lookup": {"from": "patients", "as": "paciente"}, "totalDocsExamined": 1292,
+         "collectionScans": 38, "indexesUsed": [], "nReturned": 38, "executionTimeMillisEstimate": 2},
+    ]}
+    motivos = check_thresholds(summarize_explain(explain))
+
+    assert "$lookup sobre patients: 38 COLLSCAN" in motivos
+
+
+# =========================
+# mongod local
+# =========================
+
+@pytest.fixture
+def db(mongod):
+    nombre = f"query_explain_{uuid.uuid4().hex[:8]}"
+    yield mongod[nombre]
+    mongod.drop_database(nombre)
+
+
+def test_real_lookup_without_foreign_index_is_flagged(db, tmp_path):
+    db.patients.insert_many([{"patient_id": f"P-{i}"} for i in range(20)])
+    db.samples.insert_many([{"sample_id": f"S-{i}", "patient": {"id": f"P-{i}"}} for i in range(20)])
+    consulta = ('db.samples.aggregate([{ "$lookup": { "from": "patients", "localField": "patient.id", '
+                '"foreignField": "patient_id", "as": "paciente" } }])')
+
+    informe = run_explain(db, {"lookup": consulta}, str(tmp_path))
+    assert any("COLLSCAN" in m and "patients" in m for m in informe["queries"]["lookup"]["flags"])
+
+    db.patients.create_index("patient_id")
+    informe = run_explain(db, {"lookup": consulta}, str(tmp_path))
+    assert not any("patients" in m for m in informe["queries"]["lookup"]["flags"])
@@ -0,0 +1,176 @@
+"""
+Ida y vuelta de rdf_incremental: exportación completa + deltas aplicados
+debe dar el mismo grafo que una exportación completa nueva.
+"""
+
+import uuid
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from rdflib import BNode, Graph
+
+import rdf_incremental
+import reto5
+from rdf_incremental import apply_delta, changed_ids_from_stream, export_incremental
+
+OWL = reto5.Path(__file__).resolve().parents[1] / "datos" / "ontologia" / "ontologia.owl"
+
+
+def _docs():
+    return [
+        {"_id": ObjectId(), "patient_id": "P-1", "survival": {"overall": {"months": 28.0, "status": "DECEASED"}},
+         "treatments": [{"drug": "A", "line": 1}, {"drug": "B", "line": 2}]},
+        {"_id": ObjectId(), "patient_id": "P-2", "survival": {"overall": {"months": 3.5, "status": "LIVING"}},
+         "treatments": []},
+        {"_id": ObjectId(), "patient_id": "P-3", "stage": "III"},
+    ]
+
+
+def _full_export(uri, db_name, path, skolemize=True):
+    reto5.export_mongo_to_rdf(uri, db_name, str(OWL), str(path), out_format="nt", skolemize=skolemize)
+    g = Graph()
+    g.parse(str(path), format="nt")
+    return g
+
+
+def _round_trip(uri, db, tmp_path, seed=False, reemplazar=None):
+    """
+    Exporta, aplica un primer delta, modifica los datos (o los reemplaza
+    con la función reemplazar) y aplica un segundo delta; devuelve el grafo
+    resultante y el de una exportación completa nueva.
+    """
+    state = str(tmp_path / "state.sqlite")
+    col = db["patients"]
+    docs = _docs()
+    col.insert_many(docs)
+
+    g = _full_export(uri, db.name, tmp_path / "inicial.nt")
+    n_inicial = len(g)
+
+    export_incremental(uri, db.name, str(OWL), str(tmp_path / "d1.ru"), state_path=state, seed=seed)
+    apply_delta(g, str(tmp_path / "d1.ru"))
+    assert len(g) == n_inicial
+
+    if reemplazar is None:
+        col.update_one({"_id": docs[0]["_id"]}, {"$set": {"survival.overall.status": "LIVING"},
+                                                 "$pop": {"treatments": 1}})
+        col.delete_one({"_id": docs[1]["_id"]})
+        col.insert_one({"_id": ObjectId(), "patient_id": "P-4", "survival": {"overall": {"months": 1.0}}})
+    else:
+        reemplazar(db, docs)
+
+    export_incremental(uri, db.name, str(OWL), str(tmp_path / "d2.nq"), state_path=state, fmt="nq")
+    apply_delta(g, str(tmp_path / "d2.nq"))
+
+    return g, _full_export(uri, db.name, tmp_path / "final.nt")
+
+
+# =========================
+# mongomock (comparación de versiones)
+# =========================
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+
+    def sin_change_streams(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets")
+
+    monkeypatch.setattr(mongomock.collection.Collection, "watch", sin_change_streams, raising=False)
+    monkeypatch.setattr(reto5, "MongoClient", lambda *a, **k: client)
+    monkeypatch.setattr(rdf_incremental, "MongoClient", lambda *a, **k: client)
+    return client["rdf_incremental_test"]
+
+
+@pytest.mark.parametrize("seed", [False, True])
+def test_round_trip_version_scan(mock_db, tmp_path, seed):
+    g, fresco = _round_trip("mongodb://mock", mock_db, tmp_path, seed=seed)
+    assert set(g) == set(fresco)
+
+
+def test_skolem_iris_only_with_skolemize(mock_db, tmp_path):
+    mock_db["patients"].insert_many(_docs())
+
+    g = _full_export("mongodb://mock", mock_db.name, tmp_path / "g.nt")
+    assert not any(isinstance(t, BNode) for triple in g for t in triple)
+    assert any("/.well-known/genid/patients/" in str(o) for o in g.objects())
+    assert reto5.graph_is_skolemized(str(tmp_path / "g.nt"))
+
+    # Por defecto, nodos en blanco: las consultas con isBlank no cambian
+    g = _full_export("mongodb://mock", mock_db.name, tmp_path / "b.nt", skolemize=False)
+    assert any(isinstance(o, BNode) for o in g.objects())
+    assert not any("/.well-known/genid/" in str(t) for triple in g for t in triple)
+    assert not reto5.graph_is_skolemized(str(tmp_path / "b.nt"))
+
+
+class _FakeStream:
+    def __init__(self, eventos):
+        self.eventos = list(eventos)
+        self.resume_token = {"_data": "x"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def try_next(self):
+        return self.eventos.pop(0) if self.eventos else None
+
+
+class _FakeCollection:
+    name = "patients"
+
+    def __init__(self, eventos):
+        self.eventos = eventos
+
+    def watch(self, **kwargs):
+        return _FakeStream(self.eventos)
+
+
+def test_invalidate_event_falls_back_to_version_scan():
+    eventos = [
+        {"operationType": "update", "documentKey": {"_id": 1}},
+        {"operationType": "drop"},
+        {"operationType": "invalidate"},
+    ]
+    assert changed_ids_from_stream(_FakeCollection(eventos), {"_data": "t"}) is None
+
+    solo_cambios = [{"operationType": "insert", "documentKey": {"_id": 2}}]
+    assert changed_ids_from_stream(_FakeCollection(solo_cambios), {"_data": "t"}) == ({2}, {"_data": "x"})
+
+
+# =========================
+# mongod local (replica set de un nodo: change streams)
+# =========================
+
+@pytest.fixture
+def rs_db(replica_set):
+    nombre = f"rdf_incremental_{uuid.uuid4().hex[:8]}"
+    yield replica_set[nombre]
+    replica_set.drop_database(nombre)
+
+
+def _uri(db):
+    host, port = db.client.address
+    return f"mongodb://{host}:{port}/?directConnection=true"
+
+
+def test_round_trip_change_stream(rs_db, tmp_path):
+    g, fresco = _round_trip(_uri(rs_db), rs_db, tmp_path)
+    assert set(g) == set(fresco)
+
+
+def test_round_trip_after_shadow_rename(rs_db, tmp_path):
+    # Carga en sombra de mongo_loader: colección nueva renombrada sobre la viva
+    def recarga_en_sombra(db, docs):
+        sombra = db["patients__shadow"]
+        nuevos = [dict(d) for d in docs[:2]]
+        nuevos[0]["stage"] = "IV"
+        sombra.insert_many(nuevos)
+        sombra.rename("patients", dropTarget=True)
+
+    g, fresco = _round_trip(_uri(rs_db), rs_db, tmp_path, reemplazar=recarga_en_sombra)
+    assert set(g) == set(fresco)
@@ -0,0 +1,61 @@
+"""
+rdf_stats: las Consultas 1–3 (de esquema) respondidas desde el índice de
+estadísticas que escribe reto5 dan lo mismo que evaluarlas con SPARQL,
+tanto en la exportación Turtle como en la N-Triples en streaming.
+"""
+
+import pytest
+from bson import ObjectId
+
+import reto5
+from rdf_stats import is_schema_query, load_graph_stats
+from reto6 import load_graph, run_query, split_queries
+
+DATOS = reto5.Path(__file__).resolve().parents[1] / "datos" / "ontologia"
+OWL = DATOS / "ontologia.owl"
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(reto5, "MongoClient", lambda *a, **k: client)
+    db = client["rdf_stats_test"]
+    pacientes = [ObjectId(), ObjectId()]
+    db.patients.insert_many([
+        {"_id": pacientes[0], "patient_id": "P-1", "survival": {"overall": {"months": 28.0, "status": "DECEASED"}},
+         "treatments": [{"drug": "A", "line": 1}]},
+        {"_id": pacientes[1], "patient_id": "P-2", "stage": "III"},
+    ])
+    db.samples.insert_many([
+        {"_id": ObjectId(), "sample_id": "S-1", "patient": pacientes[0], "tipo": "primario"},
+        {"_id": ObjectId(), "sample_id": "S-2", "patient": pacientes[1]},
+    ])
+    return db
+
+
+def _filas(info):
+    with open(info["salida"], encoding="utf-8") as f:
+        cabecera, *filas = f.read().splitlines()
+    return cabecera, sorted(filas)
+
+
+@pytest.mark.parametrize("out_format,nombre", [("turtle", "g.ttl"), ("nt", "g.nt")])
+def test_schema_queries_from_stats_match_sparql(mock_db, tmp_path, out_format, nombre):
+    grafo = tmp_path / nombre
+    reto5.export_mongo_to_rdf("mongodb://mock", mock_db.name, str(OWL), str(grafo), out_format=out_format)
+    stats = load_graph_stats(str(grafo))
+    g = load_graph(grafo, "memory")
+
+    consultas = split_queries((DATOS / "Consultas_SPARQL.txt").read_text(encoding="utf-8"))[:3]
+    assert all(is_schema_query(q) for q in consultas)
+
+    for i, q in enumerate(consultas, start=1):
+        (tmp_path / "stats").mkdir(exist_ok=True)
+        (tmp_path / "sparql").mkdir(exist_ok=True)
+        desde_indice = run_query(g, i, q, tmp_path / "stats", stats=stats)
+        evaluada = run_query(g, i, q, tmp_path / "sparql")
+
+        assert desde_indice["stats"] and not evaluada["stats"]
+        assert desde_indice["filas"] == evaluada["filas"] > 0
+        assert _filas(desde_indice) == _filas(evaluada)
@@ -0,0 +1,61 @@
+"""
+Carga del grafo de reto5 en reto6 / sparql_endpoint: formato según la
+extensión en ambos backends y deltas aplicados una sola vez al almacén.
+"""
+
+import gzip
+import json
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+
+from rdf_store import guess_format
+from reto6 import apply_delta_once, load_graph
+
+EX = "http://example.org/"
+TRIPLES = [
+    (URIRef(EX + "p1"), URIRef(EX + "edad"), Literal(61)),
+    (URIRef(EX + "p2"), URIRef(EX + "edad"), Literal(47)),
+]
+
+
+def _write(path, fmt):
+    if fmt == "nquads":
+        texto = "".join(f"{s.n3()} {p.n3()} {o.n3()} <{EX}g> .\n" for s, p, o in TRIPLES)
+    else:
+        g = Graph()
+        for t in TRIPLES:
+            g.add(t)
+        texto = g.serialize(format=fmt)
+    datos = texto.encode("utf-8")
+    if str(path).endswith(".gz"):
+        datos = gzip.compress(datos)
+    path.write_bytes(datos)
+    return path
+
+
+@pytest.mark.parametrize("nombre,fmt", [
+    ("g.ttl", "turtle"), ("g.nt", "nt"), ("g.nq", "nquads"), ("g.nq.gz", "nquads"), ("g.ttl.gz", "turtle"),
+])
+def test_guess_format(nombre, fmt):
+    assert guess_format(nombre) == fmt
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+@pytest.mark.parametrize("nombre,fmt", [("g.nt", "nt"), ("g.nq", "nquads"), ("g.nq.gz", "nquads"), ("g.ttl.gz", "turtle")])
+def test_load_graph_infers_format(tmp_path, backend, nombre, fmt):
+    path = _write(tmp_path / nombre, fmt)
+    g = load_graph(path, backend, str(tmp_path / "store.sqlite"))
+    assert set(g) == set(TRIPLES)
+
+
+def test_apply_delta_once_skips_repeated_delta(tmp_path):
+    path = _write(tmp_path / "g.nt", "nt")
+    delta = tmp_path / "delta.ru"
+    delta.write_text(f"DELETE DATA {{ }} ;\nINSERT DATA {{ <{EX}p3> <{EX}edad> 70 . }}\n", encoding="utf-8")
+
+    g = load_graph(path, "sqlite", str(tmp_path / "store.sqlite"))
+    assert apply_delta_once(g, str(delta)) is True
+    assert apply_delta_once(g, str(delta)) is False
+    assert len(g) == 3
+    assert len(json.loads(g.store.get_meta("deltas"))) == 1
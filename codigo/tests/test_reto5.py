@@ -0,0 +1,98 @@
+"""
+reto5: opciones de la línea de órdenes, add_document con cachés igual a la
+versión original y exportación por shards en varios procesos igual a la
+exportación en un solo proceso.
+"""
+
+import json
+import sys
+
+import pytest
+from bson import ObjectId
+from rdflib import RDFS, Graph
+from rdflib.compare import isomorphic
+
+import reto5
+from benchmarks import add_document_original
+
+OWL = reto5.Path(__file__).resolve().parents[1] / "datos" / "ontologia" / "ontologia.owl"
+LIMPIOS = reto5.Path(__file__).resolve().parents[2] / "cleaned_data"
+
+
+def test_gzip_with_plain_out_is_rejected(monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["reto5.py", "--mongo-uri", "mongodb://x", "--db", "d", "--ontology", "o.owl",
+                                      "--format", "nt", "--gzip", "--out", "grafo.nt"])
+    monkeypatch.setattr(reto5, "export_mongo_to_rdf", lambda **kwargs: pytest.fail("no debería exportar"))
+
+    with pytest.raises(SystemExit):
+        reto5.main()
+    assert "--gzip" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("coleccion", ["patients", "samples", "oncokb_genes", "uniprot"])
+def test_cached_add_document_matches_original(coleccion):
+    with open(LIMPIOS / f"{coleccion}.json", encoding="utf-8") as f:
+        docs = [{"_id": ObjectId(), **d} for d in json.load(f)[:15]]
+
+    original, nuevo = Graph(), Graph()
+    clases = set()
+    for doc in docs:
+        add_document_original(original, coleccion, doc, set())
+        reto5.add_document(nuevo, coleccion, doc, clases)
+    # La versión original no declara la clase de la colección
+    nuevo.remove((None, None, RDFS.Class))
+
+    assert len(nuevo) == len(original) > len(docs)
+    assert isomorphic(nuevo, original)
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    # Los procesos del pool se crean con fork y heredan el cliente en memoria
+    monkeypatch.setattr(reto5, "MongoClient", lambda *a, **k: client)
+    db = client["reto5_test"]
+    pacientes = [ObjectId() for _ in range(9)]
+    db.patients.insert_many([
+        {"_id": oid, "patient_id": f"P-{i}", "survival": {"months": 2.5 * i, "status": "LIVING"},
+         "treatments": [{"drug": "A", "line": 1}, {"drug": "B", "line": 2}]}
+        for i, oid in enumerate(pacientes)
+    ])
+    db.samples.insert_many([
+        {"_id": ObjectId(), "sample_id": f"S-{i}", "patient": pacientes[i % 9], "tipo": "primario"}
+        for i in range(7)
+    ])
+    return db
+
+
+def _lineas(path):
+    with open(path, encoding="utf-8") as f:
+        return sorted(f.read().splitlines())
+
+
+@pytest.mark.parametrize("quads", [False, True])
+def test_sharded_export_matches_single_process(mock_db, tmp_path, quads):
+    ext = "nq" if quads else "nt"
+    unico, shards = str(tmp_path / f"unico.{ext}"), str(tmp_path / f"shards.{ext}")
+
+    n_unico = reto5.export_mongo_to_stream("mongodb://x", mock_db.name, str(OWL), unico, quads=quads,
+                                           skolemize=True)
+    n_shards = reto5.export_mongo_parallel("mongodb://x", mock_db.name, str(OWL), shards, quads=quads,
+                                           workers=2, partitions=3, skolemize=True)
+
+    assert n_shards == n_unico
+    assert _lineas(shards) == _lineas(unico)
+    assert not reto5.Path(f"{shards}.shards").exists()
+
+
+def test_sharded_export_with_blank_nodes_is_isomorphic(mock_db, tmp_path):
+    unico, shards = str(tmp_path / "unico.nt"), str(tmp_path / "shards.nt")
+
+    reto5.export_mongo_to_stream("mongodb://x", mock_db.name, str(OWL), unico)
+    reto5.export_mongo_parallel("mongodb://x", mock_db.name, str(OWL), shards, workers=3, partitions=3)
+
+    esperado = Graph().parse(unico, format="nt")
+    obtenido = Graph().parse(shards, format="nt")
+    assert len(obtenido) == len(esperado)
+    assert isomorphic(obtenido, esperado)
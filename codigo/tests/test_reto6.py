@@ -0,0 +1,67 @@
+"""
+reto6: las consultas en paralelo (hilos sobre el grafo en memoria o
+procesos sobre el almacén SQLite) dan los mismos resultados que en serie.
+"""
+
+import pytest
+from bson import ObjectId
+
+import reto5
+from reto6 import load_graph, run_queries, split_queries
+
+DATOS = reto5.Path(__file__).resolve().parents[1] / "datos" / "ontologia"
+OWL = DATOS / "ontologia.owl"
+
+
+@pytest.fixture
+def grafo(monkeypatch, tmp_path):
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(reto5, "MongoClient", lambda *a, **k: client)
+    db = client["reto6_test"]
+    pacientes = [ObjectId() for _ in range(6)]
+    db.patients.insert_many([
+        {"_id": oid, "patient_id": f"P-{i}", "stage": "III" if i % 2 else "IV",
+         "survival": {"overall": {"months": 4.0 * i, "status": "DECEASED" if i % 3 else "LIVING"}},
+         "treatments": [{"drug": "A", "line": 1}]}
+        for i, oid in enumerate(pacientes)
+    ])
+    db.samples.insert_many([
+        {"_id": ObjectId(), "sample_id": f"S-{i}", "patient": pacientes[i % 6], "tipo": "primario"}
+        for i in range(8)
+    ])
+    path = tmp_path / "g.nt"
+    reto5.export_mongo_to_rdf("mongodb://mock", db.name, str(OWL), str(path), out_format="nt")
+    return path
+
+
+def _resultados(infos):
+    resultados = {}
+    for info in infos:
+        contenido = None
+        if info["salida"]:
+            with open(info["salida"], encoding="utf-8") as f:
+                cabecera, *filas = f.read().splitlines() or [""]
+            contenido = (cabecera, sorted(filas))
+        resultados[info["consulta"]] = (info["tipo"], info["filas"], info["error"], contenido)
+    return resultados
+
+
+@pytest.mark.parametrize("backend,jobs", [("memory", 3), ("sqlite", 2)])
+def test_concurrent_queries_match_sequential(grafo, tmp_path, backend, jobs):
+    consultas = split_queries((DATOS / "Consultas_SPARQL.txt").read_text(encoding="utf-8"))
+    store = str(tmp_path / "store.sqlite")
+
+    def ejecutar(nombre, jobs):
+        destino = tmp_path / nombre
+        destino.mkdir()
+        g = load_graph(grafo, backend, store)
+        return _resultados(run_queries(g, consultas, destino, jobs=jobs,
+                                       store_path=store if backend == "sqlite" else None))
+
+    serie = ejecutar("serie", 1)
+    paralelo = ejecutar("paralelo", jobs)
+
+    assert sorted(serie) == list(range(1, len(consultas) + 1))
+    assert paralelo == serie
+    assert any(filas for _, filas, _, _ in serie.values())
@@ -0,0 +1,44 @@
+"""
+run_project, paso 2: un delta que solo borra documentos registra la
+nueva versión de los datos (la caché de informes deja de servir los
+resultados anteriores).
+"""
+
+import json
+
+import pytest
+
+import mongo_indexes
+import query_cache
+import run_project
+from mongo_loader import set_data_version
+
+
+@pytest.fixture
+def db(monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(run_project, "MongoClient", lambda *a, **k: client)
+    monkeypatch.setattr(mongo_indexes, "provision_indexes", lambda *a, **k: {})
+    return client[run_project.DB_NAME]
+
+
+def test_delete_only_delta_records_data_version(db, tmp_path, monkeypatch, capsys):
+    genes = [{"gene": {"symbol": s}} for s in ("BRAF", "NRAS")]
+    (tmp_path / "oncokb_genes.json").write_text(json.dumps(genes[:1]), encoding="utf-8")
+    delta = {"key": "gene.symbol", "full": False, "version": "v2", "bases": ["v1"], "upserts": [], "deletes": ["NRAS"]}
+    (tmp_path / "oncokb_genes.delta.json").write_text(json.dumps(delta), encoding="utf-8")
+
+    db.oncokb_genes.insert_many(genes)
+    set_data_version(db, "oncokb_genes", "v1")
+
+    registradas = []
+    monkeypatch.setattr(query_cache, "record_data_version", lambda col, fpath: registradas.append(col))
+    monkeypatch.setattr(run_project, "DIR_DATOS_LIMPIOS", str(tmp_path))
+    monkeypatch.setattr(run_project, "ARCHIVOS_A_COLECCIONES", {"oncokb_genes.json": "oncokb_genes"})
+
+    run_project.paso_2_upload("upsert")
+
+    assert [d["gene"]["symbol"] for d in db.oncokb_genes.find()] == ["BRAF"]
+    assert registradas == ["oncokb_genes"]
+    assert "vacío" not in capsys.readouterr().out
@@ -0,0 +1,75 @@
+"""
+sparql_cache: normalización de consultas (comentarios y espacios, pero no
+dentro de IRIs ni cadenas), huella del grafo desde el manifest o el
+fichero y expulsión LRU por tamaño.
+"""
+
+import json
+import os
+import time
+
+from query_cache import file_digest
+from sparql_cache import SparqlResultCache, graph_fingerprint, normalize_query, result_key
+
+
+def test_normalize_query_drops_comments_and_spaces():
+    consulta = """
+        # Pacientes con recidiva
+        PREFIX mel: <http://example.org/melanoma#>
+        SELECT ?p   ?nota   # variables
+        WHERE {
+            ?p mel:recidiva "sí # no es comentario" ;
+               mel:nota 'a  b' .
+            FILTER(?edad < 50)
+        }
+    """
+    assert normalize_query(consulta) == (
+        'PREFIX mel: <http://example.org/melanoma#> SELECT ?p ?nota WHERE { ?p mel:recidiva '
+        '"sí # no es comentario" ; mel:nota \'a  b\' . FILTER(?edad < 50) }'
+    )
+    otra = "PREFIX mel: <http://example.org/melanoma#>\nSELECT ?p ?nota WHERE {\n" \
+           "?p mel:recidiva \"sí # no es comentario\" ; mel:nota 'a  b' . FILTER(?edad < 50) }"
+    assert result_key(consulta, "g", "csv") == result_key(otra, "g", "csv")
+    assert result_key(consulta, "g", "csv") != result_key(consulta.replace("a  b", "a b"), "g", "csv")
+    assert result_key(consulta, "g", "csv") != result_key(consulta, "g", "tsv")
+
+
+def test_fingerprint_uses_manifest_only_if_it_matches(tmp_path):
+    grafo = tmp_path / "g.nt"
+    grafo.write_text("<http://x/a> <http://x/b> <http://x/c> .\n", encoding="utf-8")
+    assert graph_fingerprint(str(grafo)) == file_digest(str(grafo))
+
+    st = os.stat(grafo)
+    manifest = {"sha256": "del-manifest", "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    (tmp_path / "g.nt.manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    assert graph_fingerprint(str(grafo)) == "del-manifest"
+
+    # El grafo cambia después del manifest: se calcula el hash del fichero
+    grafo.write_text("<http://x/a> <http://x/b> <http://x/d> .\n", encoding="utf-8")
+    assert graph_fingerprint(str(grafo)) == file_digest(str(grafo))
+
+    (tmp_path / "g.nt.manifest.json").write_text("{roto", encoding="utf-8")
+    assert graph_fingerprint(str(grafo)) == file_digest(str(grafo))
+
+
+def test_get_copies_result_and_eviction_is_lru(tmp_path):
+    cache = SparqlResultCache(str(tmp_path / "cache"), max_bytes=10 ** 9)
+    resultado = tmp_path / "consulta_1.csv"
+    resultado.write_text("p\n" + "x" * 4096, encoding="utf-8")
+
+    for i, key in enumerate(("a", "b", "c")):
+        cache.put(key, str(resultado), {"tipo": "SELECT", "filas": 1})
+        os.utime(cache._dir(key), (time.time() - 100 + i, time.time() - 100 + i))
+
+    salida = tmp_path / "salida"
+    salida.mkdir()
+    meta = cache.get("a", salida, "consulta_9")  # "a" pasa a ser la más reciente
+    assert meta["filas"] == 1 and meta["salida"] == str(salida / "consulta_9.csv")
+    assert (salida / "consulta_9.csv").read_text(encoding="utf-8") == resultado.read_text(encoding="utf-8")
+
+    entrada = cache._dir("a")
+    cache.max_bytes = 2 * sum(os.path.getsize(os.path.join(entrada, f)) for f in os.listdir(entrada))
+    cache.evict()
+
+    assert cache.get("b", salida, "b") is None
+    assert cache.get("a", salida, "a") is not None and cache.get("c", salida, "c") is not None
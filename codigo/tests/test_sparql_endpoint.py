@@ -0,0 +1,134 @@
+"""
+sparql_endpoint contra un servidor local: filas de SELECT enviadas desde
+el pool, tipo de ASK, concurrencia acotada por --workers, almacén SQLite
+usado solo desde los hilos del pool y hueco liberado tras un timeout.
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import pytest
+from rdflib import Graph, Literal, URIRef
+
+import rdf_store
+from rdf_store import build_store
+from sparql_endpoint import SparqlService, make_server
+
+EX = "http://example.org/"
+N = 1200  # más de dos lotes de filas
+SELECT = f"SELECT ?s ?edad WHERE {{ ?s <{EX}edad> ?edad }}"
+# Producto cartesiano que no termina dentro del plazo
+LENTA = "SELECT * WHERE { ?a ?b ?c . ?d ?e ?f . ?g ?h ?i } ORDER BY ?c ?f ?i"
+
+
+def _graph():
+    g = Graph()
+    for i in range(N):
+        g.add((URIRef(f"{EX}p{i}"), URIRef(EX + "edad"), Literal(i)))
+    return g
+
+
+@pytest.fixture
+def endpoint():
+    servidores = []
+
+    def arrancar(service):
+        server = make_server(service, 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servidores.append(server)
+        return f"http://127.0.0.1:{server.server_port}/sparql"
+
+    yield arrancar
+    for server in servidores:
+        server.shutdown()
+        server.server_close()
+        server.RequestHandlerClass.service.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _get(url, query, accept="application/sparql-results+json"):
+    req = Request(f"{url}?{urlencode({'query': query})}", headers={"Accept": accept})
+    try:
+        with urlopen(req, timeout=30) as r:
+            return r.status, r.headers.get_content_type(), r.read()
+    except HTTPError as e:
+        return e.code, e.headers.get_content_type(), e.read()
+
+
+def test_select_streams_all_rows_and_ask_type(endpoint):
+    url = endpoint(SparqlService(_graph(), workers=2))
+
+    status, tipo, cuerpo = _get(url, SELECT)
+    assert (status, tipo) == (200, "application/sparql-results+json")
+    assert len(json.loads(cuerpo)["results"]["bindings"]) == N
+
+    status, tipo, cuerpo = _get(url, f"ASK {{ <{EX}p7> <{EX}edad> 7 }}")
+    assert (status, tipo) == (200, "application/sparql-results+json")
+    assert json.loads(cuerpo) == {"head": {}, "boolean": True}
+
+
+def test_workers_bound_concurrent_queries(endpoint, monkeypatch):
+    activas, maximo = [0], [0]
+    lock = threading.Lock()
+    evaluar = SparqlService._evaluate
+
+    def lenta(self, prepared, canal):
+        with lock:
+            activas[0] += 1
+            maximo[0] = max(maximo[0], activas[0])
+        time.sleep(0.2)
+        with lock:
+            activas[0] -= 1
+        evaluar(self, prepared, canal)
+
+    monkeypatch.setattr(SparqlService, "_evaluate", lenta)
+    url = endpoint(SparqlService(_graph(), workers=2, timeout=10))
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        respuestas = list(pool.map(lambda _: _get(url, SELECT), range(6)))
+
+    assert [r[0] for r in respuestas] == [200] * 6
+    assert maximo[0] == 2
+
+
+def test_sqlite_store_only_used_from_pool_threads(endpoint, tmp_path, monkeypatch):
+    origen = tmp_path / "g.nt"
+    _graph().serialize(str(origen), format="nt", encoding="utf-8")
+    store = str(tmp_path / "store.sqlite")
+    g = build_store(str(origen), store)
+
+    hilos = set()
+    triples = rdf_store.SQLiteStore.triples
+
+    def registrar(self, *args, **kwargs):
+        hilos.add(threading.current_thread().name)
+        return triples(self, *args, **kwargs)
+
+    monkeypatch.setattr(rdf_store.SQLiteStore, "triples", registrar)
+    url = endpoint(SparqlService(g, store, workers=2))
+
+    for _ in range(3):
+        status, _, cuerpo = _get(url, SELECT, accept="text/csv")
+        assert status == 200
+        assert len(cuerpo.decode("utf-8").splitlines()) == N + 1
+
+    assert hilos and all(h.startswith("sparql") for h in hilos)
+
+
+def test_timeout_frees_the_slot(endpoint):
+    g = Graph()
+    for i in range(60):
+        g.add((URIRef(f"{EX}p{i}"), URIRef(EX + "edad"), Literal(i)))
+    url = endpoint(SparqlService(g, workers=1, timeout=0.5))
+
+    status, _, _ = _get(url, LENTA)
+    assert status == 503
+
+    # La evaluación cancelada deja libre el único hueco del pool
+    status, _, cuerpo = _get(url, SELECT)
+    assert status == 200
+    assert len(json.loads(cuerpo)["results"]["bindings"]) == 60
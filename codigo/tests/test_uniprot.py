@@ -0,0 +1,125 @@
+"""
+Descarga de UniProt contra un servidor http.server local: lotes,
+reintentos, lotes fallidos, aciertos de caché y caducidad (TTL).
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from conversion_mongobd import fetch_uniprot_raw
+from http_cache import ResponseCache, crear_sesion
+
+ENTRADAS = {acc: {"primaryAccession": acc, "uniProtkbId": f"{acc}_HUMAN"} for acc in ("P1", "P2", "P3", "P4")}
+
+
+class _UniProt(BaseHTTPRequestHandler):
+    # Estado compartido por el servidor de cada test
+    peticiones = None
+    fallos = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.peticiones.append(url.path)
+
+        if url.path == "/uniprotkb/search":
+            query = parse_qs(url.query)["query"][0]
+            accs = [t.split(":", 1)[1] for t in query.split(" OR ")]
+            if self.fallos.get(accs[0]):
+                self.fallos[accs[0]] -= 1
+                return self._send(self.fallos.pop("status", 503), b"{}")
+            cuerpo = {"results": [ENTRADAS[a] for a in accs if a in ENTRADAS]}
+            return self._send(200, json.dumps(cuerpo).encode("utf-8"))
+
+        acc = url.path.rsplit("/", 1)[-1].removesuffix(".json")
+        if acc in ENTRADAS:
+            return self._send(200, json.dumps(ENTRADAS[acc]).encode("utf-8"))
+        self._send(404, b"{}")
+
+    def _send(self, status, cuerpo):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def uniprot():
+    handler = type("Handler", (_UniProt,), {"peticiones": [], "fallos": {}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    hilo = threading.Thread(target=server.serve_forever, daemon=True)
+    hilo.start()
+    yield f"http://127.0.0.1:{server.server_port}", handler
+    server.shutdown()
+    server.server_close()
+
+
+def _fetch(base_url, cache, accs, batch_size=2):
+    sesion = crear_sesion(pool_size=2, reintentos=2, backoff=0)
+    return fetch_uniprot_raw(accs, base_url, cache, sesion, workers=2, batch_size=batch_size)
+
+
+def _busquedas(handler):
+    return [p for p in handler.peticiones if p == "/uniprotkb/search"]
+
+
+def test_batches_and_single_fallback_for_missing(uniprot, tmp_path):
+    base_url, handler = uniprot
+    raw = _fetch(base_url, ResponseCache(str(tmp_path)), ["P1", "P2", "P3", "P9"])
+
+    assert sorted(raw) == ["P1", "P2", "P3"]
+    assert json.loads(raw["P3"])["primaryAccession"] == "P3"
+    assert len(_busquedas(handler)) == 2
+    assert "/uniprotkb/P9.json" in handler.peticiones
+
+
+def test_transient_error_is_retried(uniprot, tmp_path):
+    base_url, handler = uniprot
+    handler.fallos["P1"] = 1
+
+    raw = _fetch(base_url, ResponseCache(str(tmp_path)), ["P1", "P2"])
+
+    assert sorted(raw) == ["P1", "P2"]
+    assert len(_busquedas(handler)) == 2
+    assert not any(p.endswith(".json") for p in handler.peticiones)
+
+
+def test_failed_batch_falls_back_to_single_requests(uniprot, tmp_path):
+    base_url, handler = uniprot
+    handler.fallos.update({"P1": 1, "status": 400})
+
+    raw = _fetch(base_url, ResponseCache(str(tmp_path)), ["P1", "P2", "P3", "P4"])
+
+    assert sorted(raw) == ["P1", "P2", "P3", "P4"]
+    assert {"/uniprotkb/P1.json", "/uniprotkb/P2.json"} <= set(handler.peticiones)
+    assert "/uniprotkb/P3.json" not in handler.peticiones
+
+
+def test_cache_hit_and_ttl_expiry(uniprot, tmp_path):
+    base_url, handler = uniprot
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    _fetch(base_url, cache, ["P1", "P2"])
+    handler.peticiones.clear()
+
+    assert sorted(_fetch(base_url, cache, ["P1", "P2"])) == ["P1", "P2"]
+    assert handler.peticiones == []
+
+    # Se envejece la entrada de P1 más allá del TTL
+    antiguo = time.time() - 120
+    for root, _, files in os.walk(tmp_path):
+        for name in files:
+            with open(os.path.join(root, name), "rb") as f:
+                if json.loads(f.read())["primaryAccession"] == "P1":
+                    os.utime(os.path.join(root, name), (antiguo, antiguo))
+
+    assert sorted(_fetch(base_url, cache, ["P1", "P2"])) == ["P1", "P2"]
+    assert len(_busquedas(handler)) == 1